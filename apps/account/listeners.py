@@ -1,10 +1,10 @@
 import socket
 
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from account.models.membership import Invitation, UserProfile
+from account.models.membership import MSP_WORKSPACE, Invitation, Membership, UserProfile
 from account.models.user import PasswordResetLog, User
 from account.signals import (
     avatar_changed_signal,
@@ -14,6 +14,9 @@ from account.signals import (
     user_created_signal,
 )
 from core.mail import send_email
+from core.permissions.role_cache import invalidate_roles
+from core.permissions.visibility import invalidate_member_workspaces
+from project.models import Project
 from workspace.models import Workspace
 
 
@@ -198,3 +201,35 @@ def install_avatar_after_new_user(sender, instance, created, **kwargs):
     if created:
         instance.refresh_from_db()
         instance.install_default_avatar()
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Invitation)
+@receiver(post_delete, sender=Membership)
+def invalidate_roles_for_membership(sender, instance, **kwargs):
+    """
+    Invalidate the cached roles for the workspace or project of the membership, and the cached workspaces the user
+    is a member of
+    """
+    invalidate_roles("workspace" if instance.object_type == MSP_WORKSPACE else "project", instance.object_uuid)
+    if instance.object_type == MSP_WORKSPACE and instance.user_id:
+        invalidate_member_workspaces(instance.user_id)
+
+
+@receiver(post_save, sender=Workspace)
+@receiver(post_delete, sender=Workspace)
+def invalidate_roles_for_workspace(sender, instance, **kwargs):
+    """
+    Invalidate the cached roles for the workspace, the roles depend on the visibility of the workspace
+    """
+    invalidate_roles("workspace", instance.uuid)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_roles_for_project(sender, instance, **kwargs):
+    """
+    Invalidate the cached roles for the project, the roles depend on the visibility of the project
+    """
+    invalidate_roles("project", instance.uuid)
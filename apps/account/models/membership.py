@@ -18,6 +18,7 @@ from core.permissions.askanna_roles import (
     WorkspaceViewer,
     get_role_class,
 )
+from core.permissions.role_cache import get_cached_role
 from project.models import Project
 from workspace.models import Workspace
 
@@ -188,6 +189,23 @@ class Membership(BaseAvatarModel):
         | type[ProjectViewer]
         | type[ProjectNoMember]
         | type[ProjectPublicViewer]
+    ):
+        """
+        Return the role of the user for the project. The role is cached, see `core.permissions.role_cache`.
+        """
+        return get_cached_role(
+            user, project.workspace_id, project.uuid, lambda: cls.resolve_project_role(user, project)
+        )
+
+    @classmethod
+    def resolve_project_role(
+        cls, user, project: Project
+    ) -> (
+        type[ProjectAdmin]
+        | type[ProjectMember]
+        | type[ProjectViewer]
+        | type[ProjectNoMember]
+        | type[ProjectPublicViewer]
     ):
         if (user.is_anonymous or not user.is_active) and (
             project.visibility == "PRIVATE" or project.workspace.visibility == "PRIVATE"
@@ -233,6 +251,21 @@ class Membership(BaseAvatarModel):
         | type[WorkspaceViewer]
         | type[WorkspaceNoMember]
         | type[WorkspacePublicViewer]
+    ):
+        """
+        Return the role of the user for the workspace. The role is cached, see `core.permissions.role_cache`.
+        """
+        return get_cached_role(user, workspace.uuid, None, lambda: cls.resolve_workspace_role(user, workspace))
+
+    @classmethod
+    def resolve_workspace_role(
+        cls, user, workspace: Workspace
+    ) -> (
+        type[WorkspaceAdmin]
+        | type[WorkspaceMember]
+        | type[WorkspaceViewer]
+        | type[WorkspaceNoMember]
+        | type[WorkspacePublicViewer]
     ):
         if (user.is_anonymous or not user.is_active) and workspace.visibility == "PRIVATE":
             return WorkspaceNoMember
@@ -1,9 +1,12 @@
+from types import SimpleNamespace
+
 import pytest
 
 from account.models.membership import MSP_WORKSPACE, WS_ADMIN, WS_MEMBER, Membership
 from account.models.user import User
 from job.models import JobDef
 from project.models import Project
+from run.tasks import meta
 from workspace.models import Workspace
 
 
@@ -93,3 +96,15 @@ def test_jobs(db, test_projects) -> dict:
             project=test_projects.get("project_public"),
         ),
     }
+
+
+@pytest.fixture(autouse=True)
+def run_update_meta_tasks(monkeypatch):
+    """
+    Run the meta update tasks scheduled with `schedule_update_meta` directly instead of sending them to the broker
+    """
+
+    def send_task(name, args=None, kwargs=None, **options):
+        return meta.celery_app.tasks[name](*(args or ()), **(kwargs or {}))
+
+    monkeypatch.setattr(meta, "celery_app", SimpleNamespace(tasks=meta.celery_app.tasks, send_task=send_task))
@@ -1,6 +1,7 @@
 import collections
 import dataclasses
 
+import docker
 import yaml
 from django.conf import settings
 from yaml.scanner import ScannerError
@@ -31,6 +32,7 @@ class AskAnnaConfig:
         "project",
         "push-target",
         "notifications",
+        "resources",
         "timezone",
         "variables",
         "worker",
@@ -117,15 +119,39 @@ class AskAnnaConfig:
             }
         )
 
+    @property
+    def resources(self):
+        """
+        Return the resources that are set for all jobs or the default resources
+        """
+        return Resources.from_dict(self.config.get("resources"))
+
+
+def get_catch_up_policy(catch_up: str | None, default: str = "SKIP") -> str:
+    """
+    Return the policy for runs of a schedule that were missed, for example because of an outage:
+    - SKIP: don't run the missed runs and send a notification (default)
+    - ONCE: run once for all runs that were missed
+    - ALL: run for every run that was missed
+    """
+    if isinstance(catch_up, str) and catch_up.upper() in ("SKIP", "ONCE", "ALL"):
+        return catch_up.upper()
+    return default
+
 
 @dataclasses.dataclass
 class Schedule:
     raw_definition: str | dict
     cron_definition: str
     cron_timezone: str
+    catch_up: str = "SKIP"
 
     @classmethod
-    def from_python(cls, schedule: str | dict, job_timezone):
+    def from_python(cls, schedule: str | dict, job_timezone, catch_up: str = "SKIP"):
+        if isinstance(schedule, dict) and "catch_up" in schedule:
+            catch_up = get_catch_up_policy(schedule["catch_up"], default=catch_up)
+            schedule = {key: value for key, value in schedule.items() if key != "catch_up"}
+
         try:
             cron_line_parsed = parse_cron_line(schedule)
         except ValueError:
@@ -136,6 +162,7 @@ class Schedule:
                 raw_definition=schedule,
                 cron_definition=cron_line_parsed,
                 cron_timezone=job_timezone,
+                catch_up=catch_up,
             )
 
 
@@ -181,6 +208,46 @@ class Environment:
         return cls(**spec)
 
 
+@dataclasses.dataclass
+class Resources:
+    """
+    The CPUs and memory in bytes a run of a job can use
+    """
+
+    cpus: float
+    memory: int
+
+    @classmethod
+    def from_dict(cls, resources: dict | None, default: "Resources | None" = None):
+        """
+        Read the resources from a dictionary like `{"cpus": 2, "memory": "4g"}`. Values that are not set or invalid
+        are taken from `default`, or from `settings.RUN_DEFAULT_CPUS` and `settings.RUN_DEFAULT_MEMORY`.
+        """
+        if default is None:
+            default = cls(
+                cpus=float(settings.RUN_DEFAULT_CPUS),
+                memory=docker.utils.parse_bytes(settings.RUN_DEFAULT_MEMORY),  # type: ignore
+            )
+        if not isinstance(resources, dict):
+            return default
+
+        try:
+            cpus = float(resources.get("cpus", default.cpus))
+        except (TypeError, ValueError):
+            cpus = default.cpus
+        if cpus <= 0:
+            cpus = default.cpus
+
+        try:
+            memory = docker.utils.parse_bytes(resources.get("memory", default.memory))  # type: ignore
+        except docker.errors.DockerException:  # type: ignore
+            memory = default.memory
+        if not isinstance(memory, int) or memory <= 0:
+            memory = default.memory
+
+        return cls(cpus=cpus, memory=memory)
+
+
 @dataclasses.dataclass
 class Job:
     name: str
@@ -189,6 +256,7 @@ class Job:
     notifications: dict
     schedules: list[Schedule]
     timezone: str
+    resources: Resources
 
     def __flatten_email_receivers(self, receivers: list) -> list:
         _receivers = []
@@ -218,9 +286,12 @@ class Job:
         job_config_timezone = job_config.get("timezone", "")
         job_timezone = job_config_timezone if is_valid_timezone(job_config_timezone) else global_timezone
 
+        # the catch up policy of the job is used for the schedules that don't set a catch up policy
+        job_catch_up = get_catch_up_policy(job_config.get("catch_up"))
+
         schedules = []
         for schedule in job_config.get("schedule", []):
-            s = Schedule.from_python(schedule, job_timezone)
+            s = Schedule.from_python(schedule, job_timezone, catch_up=job_catch_up)
             # we only add the schedule if it is valid
             if isinstance(s, Schedule):
                 schedules.append(s)
@@ -229,6 +300,9 @@ class Job:
         job_environment = job_config.get("environment", global_environment.to_dict())
         environment = Environment.from_dict(job_environment)
 
+        # extract the resources
+        resources = Resources.from_dict(job_config.get("resources"), default=global_config.resources)
+
         # extract the commands
         job_commands = job_config.get("job", [])
 
@@ -254,4 +328,5 @@ class Job:
             notifications=job_notifications,
             schedules=schedules,
             timezone=job_timezone,
+            resources=resources,
         )
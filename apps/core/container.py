@@ -1,12 +1,15 @@
-import datetime
+import hmac
 import logging
+import threading
 import time
+import uuid
 from collections.abc import Callable
 from pathlib import Path
 
 import docker
 import redis
 from django.conf import settings
+from django.core.cache import cache
 from django.db import IntegrityError
 
 from job.models import RunImage
@@ -65,8 +68,6 @@ class RegistryImageHelper:
         self.logger = logger
 
         self.userinfo = None
-        if self.credentials:
-            self.login()
         self.image_info = None
 
     def login(self):
@@ -99,6 +100,58 @@ class RegistryImageHelper:
             return {"username": self.username, "password": self.password}
         return {}
 
+    @property
+    def pinned_digest(self) -> str | None:
+        """
+        The digest of an image referenced by digest, e.g. `python@sha256:...`. The digest of these images is known
+        without resolving it from the registry.
+        """
+        if self.image_tag.startswith("sha256:"):
+            return self.image_tag
+        return None
+
+    @property
+    def image_digest_cache_key(self) -> str:
+        """
+        Cache key for the digest of the image. The credentials are part of the key, so a digest resolved with valid
+        credentials is not used for a run with other credentials.
+        """
+        if self.credentials:
+            # Keyed with the secret key, so the credentials can't be brute-forced from the cache keys
+            credentials = f"{self.username}:{self.password}".encode()
+            credentials_fingerprint = hmac.new(settings.SECRET_KEY.encode(), credentials, "sha256").hexdigest()
+        else:
+            credentials_fingerprint = "anonymous"
+        return (
+            f"registry:digest:{self.image_registry}:{self.image_repo_name}:{self.image_tag}:{credentials_fingerprint}"
+        )
+
+    def get_image_digest(self) -> str:
+        """
+        Get the digest of the image. A pinned digest is used as is, else the digest is resolved from the registry and
+        cached for `settings.REGISTRY_DIGEST_CACHE_TTL` seconds.
+        """
+        if self.pinned_digest:
+            return self.pinned_digest
+        if self.image_info:
+            return self.image_info.id
+
+        digest = cache.get(self.image_digest_cache_key) if settings.REGISTRY_DIGEST_CACHE_TTL else None
+        if digest:
+            return digest
+
+        digest = self.get_image_info().id
+        if settings.REGISTRY_DIGEST_CACHE_TTL:
+            cache.set(self.image_digest_cache_key, digest, timeout=settings.REGISTRY_DIGEST_CACHE_TTL)
+        return digest
+
+    def invalidate_image_digest(self):
+        """
+        Remove the cached digest of the image, so the next run resolves the digest from the registry again
+        """
+        cache.delete(self.image_digest_cache_key)
+        self.image_info = None
+
     def get_image_info(self) -> docker.models.images.RegistryData:  # type: ignore
         """
         Get information about the image, may require authentication
@@ -121,11 +174,11 @@ class RegistryImageHelper:
 
     @property
     def image_digest(self) -> str:
-        return self.get_image_info().id
+        return self.get_image_digest()
 
     @property
     def image_short_id(self) -> str:
-        return self.get_image_info().short_id.replace("sha256:", "")
+        return self.image_digest.replace("sha256:", "")[:12]
 
     def pull(self, log=False):
         self.login()
@@ -159,6 +212,97 @@ class RegistryImageHelper:
                 map(lambda line: self.logger(line.get("status")), image)
 
 
+class BuildLock:
+    """
+    Distributed lock for building a run image. The lock is a lease of `settings.RUN_IMAGE_BUILD_LOCK_TTL` seconds that
+    is extended by a heartbeat while the lock is held, so the lock of a crashed build expires. Runs waiting for the
+    build are notified via Redis pub/sub when the lock is released.
+    """
+
+    # Only extend or remove the lock if it's still held with our token
+    extend_script = """
+        if redis.call("get", KEYS[1]) == ARGV[1] then
+            return redis.call("expire", KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+    release_script = """
+        if redis.call("get", KEYS[1]) == ARGV[1] then
+            return redis.call("del", KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, redis_client: redis.Redis, name: str, ttl: int | None = None):
+        self.redis = redis_client
+        self.key = f"run-image:build-lock:{name}"
+        self.channel = f"run-image:build-done:{name}"
+        self.ttl = ttl or settings.RUN_IMAGE_BUILD_LOCK_TTL
+        self.token = uuid.uuid4().hex
+        self.heartbeat_stop = threading.Event()
+        self.heartbeat_thread = None
+
+    @property
+    def heartbeat_interval(self) -> float:
+        return self.ttl / 3
+
+    def is_locked(self) -> bool:
+        return bool(self.redis.exists(self.key))
+
+    def acquire(self) -> bool:
+        """
+        Try to get the lock. Returns False if the lock is held by someone else.
+        """
+        if not self.redis.set(self.key, self.token, nx=True, ex=self.ttl):
+            return False
+
+        self.heartbeat_stop.clear()
+        self.heartbeat_thread = threading.Thread(target=self.heartbeat, daemon=True)
+        self.heartbeat_thread.start()
+        return True
+
+    def extend(self) -> bool:
+        return bool(self.redis.eval(self.extend_script, 1, self.key, self.token, self.ttl))
+
+    def heartbeat(self):
+        while not self.heartbeat_stop.wait(self.heartbeat_interval):
+            if not self.extend():
+                logger.warning(f"Lost build lock {self.key}")
+                return
+
+    def release(self):
+        """
+        Release the lock and notify the runs that wait for the build
+        """
+        self.heartbeat_stop.set()
+        if self.heartbeat_thread:
+            self.heartbeat_thread.join()
+            self.heartbeat_thread = None
+
+        self.redis.eval(self.release_script, 1, self.key, self.token)
+        self.redis.publish(self.channel, "released")
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait until the lock is released or expired. Returns False if the lock is still held after `timeout` seconds.
+        """
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        try:
+            timeout_stamp = time.monotonic() + timeout
+            # Subscribe before checking the lock, so a release between the check and the wait is not missed. The
+            # lock is checked again every heartbeat interval to notice a lock that expired after a crashed build.
+            while self.is_locked():
+                remaining = timeout_stamp - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if pubsub.get_message(timeout=min(remaining, self.heartbeat_interval)):
+                    return True
+            return True
+        finally:
+            pubsub.close()
+
+
 class ContainerImageBuilder:
     def __init__(
         self,
@@ -177,29 +321,19 @@ class ContainerImageBuilder:
         self.logger = logger
         self.redis = redis.Redis.from_url(settings.REDIS_URL)
 
-    def get_build_lock(self, run_image):
-        return self.redis.get(run_image.suuid)
-
-    def set_build_lock(self, run_image):
-        self.redis.set(run_image.suuid, datetime.datetime.utcnow().isoformat())
-        return self.get_build_lock(run_image)
-
-    def remove_build_lock(self, run_image):
-        return self.redis.delete(run_image.suuid)
+    def get_build_lock(self, run_image: RunImage) -> BuildLock:
+        return BuildLock(self.redis, name=run_image.suuid)
 
     def wait_for_build_lock(self, run_image: RunImage, timeout: int = 300):
-        timeout_stamp = time.time() + timeout
-        while self.get_build_lock(run_image) is not None:
-            time.sleep(1)
-            if time.time() > timeout_stamp:
-                message = f"Timeout while waiting for image '{run_image.name}' to be built by another run."
-                logger.warning(message)
-                self.logger(message)
-                self.logger(
-                    "The image is currently being built by another run. We waited for 5 minutes, but it did not "
-                    "finish. You can try again later or contact support if this problem persists."
-                )
-                raise TimeoutError(message)
+        if not self.get_build_lock(run_image).wait(timeout=timeout):
+            message = f"Timeout while waiting for image '{run_image.name}' to be built by another run."
+            logger.warning(message)
+            self.logger(message)
+            self.logger(
+                "The image is currently being built by another run. We waited for 5 minutes, but it did not "
+                "finish. You can try again later or contact support if this problem persists."
+            )
+            raise TimeoutError(message)
 
     def get_image_object(self, name: str, tag: str, digest: str) -> tuple[RunImage, bool]:
         try:
@@ -234,31 +368,47 @@ class ContainerImageBuilder:
         else:
             return True
 
+    def is_image_available(self, run_image: RunImage) -> bool:
+        """Check if the cached image of the run image is available on the Docker host of the client."""
+        if not run_image.cached_image:
+            return False
+        if not self.image_exist(run_image.cached_image):
+            logger.info(f"Cached image {run_image.cached_image} not found. The image will be rebuilt.")
+            return False
+        return True
+
     def get_image(self) -> RunImage:
         """Get an image from the registry or build it if it does not exist locally."""
-        run_image, created = self.get_image_object(
+        run_image, _ = self.get_image_object(
             name=self.image_helper.image_repository,
             tag=self.image_helper.image_tag,
             digest=self.image_helper.image_digest,
         )
 
-        if not created and not run_image.cached_image and self.get_build_lock(run_image) is not None:
-            # The image was created in another run, wait for it during 5 minutes. Else, raise an error.
-            self.wait_for_build_lock(run_image)
-            run_image.refresh_from_db()
-
-        if run_image.cached_image and not self.image_exist(run_image.cached_image):
-            logger.info(f"Cached image {run_image.cached_image} not found. A trigger to rebuild the image is set.")
-            run_image.unset_cached_image()
+        while not self.is_image_available(run_image):
+            build_lock = self.get_build_lock(run_image)
+            if not build_lock.acquire():
+                # The image is built in another run, wait for it during 5 minutes. Else, raise an error.
+                self.wait_for_build_lock(run_image)
+                # If the build in the other run failed, the image is built in this run
+                run_image.refresh_from_db()
+                continue
 
-        if created or not run_image.cached_image:
-            logger.info(f"Building image {self.image_helper.image_path}")
-            run_image = self.build_image(run_image=run_image)
+            try:
+                # The image could be built by another run after the cached image was read
+                run_image.refresh_from_db()
+                if not self.is_image_available(run_image):
+                    logger.info(f"Building image {self.image_helper.image_path}")
+                    run_image = self.build_image(run_image=run_image)
+            finally:
+                build_lock.release()
 
-        return run_image  # noqa: RET504
+        return run_image
 
     def build_image(self, run_image: RunImage):
-        self.set_build_lock(run_image)
+        """Build the run image. The caller should hold the build lock of the run image."""
+        # The digest could come from the cache, authenticate so the base image can be pulled from the registry
+        self.image_helper.login()
 
         from_image = f"{self.image_helper.image_repository}@{self.image_helper.image_digest}"
 
@@ -277,6 +427,8 @@ class ContainerImageBuilder:
                 buildargs={"IMAGE": from_image},
             )
         except docker.errors.DockerException as exc:  # type: ignore
+            # The cached digest could be outdated, for example when the tag was removed from the registry
+            self.image_helper.invalidate_image_digest()
             self.logger(f"Preparing the run image with image '{self.image_helper.image_repository}' failed:")
             self.logger(exc.msg)
             self.logger("Please follow the instructions on https://docs.askanna.io/ to build your own image.")
@@ -284,7 +436,5 @@ class ContainerImageBuilder:
         else:
             run_image.set_cached_image(askanna_repository_image)
             logger.info(f"Image {askanna_repository_image} built and cached. Image digest: {image.short_id}")
-        finally:
-            self.remove_build_lock(run_image)
 
         return run_image
@@ -0,0 +1,42 @@
+import timeit
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from core.permissions.askanna_roles import (
+    AskAnnaMember,
+    ProjectPublicViewer,
+    WorkspacePublicViewer,
+    merge_role_permissions,
+)
+from core.permissions.role import RoleBasedPermission
+
+
+class Command(BaseCommand):
+    help = "Benchmark the role based permission check that runs on every API request"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--number",
+            type=int,
+            default=100_000,
+            help="Number of permission checks per benchmark",
+        )
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        # The roles of a public viewer are checked last, so this is the slowest path for a permission that is granted
+        request = SimpleNamespace(user_roles=[AskAnnaMember, WorkspacePublicViewer, ProjectPublicViewer])
+        views = {
+            "granted": SimpleNamespace(action="list", rbac_permissions_by_action={"list": ["project.info.view"]}),
+            "denied": SimpleNamespace(action="update", rbac_permissions_by_action={"update": ["project.info.edit"]}),
+        }
+        permission = RoleBasedPermission()
+
+        for name, view in views.items():
+            self.report(f"has_permission ({name})", number, lambda view=view: permission.has_permission(request, view))
+        self.report("merge_role_permissions", number, lambda: merge_role_permissions(request.user_roles))
+
+    def report(self, name: str, number: int, func):
+        duration = min(timeit.repeat(func, number=number, repeat=3))
+        self.stdout.write(f"{name:<30} {duration / number * 1_000_000:.2f} µs per call")
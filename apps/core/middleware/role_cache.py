@@ -0,0 +1,14 @@
+from core.permissions.role_cache import request_role_cache
+
+
+class RoleCacheMiddleware:
+    """
+    Memoize the roles of the user that are resolved during the request, so a role is resolved once per request
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_role_cache():
+            return self.get_response(request)
@@ -38,14 +38,21 @@ class BaseModel(models.Model):
         ordering = ["-modified_at"]
 
     def save(self, *args, **kwargs):
+        self.set_suuid()
+
+        self.update_modified = kwargs.pop("update_modified", getattr(self, "update_modified", True))
+        super().save(*args, **kwargs)
+
+    def set_suuid(self):
+        """
+        Make sure the instance has a uuid and a suuid. This is done on save, but should be called explicitly when
+        instances are saved without calling `save`, for example via `bulk_create`.
+        """
         if not self.uuid:
             self.uuid = _uuid.uuid4()
         if not self.suuid and self.uuid:
             self.suuid = create_suuid(uuid=self.uuid)
 
-        self.update_modified = kwargs.pop("update_modified", getattr(self, "update_modified", True))
-        super().save(*args, **kwargs)
-
     def to_deleted(self):
         if self.deleted_at:
             return
@@ -78,6 +85,56 @@ class NameDescriptionBaseModel(BaseModel):
         abstract = True
 
 
+class ActiveModel(models.Model):
+    """
+    ActiveModel is an abstract base class model for subclasses of BaseModel that provides the field:
+     - is_active
+
+    "is_active" is a denormalized soft delete state. An instance is active if the instance and its parents are not
+    deleted, so active instances can be filtered without joining the parents. The lookups of the parents are set in
+    `active_parents`, with the label of the parent model as key.
+
+    When "deleted_at" of an instance is saved with `update_fields`, for example via `to_deleted`, the state is
+    propagated to the instances of the models it's a parent of. See `core.signals.propagate_is_active`.
+    """
+
+    is_active = models.BooleanField(default=True, editable=False)
+
+    active_parents: dict[str, str] = {}
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.deleted_at:
+            self.is_active = False
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "deleted_at" in update_fields and "is_active" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "is_active"]
+
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def get_active_filter(cls) -> models.Q:
+        """
+        Return the filter for instances that are active, based on "deleted_at" of the instances and their parents
+        """
+        return models.Q(
+            deleted_at__isnull=True,
+            **{f"{lookup}__deleted_at__isnull": True for lookup in cls.active_parents.values()},
+        )
+
+    @classmethod
+    def update_is_active(cls, queryset: models.QuerySet):
+        """
+        Set "is_active" of the instances in the queryset based on "deleted_at" of the instances and their parents
+        """
+        active_filter = cls.get_active_filter()
+        queryset.filter(active_filter, is_active=False).update(is_active=True)
+        queryset.filter(is_active=True).exclude(active_filter).update(is_active=False)
+
+
 class AuthorModel(models.Model):
     """
     Adding created_by to the model to register who created this instance
@@ -7,25 +7,31 @@ class BasePermissions:
         """
         raise NotImplementedError("Please implement the classmethod '__object_permissions__' on the permission class")
 
+    @classmethod
+    def permission_set(cls) -> frozenset[str]:
+        """
+        Return the permissions of the role as a frozenset. The permissions are compiled once per role and stored on
+        the role class, the roles defined in this module are compiled when the module is imported.
+        """
+        if "_permission_set" not in cls.__dict__:
+            cls._permission_set = frozenset(
+                permission for permission, roles in cls.__object_permissions__().items() if cls in roles
+            )
+        return cls._permission_set
+
     @classmethod
     def full_permissions(cls) -> dict[str, bool]:
-        full_permissions = {}
-        for permission, roles in cls.__object_permissions__().items():
-            full_permissions[permission] = cls in roles
-        return full_permissions
+        permission_set = cls.permission_set()
+        return {permission: permission in permission_set for permission in cls.__object_permissions__()}
 
     @classmethod
     def true_permissions(cls) -> dict[str, bool]:
-        return dict(filter(lambda x: x[1] is True, cls.full_permissions().items()))
+        return dict.fromkeys(cls.permissions(), True)
 
     @classmethod
     def permissions(cls) -> list[str]:
-        return list(
-            map(
-                lambda y: y[0],
-                filter(lambda x: x[1], cls.full_permissions().items()),
-            )
-        )
+        permission_set = cls.permission_set()
+        return [permission for permission in cls.__object_permissions__() if permission in permission_set]
 
 
 class AskAnnaPermissions(BasePermissions):
@@ -296,6 +302,37 @@ project_permissions = {
 }
 
 
+all_roles = (
+    AskAnnaPublicViewer,
+    AskAnnaMember,
+    AskAnnaAdmin,
+    WorkspaceNoMember,
+    WorkspacePublicViewer,
+    WorkspaceViewer,
+    WorkspaceMember,
+    WorkspaceAdmin,
+    ProjectNoMember,
+    ProjectPublicViewer,
+    ProjectViewer,
+    ProjectMember,
+    ProjectAdmin,
+)
+
+# If multiple roles have the same code, the first role is used
+role_mapping = {role.code: role for role in reversed(all_roles)}
+
+
+def compile_role_permissions():
+    """
+    Compile the permission sets of all roles, so checking a permission of a role is a set lookup
+    """
+    for role in all_roles:
+        role.permission_set()
+
+
+compile_role_permissions()
+
+
 def get_role_class(
     role_code: str,
 ) -> (
@@ -314,22 +351,6 @@ def get_role_class(
     | type[ProjectAdmin]
 ):
     """Get the role class by the role code. If multiple classes have the same code, then return the first class."""
-    role_mapping = {
-        AskAnnaPublicViewer.code: AskAnnaPublicViewer,
-        AskAnnaMember.code: AskAnnaMember,
-        AskAnnaAdmin.code: AskAnnaAdmin,
-        WorkspaceNoMember.code: WorkspaceNoMember,
-        WorkspacePublicViewer.code: WorkspacePublicViewer,
-        WorkspaceViewer.code: WorkspaceViewer,
-        WorkspaceMember.code: WorkspaceMember,
-        WorkspaceAdmin.code: WorkspaceAdmin,
-        ProjectNoMember.code: ProjectNoMember,
-        ProjectPublicViewer.code: ProjectPublicViewer,
-        ProjectViewer.code: ProjectViewer,
-        ProjectMember.code: ProjectMember,
-        ProjectAdmin.code: ProjectAdmin,
-    }
-
     return role_mapping[role_code]
 
 
@@ -340,14 +361,9 @@ def merge_role_permissions(roles: list) -> dict[str, bool]:
     """
 
     permissions = {}
-    true_permissions = {}
-
     for role in roles:
-        role_permissions = role.full_permissions()
-        permissions.update(role_permissions)
-        role_true_permissions = role.true_permissions()
-        true_permissions.update(role_true_permissions)
-
-    permissions.update(true_permissions)
+        permission_set = role.permission_set()
+        for permission in role.__object_permissions__():
+            permissions[permission] = permissions.get(permission, False) or permission in permission_set
 
     return dict(sorted(permissions.items()))
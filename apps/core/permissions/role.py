@@ -24,16 +24,10 @@ class RoleBasedPermission(rest_permissions.BasePermission):
     """
 
     def _has_rbac_permission_in_request_user_roles(self, required_permissions, request_user_roles):
+        required_permissions = frozenset(required_permissions)
         return any(
-            map(
-                lambda request_user_role: any(
-                    map(
-                        lambda required_permission: required_permission in request_user_role.permissions(),
-                        required_permissions,
-                    )
-                ),
-                request_user_roles,
-            )
+            not required_permissions.isdisjoint(request_user_role.permission_set())
+            for request_user_role in request_user_roles
         )
 
     def has_permission(self, request, view):
@@ -0,0 +1,98 @@
+import contextlib
+import contextvars
+import time
+from collections.abc import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.permissions.askanna_roles import get_role_class
+
+# Roles resolved during the current request. Set by `core.middleware.role_cache.RoleCacheMiddleware`, outside a
+# request the roles are only cached in the shared cache.
+request_roles: contextvars.ContextVar[dict | None] = contextvars.ContextVar("request_roles", default=None)
+
+
+@contextlib.contextmanager
+def request_role_cache():
+    """
+    Memoize the roles resolved in the context, for example during a request
+    """
+    token = request_roles.set({})
+    try:
+        yield
+    finally:
+        request_roles.reset(token)
+
+
+def get_user_key(user) -> str:
+    """
+    Anonymous and inactive users get the same roles, so they share the cached roles
+    """
+    if user.is_anonymous or not user.is_active:
+        return "anonymous"
+    return str(user.pk)
+
+
+def get_version_key(object_type: str, object_uuid) -> str:
+    return f"role-cache:version:{object_type}:{object_uuid}"
+
+
+def invalidate_roles(object_type: str, object_uuid):
+    """
+    Invalidate the cached roles of all users for a workspace or project. The roles are not removed from the cache, but
+    the version of the object in the cache key is changed so the cached roles are not used anymore.
+
+    The version is changed again when the transaction is committed, so roles that are cached by another request
+    before the change was committed are not used either.
+    """
+
+    def set_version():
+        cache.set(get_version_key(object_type, object_uuid), time.time_ns(), timeout=None)
+
+    set_version()
+    transaction.on_commit(set_version)
+
+    roles = request_roles.get()
+    if roles:
+        roles.clear()
+
+
+def get_cached_role(user, workspace_uuid, project_uuid, resolve_role: Callable):
+    """
+    Return the role of the user for the project, or for the workspace if `project_uuid` is None. The role is memoized
+    for the request, and shared between requests via the cache for `settings.ROLE_CACHE_TTL` seconds. If the role is
+    not cached, it's resolved by calling `resolve_role`.
+
+    The role of a project depends on the visibility of the workspace too, so the cache key of a project role includes
+    the version of the workspace and the project.
+    """
+    object_type, object_uuid = ("project", project_uuid) if project_uuid else ("workspace", workspace_uuid)
+    user_key = get_user_key(user)
+    memo_key = (object_type, object_uuid, user_key)
+
+    roles = request_roles.get()
+    if roles is not None and memo_key in roles:
+        return roles[memo_key]
+
+    if settings.ROLE_CACHE_TTL:
+        version_keys = [get_version_key("workspace", workspace_uuid)]
+        if project_uuid:
+            version_keys.append(get_version_key("project", project_uuid))
+        versions = cache.get_many(version_keys)
+        version = ":".join(str(versions.get(version_key, 0)) for version_key in version_keys)
+        cache_key = f"role-cache:{object_type}:{object_uuid}:{version}:{user_key}"
+
+        role_code = cache.get(cache_key)
+        if role_code:
+            role = get_role_class(role_code)
+        else:
+            role = resolve_role()
+            cache.set(cache_key, role.code, timeout=settings.ROLE_CACHE_TTL)
+    else:
+        role = resolve_role()
+
+    if roles is not None:
+        roles[memo_key] = role
+    return role
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from account.models.membership import MSP_WORKSPACE
+from core.permissions.role_cache import request_roles
+
+
+def get_member_workspaces_key(user_pk) -> str:
+    return f"visibility:member-workspaces:{user_pk}"
+
+
+def get_member_workspaces(user) -> frozenset:
+    """
+    Return the UUIDs of the workspaces the user is a member of. The set is memoized for the request and shared between
+    requests via the cache for `settings.ROLE_CACHE_TTL` seconds. Anonymous and inactive users are not a member of any
+    workspace.
+    """
+    if user.is_anonymous or not user.is_active:
+        return frozenset()
+
+    memo_key = ("member-workspaces", user.pk)
+    roles = request_roles.get()
+    if roles is not None and memo_key in roles:
+        return roles[memo_key]
+
+    cache_key = get_member_workspaces_key(user.pk)
+    workspaces = cache.get(cache_key) if settings.ROLE_CACHE_TTL else None
+    if workspaces is None:
+        workspaces = frozenset(
+            user.memberships.filter(object_type=MSP_WORKSPACE, deleted_at__isnull=True).values_list(
+                "object_uuid", flat=True
+            )
+        )
+        if settings.ROLE_CACHE_TTL:
+            cache.set(cache_key, workspaces, timeout=settings.ROLE_CACHE_TTL)
+
+    if roles is not None:
+        roles[memo_key] = workspaces
+    return workspaces
+
+
+def invalidate_member_workspaces(user_pk):
+    """
+    Remove the cached workspaces of the user, now and when the transaction is committed
+    """
+
+    def delete():
+        cache.delete(get_member_workspaces_key(user_pk))
+
+    delete()
+    transaction.on_commit(delete)
+
+    roles = request_roles.get()
+    if roles:
+        roles.pop(("member-workspaces", user_pk), None)
+
+
+def get_visibility_filter(user, prefix: str = "") -> Q:
+    """
+    Return the filter for objects that the user has access to, for models with the denormalized `workspace` and
+    `is_public` fields like Run and RunMetric. Use `prefix` to filter on a related model, e.g. `run__`.
+    """
+    public = Q(**{f"{prefix}is_public": True})
+    workspaces = get_member_workspaces(user)
+    if not workspaces:
+        return public
+    return Q(**{f"{prefix}workspace_id__in": workspaces}) | public
+
+
+def get_project_visibility_filter(user, project: str = "project") -> Q:
+    """
+    Return the filter for objects that the user has access to via the workspace and the visibility of the project, for
+    models without the denormalized visibility fields. `project` is the path to the project, e.g. `jobdef__project`.
+    """
+    public = Q(**{f"{project}__workspace__visibility": "PUBLIC"}) & Q(**{f"{project}__visibility": "PUBLIC"})
+    workspaces = get_member_workspaces(user)
+    if not workspaces:
+        return public
+    return Q(**{f"{project}__workspace_id__in": workspaces}) | public
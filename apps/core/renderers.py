@@ -0,0 +1,15 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renderer for views that return a stream of server-sent events. The view returns a StreamingHttpResponse, so the
+    renderer is only used to accept requests with the `text/event-stream` media type.
+    """
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
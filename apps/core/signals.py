@@ -1,8 +1,11 @@
+from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from core.models import ActiveModel
+
 
 @receiver(post_save, sender=get_user_model())
 def create_user_api_key_signal(sender, instance, created, **kwargs):
@@ -12,3 +15,28 @@ def create_user_api_key_signal(sender, instance, created, **kwargs):
 
     if created:
         Token.objects.create(user=instance)
+
+
+@receiver(post_save)
+def propagate_is_active(sender, instance, update_fields=None, **kwargs):
+    """
+    When an instance is deleted or restored, update `is_active` of the instances it's a parent of. A restored instance
+    is only active again if its parents are active.
+    """
+    if not update_fields or "deleted_at" not in update_fields:
+        return
+
+    if issubclass(sender, ActiveModel) and instance.deleted_at is None:
+        instance.is_active = sender._default_manager.filter(sender.get_active_filter(), pk=instance.pk).exists()
+        sender._default_manager.filter(pk=instance.pk).update(is_active=instance.is_active)
+
+    label = sender._meta.concrete_model._meta.label
+    for model in apps.get_models():
+        if not issubclass(model, ActiveModel) or label not in model.active_parents:
+            continue
+
+        children = model._default_manager.filter(**{model.active_parents[label]: instance})
+        if instance.deleted_at:
+            children.filter(is_active=True).update(is_active=False)
+        else:
+            model.update_is_active(children)
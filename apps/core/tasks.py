@@ -11,6 +11,14 @@ celery_app.conf.beat_schedule = {
         "task": "job.tasks.fix_missed_scheduledjobs",
         "schedule": crontab(minute="1-58/5"),
     },
+    "askanna.dispatch_run_outbox": {
+        "task": "run.tasks.dispatch_run_outbox",
+        "schedule": crontab(minute="*"),
+    },
+    "askanna.reconcile_run_resources": {
+        "task": "job.tasks.reconcile_run_resources",
+        "schedule": crontab(minute="*/5"),
+    },
     "askanna.clean_containers_after_run": {
         "task": "job.tasks.clean_containers_after_run",
         "schedule": crontab(minute="2-58/5"),
@@ -3,7 +3,7 @@ import unittest
 import pytest
 from django.conf import settings
 
-from core.config import AskAnnaConfig
+from core.config import AskAnnaConfig, Resources
 from core.utils.config import get_setting
 
 pytestmark = pytest.mark.django_db
@@ -87,3 +87,55 @@ class TestAskAnnaConfig(unittest.TestCase):
                 ]
             },
         }
+
+
+class TestResources(unittest.TestCase):
+    def test_resources(self):
+        config = AskAnnaConfig.from_stream(
+            "resources:\n"
+            "  cpus: 2\n"
+            "  memory: 4g\n"
+            "job1:\n"
+            "  job:\n"
+            "    - python train.py\n"
+            "  resources:\n"
+            "    memory: 512m\n"
+            "job2:\n"
+            "  job:\n"
+            "    - python train.py\n"
+            "  resources:\n"
+            "    cpus: -1\n"
+            "    memory: a lot\n"
+        )
+        self.assertEqual(config.jobs["job1"].resources, Resources(cpus=2.0, memory=512 * 1024**2))
+        self.assertEqual(config.jobs["job2"].resources, Resources(cpus=2.0, memory=4 * 1024**3))
+
+    def test_default_resources(self):
+        config = AskAnnaConfig.from_stream("job1:\n  job:\n    - python train.py\n")
+        self.assertEqual(config.jobs["job1"].resources, Resources(cpus=4.0, memory=20 * 1024**3))
+
+
+class TestScheduleCatchUp(unittest.TestCase):
+    def test_catch_up(self):
+        config = AskAnnaConfig.from_stream(
+            "job1:\n"
+            "  job:\n"
+            "    - python train.py\n"
+            "  catch_up: once\n"
+            "  schedule:\n"
+            "    - '@hourly'\n"
+            "    - minute: 30\n"
+            "      catch_up: all\n"
+            "    - minute: 45\n"
+            "      catch_up: sometimes\n"
+            "job2:\n"
+            "  job:\n"
+            "    - python train.py\n"
+            "  schedule:\n"
+            "    - '@daily'\n"
+        )
+        schedules = config.jobs["job1"].schedules
+        self.assertEqual([schedule.catch_up for schedule in schedules], ["ONCE", "ALL", "ONCE"])
+        self.assertEqual(schedules[1].raw_definition, {"minute": 30})
+        self.assertEqual(schedules[1].cron_definition, "30 0 * * *")
+        self.assertEqual(config.jobs["job2"].schedules[0].catch_up, "SKIP")
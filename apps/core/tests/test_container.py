@@ -1,6 +1,12 @@
+import threading
+import time
 import unittest
 
-from core.container import get_descriptive_docker_error
+import redis
+from django.conf import settings
+from django.test import override_settings
+
+from core.container import BuildLock, RegistryImageHelper, get_descriptive_docker_error
 
 
 class TestContainerMessage(unittest.TestCase):
@@ -13,3 +19,140 @@ class TestContainerMessage(unittest.TestCase):
             get_descriptive_docker_error("unauthorized access"),
             "We could not authenticate you to the registry. Please check the environment username and password.",
         )
+
+
+class FakeRegistryData:
+    def __init__(self, digest: str):
+        self.id = digest
+
+
+class FakeImages:
+    def __init__(self, digest: str):
+        self.digest = digest
+        self.registry_data_calls = 0
+
+    def get_registry_data(self, image_path, auth_config=None):
+        self.registry_data_calls += 1
+        return FakeRegistryData(self.digest)
+
+
+class FakeDockerClient:
+    def __init__(self, digest: str):
+        self.images = FakeImages(digest)
+        self.login_calls = 0
+
+    def login(self, **kwargs):
+        self.login_calls += 1
+        return {"Status": "Login Succeeded"}
+
+
+class TestRegistryImageDigest(unittest.TestCase):
+    digest = "sha256:" + "a" * 64
+
+    def setUp(self):
+        self.client = FakeDockerClient(self.digest)
+
+    def tearDown(self):
+        RegistryImageHelper(client=self.client, image_path="askanna/test:latest").invalidate_image_digest()
+        RegistryImageHelper(
+            client=self.client, image_path="askanna/test:latest", username="user", password="pass"
+        ).invalidate_image_digest()
+
+    def test_digest_is_cached(self):
+        image_helper = RegistryImageHelper(client=self.client, image_path="askanna/test:latest")
+        self.assertEqual(image_helper.image_digest, self.digest)
+        self.assertEqual(image_helper.image_short_id, "a" * 12)
+
+        image_helper = RegistryImageHelper(client=self.client, image_path="askanna/test:latest")
+        self.assertEqual(image_helper.image_digest, self.digest)
+        self.assertEqual(self.client.images.registry_data_calls, 1)
+
+    def test_digest_cache_key_uses_credentials(self):
+        image_helper = RegistryImageHelper(client=self.client, image_path="askanna/test:latest")
+        image_helper_credentials = RegistryImageHelper(
+            client=self.client, image_path="askanna/test:latest", username="user", password="pass"
+        )
+        self.assertNotEqual(image_helper.image_digest_cache_key, image_helper_credentials.image_digest_cache_key)
+        self.assertNotIn("pass", image_helper_credentials.image_digest_cache_key)
+        # The fingerprint of the credentials depends on the secret key
+        cache_key = image_helper_credentials.image_digest_cache_key
+        with override_settings(SECRET_KEY="other-secret-key"):
+            self.assertNotEqual(image_helper_credentials.image_digest_cache_key, cache_key)
+
+        image_helper.get_image_digest()
+        self.assertEqual(self.client.login_calls, 0)
+        image_helper_credentials.get_image_digest()
+        self.assertEqual(self.client.login_calls, 1)
+        self.assertEqual(self.client.images.registry_data_calls, 2)
+
+    def test_invalidate_digest(self):
+        image_helper = RegistryImageHelper(client=self.client, image_path="askanna/test:latest")
+        image_helper.get_image_digest()
+        image_helper.invalidate_image_digest()
+        image_helper.get_image_digest()
+        self.assertEqual(self.client.images.registry_data_calls, 2)
+
+    @override_settings(REGISTRY_DIGEST_CACHE_TTL=0)
+    def test_digest_cache_disabled(self):
+        RegistryImageHelper(client=self.client, image_path="askanna/test:latest").get_image_digest()
+        RegistryImageHelper(client=self.client, image_path="askanna/test:latest").get_image_digest()
+        self.assertEqual(self.client.images.registry_data_calls, 2)
+
+    def test_pinned_digest(self):
+        pinned_digest = "sha256:" + "b" * 64
+        image_helper = RegistryImageHelper(client=self.client, image_path=f"askanna/test@{pinned_digest}")
+        self.assertEqual(image_helper.pinned_digest, pinned_digest)
+        self.assertEqual(image_helper.image_digest, pinned_digest)
+        self.assertEqual(self.client.images.registry_data_calls, 0)
+
+
+class TestBuildLock(unittest.TestCase):
+    def setUp(self):
+        self.redis = redis.Redis.from_url(settings.REDIS_URL)
+        self.lock = BuildLock(self.redis, name="test-build-lock", ttl=1)
+
+    def tearDown(self):
+        self.lock.release()
+        self.redis.delete(self.lock.key)
+
+    def test_acquire_and_release(self):
+        self.assertTrue(self.lock.acquire())
+        self.assertGreater(self.redis.ttl(self.lock.key), 0)
+
+        other_lock = BuildLock(self.redis, name="test-build-lock", ttl=1)
+        self.assertFalse(other_lock.acquire())
+        # Releasing a lock held by someone else does not remove the lock
+        other_lock.release()
+        self.assertTrue(self.lock.is_locked())
+
+        self.lock.release()
+        self.assertFalse(self.lock.is_locked())
+        self.assertTrue(other_lock.acquire())
+        other_lock.release()
+
+    def test_heartbeat_extends_lock(self):
+        self.lock.acquire()
+        time.sleep(1.5)
+        self.assertTrue(self.lock.is_locked())
+
+    def test_wait_notified_on_release(self):
+        self.lock.acquire()
+        waiter = BuildLock(self.redis, name="test-build-lock", ttl=10)
+
+        timer = threading.Timer(0.2, self.lock.release)
+        timer.start()
+        start = time.monotonic()
+        self.assertTrue(waiter.wait(timeout=5))
+        self.assertLess(time.monotonic() - start, 2)
+        timer.join()
+
+    def test_wait_for_expired_lock(self):
+        self.lock.acquire()
+        # Stop the heartbeat without releasing the lock, like a build that crashed
+        self.lock.heartbeat_stop.set()
+        self.assertTrue(self.lock.wait(timeout=5))
+        self.assertFalse(self.lock.is_locked())
+
+    def test_wait_timeout(self):
+        self.lock.acquire()
+        self.assertFalse(BuildLock(self.redis, name="test-build-lock", ttl=1).wait(timeout=0.5))
@@ -1,5 +1,7 @@
 from core.models import Setting
 from package.models import Package
+from run.models import Run
+from variable.models import Variable
 
 
 def test_base_model_not_uuid(db):
@@ -27,3 +29,46 @@ def test_file_base_model_filename(db):
 
     Package.file_extension = ""
     assert new_run_result.filename == f"{new_run_result.file_type}_{new_run_result.uuid.hex}"
+
+
+def test_active_model_to_deleted(test_jobs):
+    job = test_jobs.get("job_private")
+    variable = Variable.objects.create(name="test", value="value", project=job.project)
+    run = Run.objects.create(jobdef=job)
+    assert run.is_active is True
+
+    run.to_deleted()
+    run.refresh_from_db()
+    assert run.is_active is False
+    assert Run.objects.active().filter(pk=run.pk).exists() is False
+    assert Run.objects.inactive().filter(pk=run.pk).exists() is True
+
+    run = Run.objects.create(jobdef=job)
+    job.project.workspace.to_deleted()
+    for instance in (job.project, job, variable, run):
+        instance.refresh_from_db()
+        assert instance.is_active is False
+        assert type(instance).objects.active().filter(pk=instance.pk).exists() is False
+
+
+def test_active_model_restore(test_jobs):
+    job = test_jobs.get("job_private")
+    run = Run.objects.create(jobdef=job)
+    job.to_deleted()
+    run.refresh_from_db()
+    assert run.is_active is False
+
+    job.deleted_at = None
+    job.save(update_fields=["deleted_at", "modified_at"])
+    run.refresh_from_db()
+    assert job.is_active is True
+    assert run.is_active is True
+
+    job.project.to_deleted()
+    job.to_deleted()
+    job.deleted_at = None
+    job.save(update_fields=["deleted_at", "modified_at"])
+    job.refresh_from_db()
+    run.refresh_from_db()
+    assert job.is_active is False
+    assert run.is_active is False
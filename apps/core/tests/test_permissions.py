@@ -0,0 +1,61 @@
+from io import StringIO
+from types import SimpleNamespace
+
+from django.core.management import call_command
+
+from core.permissions.askanna_roles import (
+    AskAnnaMember,
+    ProjectAdmin,
+    ProjectPublicViewer,
+    WorkspacePublicViewer,
+    all_roles,
+    get_role_class,
+    merge_role_permissions,
+)
+from core.permissions.role import RoleBasedPermission
+
+
+def test_permission_set():
+    for role in all_roles:
+        assert role.permission_set() == {
+            permission for permission, roles in role.__object_permissions__().items() if role in roles
+        }
+        assert role.permissions() == [permission for permission, value in role.full_permissions().items() if value]
+        assert get_role_class(role.code) == role
+
+    assert "project.info.edit" in ProjectAdmin.permission_set()
+    assert "project.info.edit" not in ProjectPublicViewer.permission_set()
+
+
+def test_merge_role_permissions():
+    permissions = merge_role_permissions([ProjectPublicViewer, ProjectAdmin])
+    assert permissions["project.info.view"] is True
+    assert permissions["project.info.edit"] is True
+    assert list(permissions) == sorted(permissions)
+
+    permissions = merge_role_permissions([AskAnnaMember, ProjectPublicViewer])
+    assert permissions["askanna.member"] is True
+    assert permissions["project.info.view"] is True
+    assert permissions["project.info.edit"] is False
+
+
+def test_role_based_permission():
+    permission = RoleBasedPermission()
+    request = SimpleNamespace(user_roles=[AskAnnaMember, WorkspacePublicViewer, ProjectPublicViewer])
+    view = SimpleNamespace(
+        action="list",
+        rbac_permissions_by_action={"list": ["project.info.view"], "update": ["project.info.edit"], "retrieve": []},
+    )
+    assert permission.has_permission(request, view) is True
+
+    view.action = "update"
+    assert permission.has_permission(request, view) is False
+
+    view.action = "retrieve"
+    assert permission.has_permission(request, view) is True
+
+
+def test_benchmark_permissions():
+    out = StringIO()
+    call_command("benchmark_permissions", number=10, stdout=out)
+    assert "has_permission (granted)" in out.getvalue()
@@ -0,0 +1,70 @@
+from django.test import override_settings
+
+from account.models.membership import Membership
+from core.permissions.askanna_roles import (
+    ProjectNoMember,
+    ProjectPublicViewer,
+    WorkspaceAdmin,
+    WorkspaceMember,
+    WorkspaceNoMember,
+    WorkspacePublicViewer,
+)
+from core.permissions.role_cache import request_role_cache
+
+
+def test_role_cache_request_memo(test_users, test_workspaces, test_memberships, django_assert_num_queries):
+    user = test_users.get("workspace_admin")
+    workspace = test_workspaces.get("workspace_private")
+
+    with override_settings(ROLE_CACHE_TTL=0), request_role_cache():
+        with django_assert_num_queries(1):
+            assert Membership.get_workspace_role(user, workspace) == WorkspaceAdmin
+        with django_assert_num_queries(0):
+            assert Membership.get_workspace_role(user, workspace) == WorkspaceAdmin
+
+    with override_settings(ROLE_CACHE_TTL=0), django_assert_num_queries(1):
+        assert Membership.get_workspace_role(user, workspace) == WorkspaceAdmin
+
+
+def test_role_cache_shared_between_requests(test_users, test_workspaces, test_memberships, django_assert_num_queries):
+    user = test_users.get("workspace_member")
+    workspace = test_workspaces.get("workspace_private")
+
+    with django_assert_num_queries(1):
+        assert Membership.get_workspace_role(user, workspace) == WorkspaceMember
+    with django_assert_num_queries(0):
+        assert Membership.get_workspace_role(user, workspace) == WorkspaceMember
+
+
+def test_role_cache_invalidated_by_membership(test_users, test_workspaces, test_memberships):
+    user = test_users.get("workspace_member")
+    workspace = test_workspaces.get("workspace_private")
+    membership = test_memberships.get("workspace_private_member")
+
+    with request_role_cache():
+        assert Membership.get_workspace_role(user, workspace) == WorkspaceMember
+
+        membership.role = "WA"
+        membership.save()
+        assert Membership.get_workspace_role(user, workspace) == WorkspaceAdmin
+
+        membership.delete()
+        assert Membership.get_workspace_role(user, workspace) == WorkspaceNoMember
+
+
+def test_role_cache_invalidated_by_visibility(test_users, test_workspaces, test_projects):
+    anonymous_user = test_users.get("workspace_admin")
+    anonymous_user.is_active = False
+    workspace = test_workspaces.get("workspace_private")
+    project = test_projects.get("project_private")
+
+    assert Membership.get_project_role(anonymous_user, project) == ProjectNoMember
+    assert Membership.get_workspace_role(anonymous_user, workspace) == WorkspaceNoMember
+
+    workspace.visibility = "PUBLIC"
+    workspace.save()
+    assert Membership.get_workspace_role(anonymous_user, workspace) == WorkspacePublicViewer
+
+    project.visibility = "PUBLIC"
+    project.save()
+    assert Membership.get_project_role(anonymous_user, project) == ProjectPublicViewer
@@ -1,8 +1,16 @@
+import io
+import json
+
 import pytest
 from django.http import HttpResponseNotFound, StreamingHttpResponse
 from django.test import RequestFactory
 
-from core.utils.utils import stream
+from core.utils.utils import (
+    append_to_json_array_file,
+    batched,
+    iterate_json_array,
+    stream,
+)
 
 
 @pytest.fixture
@@ -31,3 +39,53 @@ def test_stream_file_not_found(request_factory, tmp_path):
     response = stream(request, tmp_path / "test_file_not_exist_.txt", "text/plain", 100)
     assert response.status_code == 404
     assert isinstance(response, HttpResponseNotFound)
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 2)) == []
+
+
+def test_batched_invalid_size():
+    with pytest.raises(ValueError):
+        list(batched(range(5), 0))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1024])
+def test_iterate_json_array(chunk_size):
+    items = [{"name": "foo", "value": [1, "]", {"bar": None}]}, 12345678, -1.5e-07, "text", True, None, []]
+    for content in (json.dumps(items), json.dumps(items, indent=2)):
+        assert list(iterate_json_array(io.StringIO(content), chunk_size=chunk_size)) == items
+
+
+def test_iterate_json_array_empty():
+    assert list(iterate_json_array(io.StringIO(" [ ] "))) == []
+
+
+@pytest.mark.parametrize("content", ["", "{}", "[1,", "[1 2]", "[1,]", "[{"])
+def test_iterate_json_array_invalid(content):
+    with pytest.raises(json.JSONDecodeError):
+        list(iterate_json_array(io.StringIO(content), chunk_size=2))
+
+
+@pytest.mark.parametrize(
+    "content", ["[]", "[ ]\n", json.dumps([{"name": "foo"}, 1]), json.dumps([1, 2], indent=2) + "\n"]
+)
+def test_append_to_json_array_file(tmp_path, content):
+    filepath = tmp_path / "items.json"
+    filepath.write_text(content)
+
+    append_to_json_array_file(filepath, [{"name": "bar", "value": [1, 2]}, None])
+    append_to_json_array_file(filepath, [])
+    append_to_json_array_file(filepath, ["baz"])
+
+    assert json.loads(filepath.read_text()) == json.loads(content) + [{"name": "bar", "value": [1, 2]}, None, "baz"]
+
+
+@pytest.mark.parametrize("content", ["", "{}", "[1, 2"])
+def test_append_to_json_array_file_invalid(tmp_path, content):
+    filepath = tmp_path / "items.json"
+    filepath.write_text(content)
+
+    with pytest.raises(ValueError):
+        append_to_json_array_file(filepath, [1])
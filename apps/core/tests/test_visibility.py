@@ -0,0 +1,45 @@
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Q
+
+from account.models.membership import MSP_WORKSPACE, WS_MEMBER, Membership
+from core.permissions.visibility import (
+    get_member_workspaces,
+    get_project_visibility_filter,
+    get_visibility_filter,
+)
+
+
+def test_member_workspaces(test_users, test_workspaces, test_memberships, django_assert_num_queries):
+    user = test_users.get("workspace_member")
+    workspace_private = test_workspaces.get("workspace_private")
+    workspace_public = test_workspaces.get("workspace_public")
+
+    with django_assert_num_queries(1):
+        assert get_member_workspaces(user) == {workspace_private.uuid}
+    with django_assert_num_queries(0):
+        assert get_member_workspaces(user) == {workspace_private.uuid}
+
+    membership = Membership.objects.create(
+        user=user,
+        object_uuid=workspace_public.uuid,
+        object_type=MSP_WORKSPACE,
+        role=WS_MEMBER,
+    )
+    assert get_member_workspaces(user) == {workspace_private.uuid, workspace_public.uuid}
+
+    membership.to_deleted()
+    assert get_member_workspaces(user) == {workspace_private.uuid}
+
+    assert get_member_workspaces(AnonymousUser()) == frozenset()
+
+
+def test_visibility_filter(test_users, test_workspaces, test_memberships):
+    workspace_private = test_workspaces.get("workspace_private")
+
+    assert get_visibility_filter(AnonymousUser()) == Q(is_public=True)
+    assert get_visibility_filter(test_users.get("workspace_member"), prefix="run__") == Q(
+        run__workspace_id__in={workspace_private.uuid}
+    ) | Q(run__is_public=True)
+    assert get_project_visibility_filter(AnonymousUser(), project="jobdef__project") == Q(
+        jobdef__project__workspace__visibility="PUBLIC"
+    ) & Q(jobdef__project__visibility="PUBLIC")
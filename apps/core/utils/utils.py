@@ -1,10 +1,14 @@
 import datetime
+import fcntl
+import itertools
 import json
 import os
 import re
 import zoneinfo
+from collections.abc import Iterable, Iterator
 from functools import reduce
 from pathlib import Path
+from typing import TextIO
 from wsgiref.util import FileWrapper
 from zipfile import ZipFile
 
@@ -118,6 +122,117 @@ def is_jsonfile(filepath: Path) -> bool:
     return True
 
 
+def iterate_json_array(file: TextIO, chunk_size: int = 1024 * 1024) -> Iterator:
+    """
+    Iterate over the items of a JSON array stored in a file without loading the full file in memory. The file is read
+    in chunks of `chunk_size` characters and every item is decoded and yielded as soon as it's complete.
+
+    Raises a json.JSONDecodeError when the file does not contain a valid JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    end_of_file = False
+
+    def read_more() -> bool:
+        nonlocal buffer, position, end_of_file
+        if end_of_file:
+            return False
+        chunk = file.read(chunk_size)
+        if not chunk:
+            end_of_file = True
+            return False
+        # Drop the part of the buffer that is already processed
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def next_character() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not read_more():
+                return ""
+
+    if next_character() != "[":
+        raise json.JSONDecodeError("Expecting '['", buffer, position)
+    position += 1
+
+    if next_character() == "]":
+        return
+
+    while True:
+        if not next_character():
+            raise json.JSONDecodeError("Expecting value", buffer, position)
+
+        while True:
+            try:
+                item, item_end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item is probably not complete yet, try again with more data
+                if read_more():
+                    continue
+                raise
+            # A number at the end of the buffer could continue in the next chunk, so we only accept the item when it's
+            # followed by a separator
+            separator_position = item_end
+            while separator_position < len(buffer) and buffer[separator_position].isspace():
+                separator_position += 1
+            if buffer[separator_position : separator_position + 1] not in (",", "]") and read_more():
+                continue
+            break
+
+        position = item_end
+        yield item
+
+        separator = next_character()
+        position += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position - 1)
+
+
+def append_to_json_array_file(filepath: Path, items: list):
+    """
+    Append items to the JSON array stored in the file without reading or rewriting the existing items. The closing
+    bracket of the array is replaced by the new items and a new closing bracket. The file is locked while appending,
+    so concurrent appends to the same file are written one after the other.
+
+    Raises a ValueError when the file does not end with a JSON array.
+    """
+    if not items:
+        return
+
+    new_items = ", ".join(json.dumps(item) for item in items).encode()
+
+    with filepath.open("r+b") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+        def previous_character(position: int) -> tuple[bytes, int]:
+            while position > 0:
+                position -= 1
+                f.seek(position)
+                character = f.read(1)
+                if not character.isspace():
+                    return character, position
+            return b"", -1
+
+        closing_bracket, closing_position = previous_character(f.seek(0, os.SEEK_END))
+        if closing_bracket != b"]":
+            raise ValueError(f"File '{filepath}' does not end with a JSON array")
+
+        last_character, _ = previous_character(closing_position)
+        separator = b"" if last_character == b"[" else b", "
+
+        f.seek(closing_position)
+        f.truncate()
+        f.write(separator + new_items + b"]")
+
+
 def detect_file_mimetype(filepath: Path) -> str:
     """
     Use libmagic to determine what file we find on `filepath`. If the mimetype is text/plain, we do an additional check
@@ -193,6 +308,19 @@ def flatten(t):
     return [item for sublist in t for item in sublist]
 
 
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """
+    Split an iterable in lists of at most `size` items. The iterable is consumed lazily, so only one batch is kept in
+    memory at a time.
+    """
+    if size < 1:
+        raise ValueError("size must be at least 1")
+
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
 def get_last_modified_in_directory(directory: str, filelist: list) -> datetime.datetime:
     latest_modified = datetime.datetime(1970, 1, 1, 0, 0, 0)
     files = [file for file in filelist if file["parent"].startswith(directory)]
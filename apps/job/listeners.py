@@ -1,9 +1,27 @@
-from django.db.models.signals import pre_delete
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.db.transaction import on_commit
 from django.dispatch import receiver
 
-from job.models import JobPayload
+from job.models import JobPayload, ScheduledJob
+from job.schedule_wheel import ScheduleWheel
 
 
 @receiver(pre_delete, sender=JobPayload)
 def delete_jobpayload(sender, instance, **kwargs):
     instance.prune()
+
+
+@receiver(post_save, sender=ScheduledJob)
+def add_scheduled_job_to_schedule_wheel(sender, instance, **kwargs):
+    """
+    Update the next run time of the scheduled job in the schedule wheel
+    """
+    if settings.SCHEDULE_WHEEL_ENABLED:
+        on_commit(lambda: ScheduleWheel().add(instance))
+
+
+@receiver(post_delete, sender=ScheduledJob)
+def remove_scheduled_job_from_schedule_wheel(sender, instance, **kwargs):
+    if settings.SCHEDULE_WHEEL_ENABLED:
+        on_commit(lambda: ScheduleWheel().remove(instance.uuid))
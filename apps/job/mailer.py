@@ -137,10 +137,7 @@ def send_run_notification(
         else:
             duration_humanized = pretty_time_delta(0)  # we don't have a duration yet
 
-        if run.output.stdout:
-            log = run.output.stdout[-15:]  # only the last 15 lines
-        else:
-            log = []
+        log = run.output.get_log(offset=max(run.output.lines - 15, 0))  # only the last 15 lines
 
         if run.created_at:
             run_created_at = run.created_at.astimezone(tz=zoneinfo.ZoneInfo(job.timezone))
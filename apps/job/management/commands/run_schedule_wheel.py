@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from job.schedule_wheel import ScheduleWheel
+
+
+class Command(BaseCommand):
+    help = "Launch the scheduled jobs when SCHEDULE_WHEEL_ENABLED is set"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.SCHEDULE_WHEEL_POLL_INTERVAL,
+            help="Maximum number of seconds between checks for scheduled jobs to launch",
+        )
+
+    def handle(self, *args, **options):
+        schedule_wheel = ScheduleWheel(poll_interval=options["poll_interval"])
+        try:
+            schedule_wheel.run()
+        except KeyboardInterrupt:
+            self.stdout.write("Schedule wheel stopped")
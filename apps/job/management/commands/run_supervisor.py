@@ -0,0 +1,36 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.utils.config import get_setting
+from job.supervisor import RunSupervisor
+
+
+class Command(BaseCommand):
+    help = "Follow the containers of the runs started by the workers when RUN_SUPERVISOR_ENABLED is set"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-runs",
+            type=int,
+            default=settings.RUN_SUPERVISOR_MAX_RUNS,
+            help="Maximum number of runs followed at the same time",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.RUN_SUPERVISOR_POLL_INTERVAL,
+            help="Seconds between checks for new runs to follow",
+        )
+
+    def handle(self, *args, **options):
+        supervisor = RunSupervisor(
+            max_runs=options["max_runs"],
+            poll_interval=options["poll_interval"],
+            print_log=get_setting(name="DOCKER_PRINT_LOG", default=False, return_type=bool),
+        )
+        try:
+            asyncio.run(supervisor.run())
+        except KeyboardInterrupt:
+            self.stdout.write("Run supervisor stopped")
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("job", "0002_alter_jobpayload_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="jobdef",
+            name="image_status",
+            field=models.CharField(
+                blank=True,
+                choices=[("PENDING", "PENDING"), ("READY", "READY"), ("FAILED", "FAILED")],
+                default="",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="jobdef",
+            name="run_image",
+            field=models.ForeignKey(
+                blank=True,
+                default=None,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="job.runimage",
+            ),
+        ),
+    ]
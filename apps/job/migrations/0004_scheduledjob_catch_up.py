@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("job", "0003_jobdef_image_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scheduledjob",
+            name="catch_up",
+            field=models.CharField(
+                choices=[("SKIP", "SKIP"), ("ONCE", "ONCE"), ("ALL", "ALL")],
+                default="SKIP",
+                help_text="What to do with the runs that were missed, for example because of an outage",
+                max_length=8,
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+def set_is_active(apps, schema_editor):
+    JobDef = apps.get_model("job", "JobDef")  # noqa: N806
+    JobPayload = apps.get_model("job", "JobPayload")  # noqa: N806
+    JobDef.objects.exclude(
+        deleted_at__isnull=True, project__deleted_at__isnull=True, project__workspace__deleted_at__isnull=True
+    ).update(is_active=False)
+    JobPayload.objects.exclude(
+        deleted_at__isnull=True,
+        jobdef__deleted_at__isnull=True,
+        jobdef__project__deleted_at__isnull=True,
+        jobdef__project__workspace__deleted_at__isnull=True,
+    ).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("job", "0004_scheduledjob_catch_up"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="jobdef",
+            name="is_active",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="jobpayload",
+            name="is_active",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="jobdef",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["project"], name="jobdef_active_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="jobpayload",
+            index=models.Index(
+                condition=models.Q(("is_active", True)), fields=["jobdef"], name="jobpayload_active_idx"
+            ),
+        ),
+        migrations.RunPython(set_is_active, reverse_code=migrations.RunPython.noop, elidable=True),
+    ]
@@ -1,24 +1,17 @@
 from django.db import models
 from django.db.models import Q
 
-from core.models import NameDescriptionBaseModel
+from core.models import ActiveModel, NameDescriptionBaseModel
 from core.utils.config import get_setting
+from job.models.runimage import IMAGE_STATUS
 
 
 class JobQuerySet(models.QuerySet):
     def active(self):
-        return self.filter(
-            deleted_at__isnull=True,
-            project__deleted_at__isnull=True,
-            project__workspace__deleted_at__isnull=True,
-        )
+        return self.filter(is_active=True)
 
     def inactive(self):
-        return self.filter(
-            Q(deleted_at__isnull=False)
-            | Q(project__deleted_at__isnull=False)
-            | Q(project__workspace__deleted_at__isnull=False)
-        )
+        return self.filter(is_active=False)
 
 
 class JobManager(models.Manager):
@@ -32,7 +25,7 @@ class JobManager(models.Manager):
         return self.get_queryset().inactive()
 
 
-class JobDef(NameDescriptionBaseModel):
+class JobDef(ActiveModel, NameDescriptionBaseModel):
     name = models.CharField(max_length=255, blank=False, null=False, db_index=True)
 
     environment_image = models.CharField(max_length=2048, blank=True, editable=False)
@@ -40,8 +33,16 @@ class JobDef(NameDescriptionBaseModel):
 
     project = models.ForeignKey("project.Project", on_delete=models.CASCADE, blank=True, null=True)
 
+    # The run image prepared for the job when the latest package was uploaded
+    run_image = models.ForeignKey(
+        "job.RunImage", on_delete=models.SET_NULL, blank=True, null=True, default=None, related_name="+"
+    )
+    image_status = models.CharField(max_length=20, choices=IMAGE_STATUS, blank=True, default="")
+
     objects = JobManager()
 
+    active_parents = {"project.Project": "project", "workspace.Workspace": "project__workspace"}
+
     def __str__(self):
         return f"{self.name} ({self.suuid})"
 
@@ -54,4 +55,5 @@ class JobDef(NameDescriptionBaseModel):
         verbose_name = "Job definition"
         indexes = [
             models.Index(fields=["name", "created_at"]),
+            models.Index(fields=["project"], condition=Q(is_active=True), name="jobdef_active_idx"),
         ]
@@ -5,25 +5,15 @@ from django.conf import settings
 from django.db import models
 from django.db.models import Q
 
-from core.models import FileBaseModel
+from core.models import ActiveModel, FileBaseModel
 
 
 class PayloadQuerySet(models.QuerySet):
     def active(self):
-        return self.filter(
-            deleted_at__isnull=True,
-            jobdef__deleted_at__isnull=True,
-            jobdef__project__deleted_at__isnull=True,
-            jobdef__project__workspace__deleted_at__isnull=True,
-        )
+        return self.filter(is_active=True)
 
     def inactive(self):
-        return self.filter(
-            Q(deleted_at__isnull=False)
-            | Q(jobdef__deleted_at__isnull=False)
-            | Q(jobdef__project__deleted_at__isnull=False)
-            | Q(jobdef__project__workspace__deleted_at__isnull=False)
-        )
+        return self.filter(is_active=False)
 
 
 class PayloadManager(models.Manager):
@@ -37,7 +27,7 @@ class PayloadManager(models.Manager):
         return self.get_queryset().inactive()
 
 
-class JobPayload(FileBaseModel):
+class JobPayload(ActiveModel, FileBaseModel):
     """
     Input for a Run
     """
@@ -46,6 +36,12 @@ class JobPayload(FileBaseModel):
 
     objects = PayloadManager()
 
+    active_parents = {
+        "job.JobDef": "jobdef",
+        "project.Project": "jobdef__project",
+        "workspace.Workspace": "jobdef__project__workspace",
+    }
+
     @property
     def filename(self):
         return "payload.json"
@@ -70,3 +66,6 @@ class JobPayload(FileBaseModel):
     class Meta:
         get_latest_by = "created_at"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["jobdef"], condition=Q(is_active=True), name="jobpayload_active_idx"),
+        ]
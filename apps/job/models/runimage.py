@@ -2,6 +2,14 @@ from django.db import models
 
 from core.models import NameDescriptionBaseModel
 
+# Status of preparing the run image for a job or package before a run starts. An empty status means the image was
+# not prepared in advance.
+IMAGE_STATUS = (
+    ("PENDING", "PENDING"),
+    ("READY", "READY"),
+    ("FAILED", "FAILED"),
+)
+
 
 class RunImage(NameDescriptionBaseModel):
     """
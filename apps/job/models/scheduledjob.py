@@ -6,6 +6,12 @@ from django.db import models
 
 from core.models import BaseModel
 
+CATCH_UP_POLICIES = (
+    ("SKIP", "SKIP"),
+    ("ONCE", "ONCE"),
+    ("ALL", "ALL"),
+)
+
 
 class ScheduledJob(BaseModel):
     job = models.ForeignKey(
@@ -19,6 +25,12 @@ class ScheduledJob(BaseModel):
     raw_definition = models.CharField(max_length=128)
     cron_definition = models.CharField(max_length=128)
     cron_timezone = models.CharField(max_length=64)
+    catch_up = models.CharField(
+        max_length=8,
+        choices=CATCH_UP_POLICIES,
+        default="SKIP",
+        help_text="What to do with the runs that were missed, for example because of an outage",
+    )
 
     member = models.ForeignKey("account.Membership", on_delete=models.CASCADE, null=True)
 
@@ -37,15 +49,20 @@ class ScheduledJob(BaseModel):
             ]
         )
 
-    def update_next(self, current_dt=None):
+    def get_next_run_at(self, current_dt=None) -> datetime.datetime:
+        """
+        Return the datetime in UTC of the first run after `current_dt`, defaults to now
+        """
         timezoned_now = current_dt or datetime.datetime.now(tz=datetime.UTC)
         # transform the timezoned_now to target timezone
         timezoned_now = timezoned_now.astimezone(tz=zoneinfo.ZoneInfo(self.cron_timezone))
 
         it = croniter.croniter(self.cron_definition, timezoned_now)
         next_run_at = it.get_next(ret_type=datetime.datetime)
+        return next_run_at.astimezone(tz=datetime.UTC)
 
-        self.next_run_at = next_run_at.astimezone(tz=datetime.UTC)
+    def update_next(self, current_dt=None):
+        self.next_run_at = self.get_next_run_at(current_dt=current_dt)
         self.save(
             update_fields=[
                 "next_run_at",
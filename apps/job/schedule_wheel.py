@@ -0,0 +1,181 @@
+import datetime
+import logging
+import time
+
+import redis
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from config.celery_app import app as celery_app
+
+from core.utils import batched
+from job.models import ScheduledJob
+from job.tasks.schedules import (
+    create_scheduled_runs,
+    get_launchable_scheduled_jobs,
+    has_member,
+    start_runs,
+)
+from run.models import Run
+
+logger = logging.getLogger(__name__)
+
+# Lua script to take the scheduled jobs that are due from the sorted set. Taking them in one script makes sure a
+# scheduled job is launched by one schedule wheel only, also when multiple schedule wheels are running.
+CLAIM_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[1], due[i])
+end
+return due
+"""
+
+
+class ScheduleWheel:
+    """
+    Launch scheduled jobs at their next run time. The next run time of every scheduled job is kept in a sorted set in
+    Redis, so the schedule wheel only has to look at the scheduled jobs that are due instead of scanning the database
+    every minute. The schedule wheel sleeps until the next scheduled job is due, or at most `poll_interval` seconds to
+    pick up changed schedules.
+
+    Scheduled jobs are added to and removed from the sorted set when they are saved or deleted, see `job.listeners`.
+    When the schedule wheel starts, the sorted set is rebuilt from the database.
+
+    A scheduled job that is due more than `settings.SCHEDULE_MISFIRE_GRACE_TIME` seconds ago was missed, for example
+    because of an outage. What happens with missed runs depends on the catch up policy of the schedule:
+    - SKIP: no run is started and a notification is sent
+    - ONCE: one run is started
+    - ALL: a run is started for every missed run, with a maximum of `settings.SCHEDULE_CATCH_UP_MAX_RUNS`
+    """
+
+    key = "schedule-wheel:next-runs"
+
+    def __init__(self, redis_client: redis.Redis | None = None, poll_interval: float | None = None):
+        self.redis = redis_client or redis.Redis.from_url(settings.REDIS_URL)
+        self.poll_interval = poll_interval or settings.SCHEDULE_WHEEL_POLL_INTERVAL
+        self.claim_due_script = self.redis.register_script(CLAIM_DUE_SCRIPT)
+
+    def add(self, scheduled_job: ScheduledJob):
+        if scheduled_job.next_run_at is None:
+            self.remove(scheduled_job.uuid)
+            return
+        self.redis.zadd(self.key, {str(scheduled_job.uuid): scheduled_job.next_run_at.timestamp()})
+
+    def remove(self, scheduled_job_uuid):
+        self.redis.zrem(self.key, str(scheduled_job_uuid))
+
+    def rebuild(self):
+        """
+        Replace the next run times in the sorted set with the next run times stored in the database
+        """
+        next_runs = ScheduledJob.objects.filter(
+            next_run_at__isnull=False,
+            job__is_active=True,
+        ).values_list("uuid", "next_run_at")
+
+        pipeline = self.redis.pipeline()
+        pipeline.delete(self.key)
+        for batch in batched(next_runs.iterator(), 1000):
+            pipeline.zadd(self.key, {str(uuid): next_run_at.timestamp() for uuid, next_run_at in batch})
+        pipeline.execute()
+
+    def claim_due(self, now: float, limit: int = 1000) -> list[str]:
+        """
+        Take the scheduled jobs that are due at `now` from the sorted set and return the UUIDs
+        """
+        due = self.claim_due_script(keys=[self.key], args=[now, limit])
+        return [scheduled_job_uuid.decode() for scheduled_job_uuid in due[::2]]
+
+    def seconds_until_next(self, now: float) -> float:
+        first = self.redis.zrange(self.key, 0, 0, withscores=True)
+        if not first:
+            return float("inf")
+        return first[0][1] - now
+
+    def get_number_of_runs(self, scheduled_job: ScheduledJob, now: datetime.datetime) -> int:
+        """
+        Return the number of runs to start for a scheduled job that is due, based on the catch up policy if runs were
+        missed
+        """
+        next_run_at = scheduled_job.next_run_at
+        if now - next_run_at <= datetime.timedelta(seconds=settings.SCHEDULE_MISFIRE_GRACE_TIME):
+            return 1
+
+        if scheduled_job.catch_up == "ONCE":
+            return 1
+
+        if scheduled_job.catch_up == "ALL":
+            number_of_runs = 0
+            while next_run_at <= now and number_of_runs < settings.SCHEDULE_CATCH_UP_MAX_RUNS:
+                number_of_runs += 1
+                next_run_at = scheduled_job.get_next_run_at(current_dt=next_run_at)
+            return number_of_runs
+
+        return 0
+
+    def fire(self, now: float | None = None) -> list[Run]:
+        """
+        Launch the scheduled jobs that are due and add their next run times to the sorted set. Returns the runs that
+        are created.
+        """
+        now = time.time() if now is None else now
+        due = self.claim_due(now)
+        if not due:
+            return []
+
+        now_dt = datetime.datetime.fromtimestamp(now, tz=datetime.UTC)
+        with transaction.atomic():
+            # A scheduled job that is locked is being launched by another schedule wheel, which adds the next run time
+            # to the sorted set when it's done
+            scheduled_jobs = list(
+                get_launchable_scheduled_jobs().filter(pk__in=due).select_for_update(skip_locked=True, of=("self",))
+            )
+
+            launch = []
+            missed = []
+            modified_at = timezone.now()
+            for scheduled_job in scheduled_jobs:
+                if scheduled_job.next_run_at is None or scheduled_job.next_run_at > now_dt:
+                    # The sorted set was not up to date, only the next run time has to be added again
+                    continue
+
+                number_of_runs = self.get_number_of_runs(scheduled_job, now_dt) if has_member(scheduled_job) else 0
+                if number_of_runs:
+                    launch += [scheduled_job] * number_of_runs
+                    scheduled_job.last_run_at = now_dt
+                else:
+                    missed.append(scheduled_job.job.uuid)
+                scheduled_job.next_run_at = scheduled_job.get_next_run_at(current_dt=now_dt)
+                scheduled_job.modified_at = modified_at
+
+            runs = create_scheduled_runs(launch) if launch else []
+            ScheduledJob.objects.bulk_update(scheduled_jobs, ["last_run_at", "next_run_at", "modified_at"])
+
+            def on_commit():
+                start_runs([run.uuid for run in runs])
+                for job_uuid in missed:
+                    celery_app.send_task(
+                        "job.tasks.send_missed_schedule_notification",
+                        kwargs={"job_uuid": job_uuid},
+                    )
+                for scheduled_job in scheduled_jobs:
+                    self.add(scheduled_job)
+
+            transaction.on_commit(on_commit)
+
+        return runs
+
+    def run(self):
+        logger.info("Schedule wheel started")
+        self.rebuild()
+        while True:
+            close_old_connections()
+            try:
+                self.fire()
+            except Exception:
+                logger.exception("Error while launching scheduled jobs")
+                # Scheduled jobs that were taken from the sorted set but not launched, are added again
+                self.rebuild()
+
+            time.sleep(max(min(self.poll_interval, self.seconds_until_next(time.time())), 0))
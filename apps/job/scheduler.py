@@ -0,0 +1,312 @@
+import collections
+import dataclasses
+import json
+import logging
+import time
+
+import docker
+import redis
+from django.conf import settings
+
+from config.celery_app import app as celery_app
+
+from core.config import Resources
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class DockerEndpoint:
+    """
+    A Docker daemon runs are placed on. If `cpus` or `memory` is None, the capacity is not limited.
+    """
+
+    name: str
+    base_url: str
+    cpus: float | None = None
+    memory: int | None = None
+
+    @classmethod
+    def from_dict(cls, endpoint: dict):
+        memory = endpoint.get("memory")
+        return cls(
+            name=endpoint["name"],
+            base_url=endpoint["base_url"],
+            cpus=float(endpoint["cpus"]) if endpoint.get("cpus") is not None else None,
+            memory=docker.utils.parse_bytes(memory) if memory is not None else None,  # type: ignore
+        )
+
+    def get_client(self) -> docker.DockerClient:
+        return docker.DockerClient(base_url=self.base_url)
+
+    def fits(self, resources: Resources, used_cpus: float = 0, used_memory: int = 0) -> bool:
+        return (self.cpus is None or used_cpus + resources.cpus <= self.cpus) and (
+            self.memory is None or used_memory + resources.memory <= self.memory
+        )
+
+
+def get_docker_endpoints() -> list[DockerEndpoint]:
+    return [DockerEndpoint.from_dict(endpoint) for endpoint in settings.RUN_DOCKER_ENDPOINTS]
+
+
+def get_run_priority(trigger: str) -> int:
+    """
+    Return the priority of a run based on what triggered the run, a lower value goes first
+    """
+    return settings.RUN_TRIGGER_PRIORITIES.get(trigger, settings.RUN_DEFAULT_PRIORITY)
+
+
+class RunScheduler:
+    """
+    Place runs on the Docker endpoints based on the CPUs and memory the runs request. The resources allocated to runs
+    are tracked in Redis, so all workers share the same view on the capacity of the endpoints.
+
+    A run is placed on the endpoint that has the least capacity left after placing the run (best fit), so large runs
+    still find an endpoint with enough free capacity. When no endpoint has enough capacity, or the workspace or project
+    reached its concurrency limit, the run is queued. Queued runs are dispatched by priority and round robin over the
+    workspaces when capacity is released, so a workspace that starts many runs does not block the runs of other
+    workspaces.
+    """
+
+    lock_key = "run-scheduler:lock"
+    allocations_key = "run-scheduler:allocations"
+    queued_key = "run-scheduler:queued"
+    rotation_key = "run-scheduler:workspaces"
+
+    def __init__(self, endpoints: list[DockerEndpoint] | None = None, redis_client: redis.Redis | None = None):
+        self.endpoints = {
+            endpoint.name: endpoint for endpoint in (get_docker_endpoints() if endpoints is None else endpoints)
+        }
+        self.redis = redis_client or redis.Redis.from_url(settings.REDIS_URL)
+
+    def get_queue_key(self, priority: int, workspace: str) -> str:
+        return f"run-scheduler:queue:{priority}:{workspace}"
+
+    def get_rotation_key(self, priority: int) -> str:
+        return f"{self.rotation_key}:{priority}"
+
+    def lock(self):
+        return self.redis.lock(self.lock_key, timeout=30, blocking_timeout=30)
+
+    def get_allocations(self) -> dict[str, dict]:
+        return {
+            run_uuid.decode(): json.loads(allocation)
+            for run_uuid, allocation in self.redis.hgetall(self.allocations_key).items()
+        }
+
+    def get_queued_runs(self) -> list[str]:
+        return [run_uuid.decode() for run_uuid in self.redis.hkeys(self.queued_key)]
+
+    def get_usage(self, allocations: dict[str, dict] | None = None) -> dict[str, tuple[float, int]]:
+        """
+        Return the CPUs and memory allocated per endpoint
+        """
+        usage = {name: (0.0, 0) for name in self.endpoints}
+        for allocation in (self.get_allocations() if allocations is None else allocations).values():
+            cpus, memory = usage.get(allocation["endpoint"], (0.0, 0))
+            usage[allocation["endpoint"]] = (cpus + allocation["cpus"], memory + allocation["memory"])
+        return usage
+
+    def get_limit(self, key: str) -> int:
+        """
+        Return the maximum number of runs of a workspace or project that run at the same time, 0 means no limit
+        """
+        workspace_or_project, suuid = key.split(":", maxsplit=1)
+        default = (
+            settings.RUN_CONCURRENCY_LIMIT_WORKSPACE
+            if workspace_or_project == "workspace"
+            else settings.RUN_CONCURRENCY_LIMIT_PROJECT
+        )
+        return settings.RUN_CONCURRENCY_LIMITS.get(suuid, default)
+
+    def get_priorities(self) -> list[int]:
+        return sorted({*settings.RUN_TRIGGER_PRIORITIES.values(), settings.RUN_DEFAULT_PRIORITY})
+
+    def fits_pool(self, resources: Resources) -> bool:
+        """
+        Check if there is an endpoint that could run a run with the resources when no other runs are running
+        """
+        return any(endpoint.fits(resources) for endpoint in self.endpoints.values())
+
+    def find_endpoint(self, resources: Resources, usage: dict[str, tuple[float, int]]) -> DockerEndpoint | None:
+        candidates = [
+            endpoint for endpoint in self.endpoints.values() if endpoint.fits(resources, *usage[endpoint.name])
+        ]
+        if not candidates:
+            return None
+
+        def capacity_left(endpoint: DockerEndpoint) -> tuple[float, float]:
+            used_cpus, used_memory = usage[endpoint.name]
+            return (
+                float("inf") if endpoint.memory is None else endpoint.memory - used_memory - resources.memory,
+                float("inf") if endpoint.cpus is None else endpoint.cpus - used_cpus - resources.cpus,
+            )
+
+        return min(candidates, key=capacity_left)
+
+    def get_endpoint(self, run_uuid: str) -> DockerEndpoint | None:
+        """
+        Return the endpoint the run is placed on
+        """
+        allocation = self.redis.hget(self.allocations_key, str(run_uuid))
+        if allocation is None:
+            return None
+        return self.endpoints.get(json.loads(allocation)["endpoint"])
+
+    def allocate(self, run_uuid: str, endpoint: DockerEndpoint, queued: dict):
+        self.redis.hset(
+            self.allocations_key,
+            str(run_uuid),
+            json.dumps(
+                {
+                    "endpoint": endpoint.name,
+                    "cpus": queued["cpus"],
+                    "memory": queued["memory"],
+                    "workspace": queued["workspace"],
+                    "project": queued["project"],
+                    "allocated_at": time.time(),
+                }
+            ),
+        )
+
+    def enqueue(self, queued: dict, priority: int):
+        if not self.redis.hsetnx(self.queued_key, queued["run_uuid"], json.dumps(queued)):
+            return
+
+        workspace = queued["workspace"]
+        rotation_key = self.get_rotation_key(priority)
+        self.redis.rpush(self.get_queue_key(priority, workspace), json.dumps(queued))
+        if workspace.encode() not in self.redis.lrange(rotation_key, 0, -1):
+            self.redis.rpush(rotation_key, workspace)
+
+    def place(
+        self,
+        run_uuid: str,
+        workspace: str,
+        resources: Resources,
+        project: str = "",
+        priority: int | None = None,
+    ) -> DockerEndpoint | None:
+        """
+        Place the run on an endpoint and return the endpoint. The run is queued behind the runs with the same or a
+        higher priority that wait already. If the run can't be placed right away, None is returned and the run is
+        started again when it's dispatched.
+
+        Args:
+            run_uuid (str): the run to place
+            workspace (str): the SUUID of the workspace of the run
+            resources (Resources): the resources the run requests
+            project (str): the SUUID of the project of the run
+            priority (int, optional): the priority of the run, a lower value goes first. Defaults to
+                `settings.RUN_DEFAULT_PRIORITY`.
+        """
+        priority = settings.RUN_DEFAULT_PRIORITY if priority is None else priority
+        queued = {
+            "run_uuid": str(run_uuid),
+            "workspace": str(workspace),
+            "project": str(project),
+            "cpus": resources.cpus,
+            "memory": resources.memory,
+        }
+
+        with self.lock():
+            endpoint = self.get_endpoint(run_uuid)
+            if endpoint is None:
+                self.enqueue(queued, priority)
+                dispatched = self.dispatch()
+                endpoint = self.get_endpoint(run_uuid)
+            else:
+                dispatched = []
+
+        self.start_runs([run for run in dispatched if run != str(run_uuid)])
+        return endpoint
+
+    def release(self, run_uuid: str) -> list[str]:
+        """
+        Release the resources allocated to the run and dispatch the queued runs that fit in the released capacity.
+        Returns the runs that are dispatched.
+        """
+        if not self.redis.hexists(self.allocations_key, str(run_uuid)) and not self.redis.hexists(
+            self.queued_key, str(run_uuid)
+        ):
+            return []
+
+        with self.lock():
+            self.redis.hdel(self.queued_key, str(run_uuid))
+            if not self.redis.hdel(self.allocations_key, str(run_uuid)):
+                return []
+            dispatched = self.dispatch()
+
+        self.start_runs(dispatched)
+        return dispatched
+
+    def start_runs(self, run_uuids: list[str]):
+        for run_uuid in run_uuids:
+            celery_app.send_task("job.tasks.start_run", kwargs={"run_uuid": run_uuid})
+
+    def dispatch(self) -> list[str]:
+        """
+        Allocate resources to queued runs. Runs with a higher priority go first, and within a priority the next run of
+        each workspace is taken in turn. A workspace or project that reached its concurrency limit is skipped.
+        Dispatching stops when the next run does not fit, so a large run is not starved by smaller runs. Should be
+        called while holding the lock.
+        """
+        allocations = self.get_allocations()
+        usage = self.get_usage(allocations)
+        running = collections.Counter()
+        for allocation in allocations.values():
+            running[f"workspace:{allocation.get('workspace')}"] += 1
+            running[f"project:{allocation.get('project')}"] += 1
+
+        def limit_reached(queued: dict) -> bool:
+            return any(
+                (limit := self.get_limit(key)) and running[key] >= limit
+                for key in (f"workspace:{queued['workspace']}", f"project:{queued['project']}")
+            )
+
+        dispatched = []
+        for priority in self.get_priorities():
+            rotation_key = self.get_rotation_key(priority)
+            skipped = 0
+            while skipped < self.redis.llen(rotation_key):
+                workspace = self.redis.lindex(rotation_key, 0).decode()
+                queue_key = self.get_queue_key(priority, workspace)
+
+                entry = self.redis.lindex(queue_key, 0)
+                if entry is None:
+                    self.redis.lpop(rotation_key)
+                    continue
+
+                queued = json.loads(entry)
+                if not self.redis.hexists(self.queued_key, queued["run_uuid"]):
+                    # The run was removed from the queue, for example because it failed
+                    self.redis.lpop(queue_key)
+                    continue
+
+                if limit_reached(queued):
+                    # Give the next workspace a turn
+                    self.redis.lmove(rotation_key, rotation_key, "LEFT", "RIGHT")
+                    skipped += 1
+                    continue
+
+                resources = Resources(cpus=queued["cpus"], memory=queued["memory"])
+                endpoint = self.find_endpoint(resources, usage)
+                if endpoint is None:
+                    return dispatched
+
+                self.redis.lpop(queue_key)
+                self.redis.hdel(self.queued_key, queued["run_uuid"])
+                self.allocate(queued["run_uuid"], endpoint, queued)
+                cpus, memory = usage[endpoint.name]
+                usage[endpoint.name] = (cpus + resources.cpus, memory + resources.memory)
+                running[f"workspace:{queued['workspace']}"] += 1
+                running[f"project:{queued['project']}"] += 1
+                dispatched.append(queued["run_uuid"])
+                skipped = 0
+
+                # Move the workspace to the end of the rotation
+                self.redis.lpop(rotation_key)
+                if self.redis.llen(queue_key):
+                    self.redis.rpush(rotation_key, workspace)
+
+        return dispatched
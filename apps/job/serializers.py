@@ -26,6 +26,7 @@ class NotificationSerializer(serializers.Serializer):
 class JobSerializer(serializers.ModelSerializer):
     environment = serializers.ReadOnlyField(source="get_environment_image")
     timezone = serializers.ReadOnlyField()
+    image_status = serializers.ReadOnlyField()
     schedules = serializers.SerializerMethodField("get_schedules", allow_null=True)
     notifications = serializers.SerializerMethodField("get_notifications", allow_null=True)
     project = ProjectRelationSerializer(read_only=True)
@@ -63,6 +64,7 @@ class JobSerializer(serializers.ModelSerializer):
             "name",
             "description",
             "environment",
+            "image_status",
             "timezone",
             "schedules",
             "notifications",
@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import docker
+import redis
+from django.conf import settings
+from django.db import connection
+
+from job.scheduler import RunScheduler
+from run.models import Run
+
+logger = logging.getLogger(__name__)
+
+# Redis hash with the runs followed by the run supervisor. The key is the UUID of the run, the value the container ID.
+SUPERVISOR_RUNS_KEY = "run-supervisor:runs"
+# A run supervisor holds a lease on every run it follows, so a run is followed by one run supervisor at a time
+SUPERVISOR_LEASE_KEY = "run-supervisor:lease:{run_uuid}"
+
+
+def get_redis() -> redis.Redis:
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def supervise_run(run: Run, container) -> None:
+    """
+    Register the container of the run, so the run supervisor follows the log and the exit of the container
+    """
+    get_redis().hset(SUPERVISOR_RUNS_KEY, str(run.uuid), container.id)
+
+
+def get_supervised_runs() -> dict[str, str]:
+    """
+    Return the runs registered for the run supervisor as a dictionary with run UUID and container ID
+    """
+    return {
+        run_uuid.decode(): container_id.decode()
+        for run_uuid, container_id in get_redis().hgetall(SUPERVISOR_RUNS_KEY).items()
+    }
+
+
+def remove_supervised_run(run_uuid: str) -> None:
+    get_redis().hdel(SUPERVISOR_RUNS_KEY, run_uuid)
+
+
+def read_log_stream(stream, idle_timeout: float):
+    """
+    Yield the lines of the log stream of a container. The stream is read in a thread, so None can be yielded when no
+    new line was received for `idle_timeout` seconds.
+    """
+    lines = queue.Queue()
+    end = object()
+
+    def read():
+        try:
+            for line in stream:
+                lines.put(line)
+        except Exception as exc:
+            lines.put(exc)
+        finally:
+            lines.put(end)
+
+    threading.Thread(target=read, daemon=True).start()
+    try:
+        while True:
+            try:
+                line = lines.get(timeout=idle_timeout)
+            except queue.Empty:
+                yield None
+                continue
+
+            if line is end:
+                return
+            if isinstance(line, Exception):
+                raise line
+            yield line
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()
+
+
+def follow_run_container(run: Run, container, print_log: bool = False, since: str | None = None):
+    """
+    Follow the log of the container of a run until the container stopped, and set the run to completed or failed.
+
+    Args:
+        run (Run): the run that is running in the container
+        container: the Docker container of the run
+        print_log (bool): print the log lines of the run in the log of the worker
+        since (str, optional): skip log lines with a timestamp up to and including `since`. Used to continue following
+            a container of which a part of the log is already stored.
+    """
+    op = run.output  # type: ignore
+    if since:
+        op.log_idx = op.logqueue.length()
+
+    # The log lines are written to Redis, so the database connection is closed while following the container. Django
+    # reconnects when the status of the run is set. This way following many runs does not hold a database connection
+    # per run.
+    if not connection.in_atomic_block:
+        connection.close()
+
+    logline = []
+    log_stream = read_log_stream(
+        container.logs(stream=True, timestamps=True),  # type: ignore
+        idle_timeout=settings.RUN_LOG_BUFFER_FLUSH_INTERVAL,
+    )
+    for idx, log in enumerate(log_stream):
+        if log is None:
+            # There are no new lines, write the buffered lines to the log queue so they can be read
+            op.flush()
+            continue
+
+        logline = [idx] + log.decode("utf-8").split(sep=" ", maxsplit=1)
+        logline[-1] = logline[-1].rstrip()
+        if since and logline[1] <= since:
+            continue
+        op.log(message=logline[2], timestamp=logline[1], print_log=print_log)
+
+        if logline[-1].startswith("AskAnna exit_code="):
+            op.log("", print_log=print_log)
+            op.log("Run failed", print_log=print_log)
+            return run.to_failed(exit_code=int(logline[-1].replace("AskAnna exit_code=", "")))
+
+        if "askanna-run-utils: command not found" in logline[-1]:
+            op.log(
+                "We could not find an askanna installation on this image.",
+                print_log=print_log,
+            )
+            op.log(
+                "Please follow the instructions on https://docs.askanna.io/ to build your own image.",
+                print_log=print_log,
+            )
+            op.log("", print_log=print_log)
+            op.log("Run failed", print_log=print_log)
+            return run.to_failed()
+
+    if logline and logline[-1] == "Run succeeded":
+        return run.to_completed()
+
+    op.log("", print_log=print_log)
+    op.log("Run failed", print_log=print_log)
+    return run.to_failed()
+
+
+def follow_supervised_run(run_uuid: str, container_id: str, docker_client=None, print_log: bool = False):
+    """
+    Follow a run registered for the run supervisor and remove the registration when the run is finished. If following
+    the run raises, for example because the connection to Docker was lost, the run stays registered and is followed
+    again.
+    """
+    try:
+        run = Run.objects.select_related("output").get(pk=run_uuid)
+    except Run.DoesNotExist:
+        logger.warning(f"Run {run_uuid} registered for the run supervisor does not exist")
+        remove_supervised_run(run_uuid)
+        return
+
+    if not run.is_finished:
+        op = run.output  # type: ignore
+        last_log = op.logqueue.get(start=-1, end=-1)
+        since = last_log[0][1] if last_log else None
+
+        if docker_client is None:
+            endpoint = RunScheduler().get_endpoint(run_uuid)
+            docker_client = (
+                endpoint.get_client() if endpoint else docker.DockerClient(base_url="unix://var/run/docker.sock")
+            )
+        try:
+            container = docker_client.containers.get(container_id)
+        except docker.errors.NotFound:  # type: ignore
+            op.log("The container of the run was not found", print_log=print_log)
+            op.log("", print_log=print_log)
+            op.log("Run failed", print_log=print_log)
+            run.to_failed()
+        else:
+            follow_run_container(run, container, print_log=print_log, since=since)
+        run.refresh_from_db(fields=["status"])
+
+    if run.is_finished:
+        remove_supervised_run(run_uuid)
+
+
+class RunSupervisor:
+    """
+    Follow the containers of many runs in one process. Runs are picked up from the registry in Redis, see
+    `supervise_run`. The Docker client is blocking, so the log stream of each container is read in a thread of a
+    thread pool while the event loop picks up new runs and keeps track of the runs that are followed. A thread only
+    holds a database connection when it reads or sets the status of a run, see `follow_run_container`.
+
+    Multiple run supervisors can run side by side. A run is only followed by the run supervisor that holds the lease on
+    the run. The lease expires after `settings.RUN_SUPERVISOR_LEASE_TTL` seconds and is renewed while the run is
+    followed, so the runs of a run supervisor that stopped are picked up by another one.
+    """
+
+    def __init__(
+        self,
+        max_runs: int | None = None,
+        poll_interval: float | None = None,
+        docker_client=None,
+        print_log: bool = False,
+    ):
+        self.max_runs = max_runs or settings.RUN_SUPERVISOR_MAX_RUNS
+        self.poll_interval = poll_interval or settings.RUN_SUPERVISOR_POLL_INTERVAL
+        self.docker_client = docker_client
+        self.print_log = print_log
+        self.executor = ThreadPoolExecutor(max_workers=self.max_runs, thread_name_prefix="run-supervisor")
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.leases: dict[str, redis.lock.Lock] = {}
+        self.redis = get_redis()
+
+    def claim(self, run_uuid: str) -> bool:
+        """
+        Take the lease on the run, returns False if another run supervisor follows the run
+        """
+        lease = self.redis.lock(
+            SUPERVISOR_LEASE_KEY.format(run_uuid=run_uuid),
+            timeout=settings.RUN_SUPERVISOR_LEASE_TTL,
+            thread_local=False,
+        )
+        if not lease.acquire(blocking=False):
+            return False
+        self.leases[run_uuid] = lease
+        return True
+
+    def release_lease(self, run_uuid: str):
+        lease = self.leases.pop(run_uuid, None)
+        if lease is None:
+            return
+        try:
+            lease.release()
+        except redis.exceptions.LockError:
+            # The lease expired already
+            pass
+
+    def renew_leases(self):
+        for run_uuid, lease in list(self.leases.items()):
+            try:
+                lease.reacquire()
+            except redis.exceptions.LockError:
+                logger.warning(f"The lease on run {run_uuid} expired, the run might be followed by another supervisor")
+
+    def follow_in_thread(self, run_uuid: str, container_id: str):
+        try:
+            follow_supervised_run(run_uuid, container_id, docker_client=self.docker_client, print_log=self.print_log)
+        finally:
+            self.release_lease(run_uuid)
+            # Every run is followed in a thread of the thread pool, close the database connection of the thread
+            connection.close()
+
+    async def follow(self, run_uuid: str, container_id: str):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.follow_in_thread, run_uuid, container_id)
+        except Exception:
+            logger.exception(f"Error while following run {run_uuid}")
+        finally:
+            self.tasks.pop(run_uuid, None)
+
+    async def pick_up_runs(self) -> int:
+        """
+        Start following the registered runs that are not followed yet, up to `max_runs` runs in total. Returns the
+        number of runs picked up.
+        """
+        supervised_runs = await asyncio.to_thread(get_supervised_runs)
+
+        picked_up = 0
+        for run_uuid, container_id in supervised_runs.items():
+            if len(self.tasks) >= self.max_runs:
+                break
+            if run_uuid in self.tasks:
+                continue
+            if not await asyncio.to_thread(self.claim, run_uuid):
+                continue
+            self.tasks[run_uuid] = asyncio.create_task(self.follow(run_uuid, container_id))
+            picked_up += 1
+
+        return picked_up
+
+    async def run(self):
+        logger.info(f"Run supervisor started, following at most {self.max_runs} runs")
+        renewed_at = time.monotonic()
+        try:
+            while True:
+                await self.pick_up_runs()
+                if time.monotonic() - renewed_at >= settings.RUN_SUPERVISOR_LEASE_TTL / 3:
+                    await asyncio.to_thread(self.renew_leases)
+                    renewed_at = time.monotonic()
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            if self.tasks:
+                await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+            self.executor.shutdown(wait=False)
@@ -1,4 +1,5 @@
+from .image import prewarm_package_images  # noqa: F401
 from .maintenance import clean_containers_after_run, clean_dangling_images  # noqa: F401
 from .notification import send_run_notification  # noqa: F401
-from .run import start_run  # noqa: F401
+from .run import reconcile_run_resources, release_run_resources, start_run  # noqa: F401
 from .schedules import fix_missed_scheduledjobs, launch_scheduled_jobs  # noqa: F401
@@ -0,0 +1,142 @@
+import logging
+
+import docker
+from django.conf import settings
+from jinja2 import Environment, meta
+
+from config.celery_app import app as celery_app
+
+from core.container import ContainerImageBuilder, RegistryImageHelper
+from core.utils import parse_string
+from job.models import JobDef, RunImage
+from job.scheduler import get_docker_endpoints
+from package.models import Package
+from variable.models import Variable
+
+logger = logging.getLogger(__name__)
+
+
+def get_template_variables(string: str) -> set[str]:
+    """
+    Return the names of the variables used in a string, e.g. `registry.example.com/${IMAGE_NAME}`
+    """
+    env = Environment(variable_start_string="${", variable_end_string="}")  # nosec: B701
+    return meta.find_undeclared_variables(env.parse(string))
+
+
+def get_image_spec(environment, variables: dict) -> tuple[str, str | None, str | None] | None:
+    """
+    Return the image, username and password of the job environment with the variables filled in. If the environment
+    uses variables that are only known when a run starts, like payload variables, None is returned.
+    """
+    credentials = environment.credentials if environment.has_credentials() else None
+    strings = [environment.image]
+    if credentials:
+        strings += [credentials.username or "", credentials.password or ""]
+
+    if any(get_template_variables(string) - variables.keys() for string in strings):
+        return None
+
+    if not credentials:
+        return parse_string(environment.image, variables), None, None
+    return (
+        parse_string(environment.image, variables),
+        parse_string(credentials.username or "", variables) or None,
+        parse_string(credentials.password or "", variables) or None,
+    )
+
+
+def get_jobs_per_image(askanna_config, variables: dict) -> dict[tuple, list[str]]:
+    """
+    Group the names of the jobs in the config by the image spec of the job, so an image shared by multiple jobs is
+    prepared once. Jobs with an image that can only be determined when a run starts are left out.
+    """
+    jobs_per_image = {}
+    for job_name, job_config in askanna_config.jobs.items():
+        image_spec = get_image_spec(job_config.environment, variables)
+        if image_spec:
+            jobs_per_image.setdefault(image_spec, []).append(job_name)
+    return jobs_per_image
+
+
+def prepare_image(docker_client, image: str, username: str | None = None, password: str | None = None) -> RunImage:
+    """
+    Resolve the image in the registry and build the run image if it's not available yet. If another worker is
+    building the same run image, the builder waits for it instead of building it again.
+    """
+    image_helper = RegistryImageHelper(client=docker_client, image_path=image, username=username, password=password)
+    builder = ContainerImageBuilder(
+        client=docker_client,
+        image_helper=image_helper,
+        image_dockerfile_path=str(settings.APPS_DIR / "job/templates"),
+        image_dockerfile="custom_Dockerfile",
+    )
+    return builder.get_image()
+
+
+def get_prepared_run_image(jobdef: JobDef, docker_client, image: str) -> RunImage | None:
+    """
+    Return the run image prepared for the job by `prewarm_package_images`, if it's ready, it's prepared for the image
+    the run uses and the image is available on the Docker endpoint of the run.
+    """
+    run_image = jobdef.run_image
+    if jobdef.image_status != "READY" or not run_image or run_image.fullname != image or not run_image.cached_image:
+        return None
+
+    try:
+        docker_client.images.get(run_image.cached_image)
+    except docker.errors.ImageNotFound:  # type: ignore
+        return None
+    return run_image
+
+
+@celery_app.task(name="job.tasks.prewarm_package_images")
+def prewarm_package_images(package_uuid):
+    """
+    Prepare the run images for the jobs in a package, so the first run after a push does not have to wait for the
+    image to be built. Jobs that use the same image share one run image, and an image is prepared only once.
+    """
+    try:
+        package = Package.objects.select_related("project").get(pk=package_uuid)
+    except Package.DoesNotExist:
+        return
+
+    askanna_config = package.get_askanna_config()
+    if not askanna_config:
+        package.set_image_status("")
+        return
+
+    variables = dict(Variable.objects.filter(project_id=package.project_id).values_list("name", "value"))
+
+    jobs_per_image = get_jobs_per_image(askanna_config, variables)
+    prewarm_job_names = [name for job_names in jobs_per_image.values() for name in job_names]
+    jobs = JobDef.objects.filter(project_id=package.project_id, name__in=askanna_config.jobs.keys())
+    # The image of a job that depends on variables set when the run starts, is prepared when the run starts
+    jobs.exclude(name__in=prewarm_job_names).update(run_image=None, image_status="")
+    if not jobs_per_image:
+        package.set_image_status("")
+        return
+    jobs.filter(name__in=prewarm_job_names).update(image_status="PENDING")
+
+    try:
+        # Images are built on every Docker endpoint, so the image is ready wherever the run is placed
+        docker_clients = [endpoint.get_client() for endpoint in get_docker_endpoints()]
+    except docker.errors.DockerException:  # type: ignore
+        logger.exception(f"Could not connect to Docker to prepare the images of package {package.suuid}")
+        jobs.filter(image_status="PENDING").update(image_status="FAILED")
+        package.set_image_status("FAILED")
+        return
+
+    image_status = "READY"
+    for (image, username, password), job_names in jobs_per_image.items():
+        try:
+            for docker_client in docker_clients:
+                run_image = prepare_image(docker_client, image, username, password)
+        except Exception:
+            logger.exception(f"Could not prepare image {image} for package {package.suuid}")
+            jobs.filter(name__in=job_names).update(run_image=None, image_status="FAILED")
+            image_status = "FAILED"
+        else:
+            jobs.filter(name__in=job_names).update(run_image=run_image, image_status="READY")
+
+    package.set_image_status(image_status)
@@ -10,6 +10,7 @@ from config.celery_app import app as celery_app
 from core.utils.config import get_setting
 from core.utils.maintenance import remove_objects
 from job.models.jobdef import JobDef
+from job.scheduler import get_docker_endpoints
 
 logger = logging.getLogger(__name__)
 
@@ -35,26 +36,27 @@ def clean_containers_after_run():
     Finally clean the container
     """
 
-    client = docker.DockerClient(base_url="unix://var/run/docker.sock")
-
     delete_when_older_than = get_setting(name="DOCKER_AUTO_REMOVE_TTL_HOURS", return_type=float, default=1)
 
-    for container in client.containers.list(filters={"status": "exited"}):
-        if not container.name.startswith("run_"):
-            continue
-        state = container.attrs.get("State")
-        finished_at = state.get("FinishedAt")
-        labels = container.attrs.get("Config", {}).get("Labels", {})
-        askanna_environment = labels.get("askanna_environment")
-        if settings.ASKANNA_ENVIRONMENT != askanna_environment:
-            continue
+    for endpoint in get_docker_endpoints():
+        client = endpoint.get_client()
+
+        for container in client.containers.list(filters={"status": "exited"}):
+            if not container.name.startswith("run_"):
+                continue
+            state = container.attrs.get("State")
+            finished_at = state.get("FinishedAt")
+            labels = container.attrs.get("Config", {}).get("Labels", {})
+            askanna_environment = labels.get("askanna_environment")
+            if settings.ASKANNA_ENVIRONMENT != askanna_environment:
+                continue
 
-        if finished_at:
-            finished_dt = parser.isoparse(finished_at)
-            age = datetime.datetime.now(tz=datetime.UTC) - finished_dt
-            if age > datetime.timedelta(hours=delete_when_older_than):
-                logger.info("Removing container", container.name)
-                logger.info(container.remove(v=True))
+            if finished_at:
+                finished_dt = parser.isoparse(finished_at)
+                age = datetime.datetime.now(tz=datetime.UTC) - finished_dt
+                if age > datetime.timedelta(hours=delete_when_older_than):
+                    logger.info("Removing container", container.name)
+                    logger.info(container.remove(v=True))
 
 
 @celery_app.task(name="job.tasks.delete_jobs")
@@ -1,6 +1,7 @@
 import datetime
 import json
 import logging
+import time
 
 import docker
 from django.conf import settings
@@ -15,110 +16,165 @@ from core.container import (
 )
 from core.utils import parse_string
 from core.utils.config import get_setting
-from run.models import Run, RunVariable
+from job.models import RunImage
+from job.scheduler import DockerEndpoint, RunScheduler, get_run_priority
+from job.supervisor import follow_run_container, supervise_run
+from job.tasks.image import get_prepared_run_image
+from run.models import Run
+from run.tasks.variable import create_variable_rows
 from variable.models import Variable
 
 logger = logging.getLogger(__name__)
 
 
-def log_run_variables(
-    run, variable_name, variable_value, variable_is_masked=None, variable_labels: list | None = None
-):
+def get_run_variable(
+    variable_name, variable_value, variable_is_masked=None, variable_labels: list | None = None
+) -> dict:
     """
-    Log the variables used for the run
+    Return a variable used for the run in the same format as the variables stored for a run
     """
-    variable_labels = [] if variable_labels is None else variable_labels.copy()
-
-    spec = {
-        "run": run,
-        "project_suuid": run.jobdef.project.suuid,
-        "job_suuid": run.jobdef.suuid,
-        "run_suuid": run.suuid,
-        "created_at": datetime.datetime.now(tz=datetime.UTC),
+    run_variable = {
         "variable": {
             "name": variable_name,
             "value": variable_value,
             "type": "string",
         },
-        "label": variable_labels,
+        "label": [] if variable_labels is None else variable_labels.copy(),
+        "created_at": datetime.datetime.now(tz=datetime.UTC).isoformat(),
     }
     if variable_is_masked is not None:
-        spec["is_masked"] = variable_is_masked
-    RunVariable.objects.create(**spec)
+        run_variable["is_masked"] = variable_is_masked
+    return run_variable
 
 
-def get_project_variables(run):
-    # Get variables for this project / run
+def log_run_variables(run, run_variables: list[dict]):
+    """
+    Log the variables used for the run. All variables are inserted at once and the meta of the run variables is
+    updated after that.
+    """
+    create_variable_rows(run, run_variables)
+    run.variables_meta.get().update_meta()
+
+
+def get_project_variables(run) -> tuple[dict, list[dict]]:
+    """
+    Get the variables for this project and the run variables to log them for the run
+    """
     project_variables = {}
-    for pv in Variable.objects.filter(project=run.jobdef.project):
+    run_variables = []
+    for pv in Variable.objects.filter(project_id=run.jobdef.project_id):
         project_variables[pv.name] = pv.value
 
-        # log the project defined variables
         labels = [{"name": "source", "value": "project", "type": "string"}]
         is_masked = pv.is_masked
         if is_masked:
             labels.append({"name": "is_masked", "value": None, "type": "tag"})  # type: ignore
-        log_run_variables(
-            run=run,
-            variable_name=pv.name,
-            variable_value=pv.get_value(),
-            variable_is_masked=is_masked,
-            variable_labels=labels,
+        run_variables.append(
+            get_run_variable(
+                variable_name=pv.name,
+                variable_value=pv.get_value(),
+                variable_is_masked=is_masked,
+                variable_labels=labels,
+            )
         )
-    return project_variables
+    return project_variables, run_variables
 
 
-@celery_app.task(bind=True, name="job.tasks.start_run")
-def start_run(self, run_uuid):
-    logger.info(f"Received message to start run {run_uuid}")
-
-    docker_debug_log = get_setting(name="DOCKER_PRINT_LOG", default=False, return_type=bool)
+def build_run_image(
+    run: Run, docker_client, job_config, job_image: str, env_variables: dict, docker_debug_log: bool = False
+) -> RunImage | None:
+    """
+    Get the image of the job from the registry and build the run image if it's not available yet. Returns the run
+    image, or None if the run failed.
+    """
+    op = run.output  # type: ignore
 
-    # First save current Celery Task ID to the celery_task_id field
-    run = Run.objects.get(pk=run_uuid)
-    run.celery_task_id = self.request.id
-    run.save(
-        update_fields=[
-            "celery_task_id",
-            "modified_at",
-        ]
+    job_image_username = (
+        job_config.environment.has_credentials()
+        and parse_string(job_config.environment.credentials.username or "", env_variables)
+        or None
     )
-    run.to_pending()
-
-    # What is the jobdef specified?
-    jd = run.jobdef
-    pl = run.payload
-    pr = jd.project
-    op = run.output  # type: ignore
+    job_image_password = (
+        job_config.environment.has_credentials()
+        and parse_string(job_config.environment.credentials.password or "", env_variables)
+        or None
+    )
+    image_helper = RegistryImageHelper(
+        client=docker_client,
+        image_path=job_image,
+        username=job_image_username,
+        password=job_image_password,
+        logger=lambda x: op.log(message=x, print_log=docker_debug_log),
+    )
+    try:
+        image_helper.get_image_digest()
+    except (RegistryAuthenticationError, RegistryContainerPullError):
+        op.log("", print_log=docker_debug_log)
+        op.log("Run failed", print_log=docker_debug_log)
+        run.to_failed()
+        return None
+    except Exception as exc:
+        exception_message = f"Error while getting image information: {exc}"
 
-    package = run.package
-    if not package:
-        op.log("Could not find code package", print_log=docker_debug_log)
+        op.log(exception_message, print_log=docker_debug_log)
+        op.log("An error report has been created and send to the AskAnna admins", print_log=docker_debug_log)
         op.log("", print_log=docker_debug_log)
         op.log("Run failed", print_log=docker_debug_log)
-        return run.to_failed()
+        run.to_failed()
 
-    askanna_config = package.get_askanna_config()
-    if not askanna_config:
-        op.log("Could not find askanna.yml", print_log=docker_debug_log)
+        raise Exception(exception_message) from exc
+
+    op.log("Preparing run environment", print_log=docker_debug_log)
+    op.log(f"Getting image {job_image}", print_log=docker_debug_log)
+    op.log("Check AskAnna requirements and if not available, try to install them", print_log=docker_debug_log)
+
+    logger.info(f"Get image: {job_image}")
+    builder = ContainerImageBuilder(
+        client=docker_client,
+        image_helper=image_helper,
+        image_dockerfile_path=str(settings.APPS_DIR / "job/templates"),
+        image_dockerfile="custom_Dockerfile",
+        logger=lambda x: op.log(message=x, print_log=docker_debug_log),
+    )
+    try:
+        run_image = builder.get_image()
+    except (
+        RegistryAuthenticationError,
+        RegistryContainerPullError,
+        docker.errors.DockerException,  # type: ignore
+        TimeoutError,
+    ):
         op.log("", print_log=docker_debug_log)
         op.log("Run failed", print_log=docker_debug_log)
-        return run.to_failed()
+        run.to_failed()
+        return None
+    except Exception as exc:
+        exception_message = f"Error while preparing the run image: {exc}"
 
-    job_config = askanna_config.jobs.get(jd.name)
-    if not job_config:
-        op.log(f"Job `{jd.name}` was not found in askanna.yml:", print_log=docker_debug_log)
-        op.log(
-            "  If you renamed or removed the job, please make sure you update the askanna.yml as well.",
-            print_log=docker_debug_log,
-        )
-        op.log(
-            "  When you updated the askanna.yml, check if you pushed the latest code to AskAnna.",
-            print_log=docker_debug_log,
-        )
+        op.log(exception_message, print_log=docker_debug_log)
+        op.log("An error report has been created and send to the AskAnna admins", print_log=docker_debug_log)
         op.log("", print_log=docker_debug_log)
         op.log("Run failed", print_log=docker_debug_log)
-        return run.to_failed()
+        run.to_failed()
+
+        raise Exception(exception_message) from exc
+
+    op.log("All AskAnna requirements are available", print_log=docker_debug_log)
+    op.log("", print_log=docker_debug_log)  # Left blank intentionally
+
+    return run_image
+
+
+def start_run_container(run: Run, endpoint: DockerEndpoint, job_config, docker_debug_log: bool = False):
+    """
+    Start the container of a run that is placed on the endpoint. Returns the container, or None if the run failed.
+    """
+    jd = run.jobdef
+    pl = run.payload
+    pr = jd.project
+    package = run.package
+    op = run.output  # type: ignore
+    resources = job_config.resources
 
     run.set_timezone(job_config.timezone)
 
@@ -144,18 +200,18 @@ def start_run(self, run_uuid):
             }
         )
 
-    for variable, value in worker_variables.items():
+    run_variables = [
         # log the worker variables
-        labels = [{"name": "source", "value": "worker", "type": "string"}]
-        log_run_variables(
-            run=run,
+        get_run_variable(
             variable_name=variable,
             variable_value=value,
-            variable_is_masked=None,
-            variable_labels=labels,
+            variable_labels=[{"name": "source", "value": "worker", "type": "string"}],
         )
+        for variable, value in worker_variables.items()
+    ]
 
-    project_variables = get_project_variables(run=run)
+    project_variables, project_run_variables = get_project_variables(run=run)
+    run_variables += project_run_variables
 
     payload_variables = {}
     if pl and isinstance(pl.payload, dict):
@@ -171,19 +227,18 @@ def start_run(self, run_uuid):
                 # we have a bool or number
                 payload_variables[k] = v
 
-    for variable, value in payload_variables.items():
+    run_variables += [
         # log the payload variables
-        labels = [{"name": "source", "value": "payload", "type": "string"}]
-        log_run_variables(
-            run=run,
+        get_run_variable(
             variable_name=variable,
             variable_value=value,
-            variable_is_masked=None,
-            variable_labels=labels,
+            variable_labels=[{"name": "source", "value": "payload", "type": "string"}],
         )
+        for variable, value in payload_variables.items()
+    ]
 
-    # update the meta of trackedvariables
-    run.variables_meta.get().update_meta()
+    # store the run variables and update the meta of trackedvariables
+    log_run_variables(run, run_variables)
 
     # set environment variables
     env_variables = {}
@@ -194,75 +249,20 @@ def start_run(self, run_uuid):
     # start the run
     run.to_inprogress()
 
-    docker_client = docker.DockerClient(base_url="unix://var/run/docker.sock")
+    docker_client = endpoint.get_client()
 
     # get image information to determine whether we need to pull this one
     job_image = parse_string(job_config.environment.image, env_variables)
-    job_image_username = (
-        job_config.environment.has_credentials()
-        and parse_string(job_config.environment.credentials.username or "", env_variables)
-        or None
-    )
-    job_image_password = (
-        job_config.environment.has_credentials()
-        and parse_string(job_config.environment.credentials.password or "", env_variables)
-        or None
-    )
-    image_helper = RegistryImageHelper(
-        client=docker_client,
-        image_path=job_image,
-        username=job_image_username,
-        password=job_image_password,
-        logger=lambda x: op.log(message=x, print_log=docker_debug_log),
-    )
-    try:
-        image_helper.get_image_info()
-    except (RegistryAuthenticationError, RegistryContainerPullError):
-        op.log("", print_log=docker_debug_log)
-        op.log("Run failed", print_log=docker_debug_log)
-        return run.to_failed()
-    except Exception as exc:
-        exception_message = f"Error while getting image information: {exc}"
-
-        op.log(exception_message, print_log=docker_debug_log)
-        op.log("An error report has been created and send to the AskAnna admins", print_log=docker_debug_log)
-        op.log("", print_log=docker_debug_log)
-        op.log("Run failed", print_log=docker_debug_log)
-        run.to_failed()
-
-        raise Exception(exception_message) from exc
-
-    op.log("Preparing run environment", print_log=docker_debug_log)
-    op.log(f"Getting image {job_image}", print_log=docker_debug_log)
-    op.log("Check AskAnna requirements and if not available, try to install them", print_log=docker_debug_log)
-
-    logger.info(f"Get image: {job_image}")
-    builder = ContainerImageBuilder(
-        client=docker_client,
-        image_helper=image_helper,
-        image_dockerfile_path=str(settings.APPS_DIR / "job/templates"),
-        image_dockerfile="custom_Dockerfile",
-        logger=lambda x: op.log(message=x, print_log=docker_debug_log),
-    )
-    try:
-        run_image = builder.get_image()
-    except (RegistryContainerPullError, docker.errors.DockerException, TimeoutError):  # type: ignore
-        op.log("", print_log=docker_debug_log)
-        op.log("Run failed", print_log=docker_debug_log)
-        return run.to_failed()
-    except Exception as exc:
-        exception_message = f"Error while preparing the run image: {exc}"
-
-        op.log(exception_message, print_log=docker_debug_log)
-        op.log("An error report has been created and send to the AskAnna admins", print_log=docker_debug_log)
-        op.log("", print_log=docker_debug_log)
-        op.log("Run failed", print_log=docker_debug_log)
-        run.to_failed()
-
-        raise Exception(exception_message) from exc
-
-    op.log("All AskAnna requirements are available", print_log=docker_debug_log)
-    op.log("", print_log=docker_debug_log)  # Left blank intentionally
+    # Use the run image prepared when the package was uploaded, else prepare the run image now
+    run_image = get_prepared_run_image(jd, docker_client, job_image)
+    if run_image:
+        op.log("Preparing run environment", print_log=docker_debug_log)
+        op.log(f"Using prepared image {job_image}", print_log=docker_debug_log)
+        op.log("", print_log=docker_debug_log)  # Left blank intentionally
+    else:
+        run_image = build_run_image(run, docker_client, job_config, job_image, env_variables, docker_debug_log)
+        if run_image is None:
+            return None
 
     # Register that we are using this run_image
     run.set_run_image(run_image)
@@ -292,12 +292,12 @@ def start_run(self, run_uuid):
             stderr=True,
             detach=True,
             auto_remove=False,  # always false, otherwise we are not able to capture logs from very short runs
-            mem_limit="20g",  # memory overall limit for the container
-            mem_reservation="20g",  # memory reservation based on actual free memory on the system
+            mem_limit=resources.memory,  # memory overall limit for the container
+            mem_reservation=resources.memory,  # memory reservation based on actual free memory on the system
             mem_swappiness=0,  # no swap
-            memswap_limit="20g",  # Maximum amount of memory + swap a container is allowed to consume.
+            memswap_limit=resources.memory,  # Maximum amount of memory + swap a container is allowed to consume.
             cpu_period=10000,  # The length of a CPU period in microseconds.
-            cpu_quota=40000,  # Microseconds of CPU time that the container can get in a CPU period.
+            cpu_quota=int(resources.cpus * 10000),  # Microseconds of CPU time that the container can get in a period.
         )
     except (docker.errors.APIError, docker.errors.DockerException) as exc:  # type: ignore
         op.log(
@@ -311,35 +311,157 @@ def start_run(self, run_uuid):
         )
         op.log("", print_log=docker_debug_log)
         op.log("Run failed", print_log=docker_debug_log)
+        run.to_failed()
+        return None
+
+    return container
+
+
+@celery_app.task(bind=True, name="job.tasks.start_run")
+def start_run(self, run_uuid):
+    logger.info(f"Received message to start run {run_uuid}")
+
+    docker_debug_log = get_setting(name="DOCKER_PRINT_LOG", default=False, return_type=bool)
+
+    # First save current Celery Task ID to the celery_task_id field
+    run = Run.objects.get(pk=run_uuid)
+    run.celery_task_id = self.request.id
+    run.save(
+        update_fields=[
+            "celery_task_id",
+            "modified_at",
+        ]
+    )
+    run.to_pending()
+
+    # What is the jobdef specified?
+    jd = run.jobdef
+    pr = jd.project
+    op = run.output  # type: ignore
+
+    package = run.package
+    if not package:
+        op.log("Could not find code package", print_log=docker_debug_log)
+        op.log("", print_log=docker_debug_log)
+        op.log("Run failed", print_log=docker_debug_log)
+        return run.to_failed()
+
+    askanna_config = package.get_askanna_config()
+    if not askanna_config:
+        op.log("Could not find askanna.yml", print_log=docker_debug_log)
+        op.log("", print_log=docker_debug_log)
+        op.log("Run failed", print_log=docker_debug_log)
+        return run.to_failed()
+
+    job_config = askanna_config.jobs.get(jd.name)
+    if not job_config:
+        op.log(f"Job `{jd.name}` was not found in askanna.yml:", print_log=docker_debug_log)
+        op.log(
+            "  If you renamed or removed the job, please make sure you update the askanna.yml as well.",
+            print_log=docker_debug_log,
+        )
+        op.log(
+            "  When you updated the askanna.yml, check if you pushed the latest code to AskAnna.",
+            print_log=docker_debug_log,
+        )
+        op.log("", print_log=docker_debug_log)
+        op.log("Run failed", print_log=docker_debug_log)
         return run.to_failed()
 
-    logline = []
-    for idx, log in enumerate(container.logs(stream=True, timestamps=True)):  # type: ignore
-        logline = [idx] + log.decode("utf-8").split(sep=" ", maxsplit=1)
-        logline[-1] = logline[-1].rstrip()
-        op.log(message=logline[2], timestamp=logline[1], print_log=docker_debug_log)
-
-        if logline[-1].startswith("AskAnna exit_code="):
-            op.log("", print_log=docker_debug_log)
-            op.log("Run failed", print_log=docker_debug_log)
-            return run.to_failed(exit_code=int(logline[-1].replace("AskAnna exit_code=", "")))
-
-        if "askanna-run-utils: command not found" in logline[-1]:
-            op.log(
-                "We could not find an askanna installation on this image.",
-                print_log=docker_debug_log,
-            )
-            op.log(
-                "Please follow the instructions on https://docs.askanna.io/ to build your own image.",
-                print_log=docker_debug_log,
-            )
-            op.log("", print_log=docker_debug_log)
-            op.log("Run failed", print_log=docker_debug_log)
-            return run.to_failed()
+    # Place the run on a Docker endpoint with enough capacity for the resources of the job
+    resources = job_config.resources
+    scheduler = RunScheduler()
+    if not scheduler.fits_pool(resources):
+        op.log(
+            f"Job `{jd.name}` requests {resources.cpus:g} CPUs and {resources.memory / 1024**3:g} GB memory, which is "
+            "more than is available for a run.",
+            print_log=docker_debug_log,
+        )
+        op.log("Please lower the resources of the job in the askanna.yml.", print_log=docker_debug_log)
+        op.log("", print_log=docker_debug_log)
+        op.log("Run failed", print_log=docker_debug_log)
+        return run.to_failed()
 
-    if logline[-1] == "Run succeeded":
-        return run.to_completed()
+    endpoint = scheduler.place(
+        run.uuid,
+        pr.workspace.suuid,
+        resources,
+        project=pr.suuid,
+        priority=get_run_priority(run.trigger),
+    )
+    if endpoint is None:
+        # The run is started again when resources become available
+        op.log("Waiting for resources to become available", print_log=docker_debug_log)
+        op.flush()
+        return None
 
-    op.log("", print_log=docker_debug_log)
-    op.log("Run failed", print_log=docker_debug_log)
-    return run.to_failed()
+    try:
+        container = start_run_container(run, endpoint, job_config, docker_debug_log=docker_debug_log)
+    except Exception:
+        # Fail the run and release the resources, otherwise the resources stay allocated to a run that never starts
+        try:
+            if not run.is_finished:
+                op.log("", print_log=docker_debug_log)
+                op.log("Run failed", print_log=docker_debug_log)
+                run.to_failed()
+        finally:
+            scheduler.release(run.uuid)
+        raise
+
+    if container is None:
+        return None
+
+    if settings.RUN_SUPERVISOR_ENABLED:
+        # The run supervisor follows the container, so the worker is available for the next run
+        op.flush()
+        return supervise_run(run, container)
+
+    return follow_run_container(run, container, print_log=docker_debug_log)
+
+
+@celery_app.task(name="job.tasks.release_run_resources")
+def release_run_resources(run_uuid):
+    """
+    Release the resources of a finished run, so queued runs can use them
+    """
+    RunScheduler().release(run_uuid)
+
+
+def reconcile_scheduler(scheduler: RunScheduler):
+    """
+    Release the resources of runs that are finished or deleted, for example because the worker stopped before the
+    resources were released. A run that has resources allocated but is not started within
+    `settings.RUN_SCHEDULER_START_TIMEOUT` seconds is failed, which releases the resources of the run.
+    """
+    allocations = scheduler.get_allocations()
+    run_uuids = {*allocations, *scheduler.get_queued_runs()}
+    if not run_uuids:
+        return
+
+    runs = {
+        str(run.pk): run
+        for run in Run.objects.filter(pk__in=run_uuids)
+        .exclude(status__in=["COMPLETED", "FAILED"])
+        .select_related("output")
+    }
+    for run_uuid in run_uuids - runs.keys():
+        scheduler.release(run_uuid)
+
+    started_before = time.time() - settings.RUN_SCHEDULER_START_TIMEOUT
+    for run_uuid, allocation in allocations.items():
+        run = runs.get(run_uuid)
+        allocated_at = allocation.get("allocated_at")
+        if run and run.status != "IN_PROGRESS" and allocated_at is not None and allocated_at < started_before:
+            logger.warning(f"Run {run_uuid} was not started after the resources were allocated")
+            run.output.log("The run could not be started")
+            run.output.log("")
+            run.output.log("Run failed")
+            run.to_failed()
+
+
+@celery_app.task(name="job.tasks.reconcile_run_resources")
+def reconcile_run_resources():
+    """
+    Release the resources that are allocated to runs that are not running
+    """
+    reconcile_scheduler(RunScheduler())
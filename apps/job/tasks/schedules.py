@@ -1,10 +1,18 @@
 import datetime
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
 
 from config.celery_app import app as celery_app
 
 from job.models import ScheduledJob
 from package.models import Package
-from run.models import Run
+from run.models import Run, RunLog, RunVariableMeta
+
+logger = logging.getLogger(__name__)
 
 
 @celery_app.task(name="job.tasks.fix_missed_scheduledjobs")
@@ -13,13 +21,16 @@ def fix_missed_scheduledjobs():
     Fix edgecases where we didnt' ran a job, maybe because of system outage
     Select scheduled jobs which next_run_at is in the past (at least 1 minute older than now)
     Update them with `.update_next()`
+
+    When the schedule wheel is enabled, missed runs are handled by the schedule wheel.
     """
+    if settings.SCHEDULE_WHEEL_ENABLED:
+        return
+
     now = datetime.datetime.now(tz=datetime.UTC).replace(second=0, microsecond=0)
     for scheduled_job in ScheduledJob.objects.filter(
         next_run_at__lt=now - datetime.timedelta(minutes=1),
-        job__deleted_at__isnull=True,
-        job__project__deleted_at__isnull=True,
-        job__project__workspace__deleted_at__isnull=True,
+        job__is_active=True,
     ):
         scheduled_job.update_next()
         celery_app.send_task(
@@ -28,32 +39,129 @@ def fix_missed_scheduledjobs():
         )
 
 
+def get_launchable_scheduled_jobs():
+    """
+    Return the scheduled jobs of jobs that are not deleted, with the job and member. The scheduled jobs are annotated
+    with the UUID of the latest package of the project, so the runs can be created without a query per scheduled job.
+    """
+    latest_package = (
+        Package.objects.active_and_finished()
+        .filter(project=OuterRef("job__project"))
+        .order_by("-created_at")
+        .values("pk")[:1]
+    )
+    return (
+        ScheduledJob.objects.filter(
+            job__is_active=True,
+        )
+        .select_related("job__project__workspace", "member__user")
+        .annotate(latest_package_uuid=Subquery(latest_package))
+    )
+
+
+def get_due_scheduled_jobs(now: datetime.datetime):
+    """
+    Return the scheduled jobs to launch in the minute starting at `now`. The scheduled jobs are locked, so a launch
+    that takes longer than a minute does not overlap with the next one.
+    """
+    return (
+        get_launchable_scheduled_jobs()
+        .filter(
+            next_run_at__gte=now,
+            next_run_at__lt=now + datetime.timedelta(minutes=1),
+        )
+        .select_for_update(skip_locked=True, of=("self",))
+    )
+
+
+def get_scheduled_run(scheduled_job: ScheduledJob) -> Run:
+    member = scheduled_job.member
+    # The run is created as SUBMITTED, so start_run changes it to PENDING and the notification for PENDING is sent
+    run = Run(
+        status="SUBMITTED",
+        jobdef=scheduled_job.job,
+        payload=None,
+        package_id=scheduled_job.latest_package_uuid,  # type: ignore
+        trigger="SCHEDULE",
+        created_by_user=member.user,
+        created_by_member=member if not member.deleted_at else None,
+    )
+    run.set_suuid()
+    run.set_visibility()
+    return run
+
+
+def has_member(scheduled_job: ScheduledJob) -> bool:
+    """
+    A run is always started by a user, so a scheduled job without a member can't be launched and is handled as missed
+    """
+    if scheduled_job.member_id:
+        return True
+    logger.warning(f"Scheduled job {scheduled_job.uuid} has no member, the job is not launched")
+    return False
+
+
+def create_scheduled_runs(scheduled_jobs: list[ScheduledJob]) -> list[Run]:
+    """
+    Bulk create the runs for the scheduled jobs. `bulk_create` does not send the `post_save` signal, so the log and
+    variables meta that are created for a new run by the run listeners, are bulk created here as well.
+    """
+    runs = Run.objects.bulk_create([get_scheduled_run(scheduled_job) for scheduled_job in scheduled_jobs])
+
+    run_logs = [RunLog(run=run) for run in runs]
+    run_variables_meta = [RunVariableMeta(run=run) for run in runs]
+    for instance in run_logs + run_variables_meta:
+        instance.set_suuid()
+    RunLog.objects.bulk_create(run_logs)
+    RunVariableMeta.objects.bulk_create(run_variables_meta)
+
+    return runs
+
+
+def start_runs(run_uuids: list):
+    for run_uuid in run_uuids:
+        celery_app.send_task("job.tasks.start_run", kwargs={"run_uuid": run_uuid})
+
+
 @celery_app.task(name="job.tasks.launch_scheduled_jobs")
 def launch_scheduled_jobs():
     """
     We launch scheduled jobs every minute
     We select jobs for the current minute ()
     We exclude jobs which are scheduled for deletion (or project/workspace)
+
+    All runs of the minute are created in one transaction with bulk inserts, and the runs are started when the
+    transaction is committed. When the schedule wheel is enabled, the schedule wheel launches the scheduled jobs.
     """
+    if settings.SCHEDULE_WHEEL_ENABLED:
+        return
+
     now = datetime.datetime.now(tz=datetime.UTC).replace(second=0, microsecond=0)
-    for scheduled_job in ScheduledJob.objects.filter(
-        next_run_at__gte=now,
-        next_run_at__lt=now + datetime.timedelta(minutes=1),
-        job__deleted_at__isnull=True,
-        job__project__deleted_at__isnull=True,
-        job__project__workspace__deleted_at__isnull=True,
-    ):
-        jobdef = scheduled_job.job
-        package = Package.objects.active_and_finished().filter(project=jobdef.project).order_by("-created_at").first()
-
-        # create new run and this will automaticly scheduled
-        Run.objects.create(
-            status="PENDING",
-            jobdef=jobdef,
-            payload=None,
-            package=package,
-            trigger="SCHEDULE",
-            created_by_user=scheduled_job.member.user,
-        )
-        scheduled_job.update_last(timestamp=now)
-        scheduled_job.update_next()
+    with transaction.atomic():
+        scheduled_jobs = list(get_due_scheduled_jobs(now))
+        if not scheduled_jobs:
+            return
+
+        launch = [scheduled_job for scheduled_job in scheduled_jobs if has_member(scheduled_job)]
+        runs = create_scheduled_runs(launch) if launch else []
+
+        modified_at = timezone.now()
+        for scheduled_job in scheduled_jobs:
+            if scheduled_job.member_id:
+                scheduled_job.last_run_at = now
+            scheduled_job.next_run_at = scheduled_job.get_next_run_at()
+            scheduled_job.modified_at = modified_at
+        ScheduledJob.objects.bulk_update(scheduled_jobs, ["last_run_at", "next_run_at", "modified_at"])
+
+        run_uuids = [run.uuid for run in runs]
+        missed_job_uuids = [scheduled_job.job.uuid for scheduled_job in scheduled_jobs if not scheduled_job.member_id]
+
+        def on_commit():
+            start_runs(run_uuids)
+            for job_uuid in missed_job_uuids:
+                celery_app.send_task(
+                    "job.tasks.send_missed_schedule_notification",
+                    kwargs={"job_uuid": job_uuid},
+                )
+
+        transaction.on_commit(on_commit)
@@ -3,7 +3,13 @@ import datetime
 import pytest
 
 from job.models import ScheduledJob
-from job.tasks.schedules import fix_missed_scheduledjobs, launch_scheduled_jobs
+from job.tasks.schedules import (
+    create_scheduled_runs,
+    fix_missed_scheduledjobs,
+    get_due_scheduled_jobs,
+    launch_scheduled_jobs,
+)
+from package.models import Package
 from run.models import Run
 
 pytestmark = pytest.mark.django_db
@@ -90,3 +96,66 @@ def test_launch_scheduled_jobs(test_memberships, test_jobs):
 
     assert scheduled_job.next_run_at > datetime_next_run
     assert Run.objects.all().count() == 1
+
+
+def test_get_due_scheduled_jobs(test_memberships, test_jobs):
+    now = datetime.datetime(2023, 6, 1, 12, 0, 0, tzinfo=datetime.UTC)
+    job_private = test_jobs.get("job_private")
+    package = {"project": job_private.project, "original_filename": "code.zip", "size": 0}
+    old_package = Package.objects.create(**package, finished_at=now)
+    latest_package = Package.objects.create(**package, finished_at=now)
+    Package.objects.create(**package)  # Not finished
+    Package.objects.filter(pk=old_package.pk).update(created_at=now - datetime.timedelta(days=1))
+
+    scheduled_jobs = [
+        ScheduledJob.objects.create(
+            cron_definition="0 * * * *",
+            cron_timezone="UTC",
+            next_run_at=now,
+            job=job,
+            member=test_memberships.get("workspace_private_admin"),
+        )
+        for job in test_jobs.values()
+    ]
+    ScheduledJob.objects.create(
+        cron_definition="0 * * * *",
+        cron_timezone="UTC",
+        next_run_at=now + datetime.timedelta(hours=1),
+        job=job_private,
+    )
+
+    due_scheduled_jobs = {scheduled_job.pk: scheduled_job for scheduled_job in get_due_scheduled_jobs(now)}
+    assert due_scheduled_jobs.keys() == {scheduled_job.pk for scheduled_job in scheduled_jobs}
+    assert due_scheduled_jobs[scheduled_jobs[0].pk].latest_package_uuid == latest_package.uuid
+    assert due_scheduled_jobs[scheduled_jobs[1].pk].latest_package_uuid is None
+
+
+def test_create_scheduled_runs(test_memberships, test_jobs, django_assert_max_num_queries):
+    member = test_memberships.get("workspace_private_admin")
+    for _ in range(5):
+        ScheduledJob.objects.create(
+            cron_definition="0 * * * *",
+            cron_timezone="UTC",
+            next_run_at=datetime.datetime(2023, 6, 1, 12, 0, 0, tzinfo=datetime.UTC),
+            job=test_jobs.get("job_private"),
+            member=member,
+        )
+    scheduled_jobs = list(get_due_scheduled_jobs(datetime.datetime(2023, 6, 1, 12, 0, 0, tzinfo=datetime.UTC)))
+
+    # The number of queries does not depend on the number of scheduled jobs
+    with django_assert_max_num_queries(3):
+        runs = create_scheduled_runs(scheduled_jobs)
+
+    assert len(runs) == 5
+    for run in Run.objects.filter(pk__in=[run.pk for run in runs]).select_related("output"):
+        assert run.trigger == "SCHEDULE"
+        assert run.status == "SUBMITTED"
+        assert run.created_by_user == member.user
+        assert run.created_by_member == member
+        assert run.output.run == run
+        assert run.variables_meta.count() == 1
+
+    # Starting a scheduled run changes the status to PENDING, which sends the notification for a queued run
+    run = Run.objects.get(pk=runs[0].pk)
+    assert run.to_pending() is True
+    assert run.outbox.filter(task_name="job.tasks.send_run_notification").exists()
@@ -0,0 +1,105 @@
+import docker
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from .base import BaseJobTestDef
+from core.config import Environment
+from job.models import RunImage
+from job.tasks.image import (
+    get_image_spec,
+    get_jobs_per_image,
+    get_prepared_run_image,
+    prewarm_package_images,
+)
+
+
+class FakeImages:
+    def __init__(self, images: list[str]):
+        self.images = images
+
+    def get(self, name):
+        if name not in self.images:
+            raise docker.errors.ImageNotFound(f"No such image: {name}")
+        return name
+
+
+class FakeDockerClient:
+    def __init__(self, images: list[str]):
+        self.images = FakeImages(images)
+
+
+class TestPrewarmImages(BaseJobTestDef, APITestCase):
+    """
+    Test preparing the run images of the jobs in a package
+    """
+
+    def test_package_upload_sets_image_status(self):
+        self.package2.refresh_from_db()
+        assert self.package2.image_status == "PENDING"
+
+        self.package.refresh_from_db()
+        assert self.package.image_status == ""
+
+    def test_get_image_spec(self):
+        environment = Environment.from_dict({"image": "python:3-slim"})
+        assert get_image_spec(environment, {}) == ("python:3-slim", None, None)
+
+        environment = Environment.from_dict(
+            {
+                "image": "${REGISTRY}/python:3-slim",
+                "credentials": {"username": "${USERNAME}", "password": "secret"},
+            }
+        )
+        assert get_image_spec(environment, {"REGISTRY": "registry.askanna.io"}) is None
+        assert get_image_spec(environment, {"REGISTRY": "registry.askanna.io", "USERNAME": "anna"}) == (
+            "registry.askanna.io/python:3-slim",
+            "anna",
+            "secret",
+        )
+
+    @override_settings(RUNNER_DEFAULT_DOCKER_IMAGE="python:3-slim")
+    def test_jobs_with_same_image_are_grouped(self):
+        jobs_per_image = get_jobs_per_image(self.package2.get_askanna_config(), {})
+        assert list(jobs_per_image.keys()) == [("python:3-slim", None, None)]
+        assert sorted(jobs_per_image[("python:3-slim", None, None)]) == ["my-second-test-job", "my-test-job"]
+
+    @override_settings(RUNNER_DEFAULT_DOCKER_IMAGE="${IMAGE}")
+    def test_jobs_with_run_variables_are_skipped(self):
+        jobs_per_image = get_jobs_per_image(self.package2.get_askanna_config(), {})
+        assert jobs_per_image == {("python:3-slim", None, None): ["my-second-test-job"]}
+
+    def test_prewarm_package_without_config(self):
+        self.package.set_image_status("PENDING")
+
+        prewarm_package_images(self.package.uuid)
+        self.package.refresh_from_db()
+        assert self.package.image_status == ""
+
+    def test_job_and_package_api_show_image_status(self):
+        self.client.force_authenticate(user=self.users["member"])
+
+        response = self.client.get(f"/v1/job/{self.jobdef.suuid}/")
+        assert response.status_code == 200
+        assert response.data["image_status"] == ""
+
+        response = self.client.get(f"/v1/package/{self.package.suuid}/")
+        assert response.status_code == 200
+        assert response.data["image_status"] == ""
+
+    def test_get_prepared_run_image(self):
+        run_image = RunImage.objects.create(
+            name="python", tag="3-slim", digest="sha256:1234", cached_image="aa-python:3-slim"
+        )
+        self.jobdef.run_image = run_image
+        self.jobdef.image_status = "READY"
+        self.jobdef.save(update_fields=["run_image", "image_status"])
+        docker_client = FakeDockerClient(["aa-python:3-slim"])
+
+        assert get_prepared_run_image(self.jobdef, docker_client, "python:3-slim") == run_image
+        # The run uses another image, for example because a payload variable is used in the image
+        assert get_prepared_run_image(self.jobdef, docker_client, "python:3.11") is None
+        # The image is not available on the Docker endpoint of the run
+        assert get_prepared_run_image(self.jobdef, FakeDockerClient([]), "python:3-slim") is None
+
+        self.jobdef.image_status = "PENDING"
+        assert get_prepared_run_image(self.jobdef, docker_client, "python:3-slim") is None
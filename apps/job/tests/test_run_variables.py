@@ -0,0 +1,54 @@
+from rest_framework.test import APITestCase
+
+from .base import BaseJobTestDef
+from job.tasks.run import get_project_variables, get_run_variable, log_run_variables
+from run.models import RunVariable, RunVariableMeta
+from variable.models import Variable
+
+
+class TestLogRunVariables(BaseJobTestDef, APITestCase):
+    """
+    Test logging the variables used for a run
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.run = self.runs["run1"]
+        RunVariable.objects.filter(run=self.run).delete()
+
+        Variable.objects.create(name="Project variable", value="value", project=self.project)
+        Variable.objects.create(name="Secret", value="secret value", project=self.project, is_masked=True)
+        Variable.objects.create(name="Other project variable", value="value", project=self.project2)
+
+    def test_get_project_variables(self):
+        project_variables, run_variables = get_project_variables(self.run)
+
+        assert project_variables == {"Project variable": "value", "Secret": "secret value"}
+        assert len(run_variables) == 2
+
+        masked_variable = next(variable for variable in run_variables if variable["variable"]["name"] == "Secret")
+        assert masked_variable["is_masked"] is True
+        assert masked_variable["variable"]["value"] == "***masked***"
+
+    def test_log_run_variables(self):
+        _, run_variables = get_project_variables(self.run)
+        run_variables += [
+            get_run_variable(
+                variable_name=f"VARIABLE_{i}",
+                variable_value=i,
+                variable_labels=[{"name": "source", "value": "payload", "type": "string"}],
+            )
+            for i in range(100)
+        ]
+        run_variables.append(get_run_variable(variable_name="AA_TOKEN", variable_value="token"))
+
+        # Select the run variable meta, insert the rows and update the meta with a constant number of queries
+        with self.assertNumQueries(6):
+            log_run_variables(self.run, run_variables)
+
+        assert RunVariable.objects.filter(run=self.run).count() == 103
+        token = RunVariable.objects.get(run=self.run, variable__name="AA_TOKEN")
+        assert token.is_masked is True
+        assert token.variable["value"] == "***masked***"
+
+        assert RunVariableMeta.objects.get(run=self.run).count == 103
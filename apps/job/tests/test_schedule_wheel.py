@@ -0,0 +1,177 @@
+import datetime
+import threading
+
+from django.db import connection, transaction
+from django.test import override_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from .base import BaseJobTestDef
+from job.models import ScheduledJob
+from job.schedule_wheel import ScheduleWheel
+from run.models import Run
+
+NOW = datetime.datetime(2023, 6, 1, 12, 30, 0, tzinfo=datetime.UTC)
+
+
+class ScheduleWheelForTest(ScheduleWheel):
+    key = "test-schedule-wheel:next-runs"
+
+
+class TestScheduleWheel(BaseJobTestDef, APITestCase):
+    """
+    Test launching scheduled jobs with the schedule wheel
+    """
+
+    def setUp(self):
+        super().setUp()
+        ScheduledJob.objects.all().delete()
+        self.schedule_wheel = ScheduleWheelForTest()
+
+    def tearDown(self):
+        self.schedule_wheel.redis.delete(self.schedule_wheel.key)
+        super().tearDown()
+
+    def create_scheduled_job(self, next_run_at: datetime.datetime, catch_up: str = "SKIP") -> ScheduledJob:
+        return ScheduledJob.objects.create(
+            job=self.jobdef,
+            raw_definition="@hourly",
+            cron_definition="0 * * * *",
+            cron_timezone="UTC",
+            catch_up=catch_up,
+            member=self.members.get("member"),
+            next_run_at=next_run_at,
+        )
+
+    def test_rebuild_and_claim_due(self):
+        due = self.create_scheduled_job(NOW - datetime.timedelta(seconds=1))
+        later = self.create_scheduled_job(NOW + datetime.timedelta(minutes=30))
+        self.schedule_wheel.rebuild()
+
+        assert self.schedule_wheel.seconds_until_next(NOW.timestamp()) == -1
+        assert self.schedule_wheel.claim_due(NOW.timestamp()) == [str(due.uuid)]
+        assert self.schedule_wheel.claim_due(NOW.timestamp()) == []
+        assert self.schedule_wheel.seconds_until_next(NOW.timestamp()) == 30 * 60
+
+        self.schedule_wheel.remove(later.uuid)
+        assert self.schedule_wheel.seconds_until_next(NOW.timestamp()) == float("inf")
+
+    def test_fire(self):
+        scheduled_job = self.create_scheduled_job(NOW - datetime.timedelta(seconds=10))
+        not_due = self.create_scheduled_job(NOW + datetime.timedelta(seconds=10))
+        self.schedule_wheel.rebuild()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            runs = self.schedule_wheel.fire(NOW.timestamp())
+
+        assert len(runs) == 1
+        assert len(callbacks) == 1
+        run = Run.objects.get(pk=runs[0].pk)
+        assert run.trigger == "SCHEDULE"
+        assert run.jobdef == self.jobdef
+
+        scheduled_job.refresh_from_db()
+        assert scheduled_job.last_run_at == NOW
+        assert scheduled_job.next_run_at == datetime.datetime(2023, 6, 1, 13, 0, 0, tzinfo=datetime.UTC)
+        assert self.schedule_wheel.claim_due(NOW.timestamp() + 10) == [str(not_due.uuid)]
+
+    def test_fire_without_member(self):
+        scheduled_job = self.create_scheduled_job(NOW - datetime.timedelta(seconds=10))
+        scheduled_job.member = None
+        scheduled_job.save(update_fields=["member"])
+        self.schedule_wheel.rebuild()
+
+        # The job is handled as missed, because a run can't be started without a user
+        with self.captureOnCommitCallbacks():
+            assert self.schedule_wheel.fire(NOW.timestamp()) == []
+
+        scheduled_job.refresh_from_db()
+        assert scheduled_job.last_run_at is None
+        assert scheduled_job.next_run_at == datetime.datetime(2023, 6, 1, 13, 0, 0, tzinfo=datetime.UTC)
+
+    def test_fire_catch_up(self):
+        missed_since = NOW - datetime.timedelta(hours=3, minutes=30)
+        scheduled_jobs = {
+            catch_up: self.create_scheduled_job(missed_since, catch_up=catch_up)
+            for catch_up in ["SKIP", "ONCE", "ALL"]
+        }
+        self.schedule_wheel.rebuild()
+
+        with self.captureOnCommitCallbacks():
+            runs = self.schedule_wheel.fire(NOW.timestamp())
+
+        # The runs of 9:00, 10:00, 11:00 and 12:00 were missed
+        assert len(runs) == 5
+        for scheduled_job in scheduled_jobs.values():
+            scheduled_job.refresh_from_db()
+            assert scheduled_job.next_run_at == datetime.datetime(2023, 6, 1, 13, 0, 0, tzinfo=datetime.UTC)
+        assert scheduled_jobs["SKIP"].last_run_at is None
+        assert scheduled_jobs["ONCE"].last_run_at == NOW
+
+    @override_settings(SCHEDULE_CATCH_UP_MAX_RUNS=2)
+    def test_get_number_of_runs(self):
+        missed_since = NOW - datetime.timedelta(hours=3, minutes=30)
+        assert self.schedule_wheel.get_number_of_runs(self.create_scheduled_job(NOW), NOW) == 1
+        assert self.schedule_wheel.get_number_of_runs(self.create_scheduled_job(missed_since), NOW) == 0
+        assert self.schedule_wheel.get_number_of_runs(self.create_scheduled_job(missed_since, "ONCE"), NOW) == 1
+        assert self.schedule_wheel.get_number_of_runs(self.create_scheduled_job(missed_since, "ALL"), NOW) == 2
+
+    @override_settings(SCHEDULE_WHEEL_ENABLED=True)
+    def test_listeners_update_schedule_wheel(self):
+        schedule_wheel = ScheduleWheel()
+        with self.captureOnCommitCallbacks(execute=True):
+            scheduled_job = self.create_scheduled_job(NOW)
+        assert schedule_wheel.redis.zscore(schedule_wheel.key, str(scheduled_job.uuid)) == NOW.timestamp()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            scheduled_job.delete()
+        assert schedule_wheel.redis.zscore(schedule_wheel.key, str(scheduled_job.uuid)) is None
+
+
+class TestScheduleWheelLocking(BaseJobTestDef, APITransactionTestCase):
+    """
+    Test that a scheduled job that is launched by another schedule wheel is skipped. The other schedule wheel uses its
+    own database connection, so the test data has to be committed.
+    """
+
+    def setUp(self):
+        super().setUp()
+        ScheduledJob.objects.all().delete()
+        self.schedule_wheel = ScheduleWheelForTest()
+
+    def tearDown(self):
+        self.schedule_wheel.redis.delete(self.schedule_wheel.key)
+        super().tearDown()
+
+    def test_fire_skips_locked_scheduled_job(self):
+        scheduled_job = ScheduledJob.objects.create(
+            job=self.jobdef,
+            raw_definition="@hourly",
+            cron_definition="0 * * * *",
+            cron_timezone="UTC",
+            member=self.members.get("member"),
+            next_run_at=NOW - datetime.timedelta(seconds=10),
+        )
+        self.schedule_wheel.rebuild()
+
+        locked = threading.Event()
+        release = threading.Event()
+
+        def lock_scheduled_job():
+            try:
+                with transaction.atomic():
+                    ScheduledJob.objects.select_for_update().get(pk=scheduled_job.pk)
+                    locked.set()
+                    release.wait(timeout=10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=lock_scheduled_job)
+        thread.start()
+        try:
+            assert locked.wait(timeout=10)
+            assert self.schedule_wheel.fire(NOW.timestamp()) == []
+        finally:
+            release.set()
+            thread.join()
+
+        assert not Run.objects.filter(jobdef=self.jobdef, trigger="SCHEDULE").exists()
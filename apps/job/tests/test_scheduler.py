@@ -0,0 +1,169 @@
+import json
+import uuid
+
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from .base import BaseJobTestDef
+from core.config import Resources
+from job.scheduler import DockerEndpoint, RunScheduler, get_run_priority
+from job.tasks.run import reconcile_scheduler
+
+GB = 1024**3
+
+
+class RunSchedulerForTest(RunScheduler):
+    lock_key = "test-run-scheduler:lock"
+    allocations_key = "test-run-scheduler:allocations"
+    queued_key = "test-run-scheduler:queued"
+    rotation_key = "test-run-scheduler:workspaces"
+
+    def get_queue_key(self, priority: int, workspace: str) -> str:
+        return f"test-run-scheduler:queue:{priority}:{workspace}"
+
+    def start_runs(self, run_uuids: list[str]):
+        self.started_runs = getattr(self, "started_runs", []) + run_uuids
+
+
+class TestRunScheduler(BaseJobTestDef, APITestCase):
+    """
+    Test placing runs on Docker endpoints
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.scheduler = RunSchedulerForTest(
+            endpoints=[
+                DockerEndpoint(name="large", base_url="tcp://large:2375", cpus=8, memory=16 * GB),
+                DockerEndpoint(name="small", base_url="tcp://small:2375", cpus=4, memory=8 * GB),
+            ]
+        )
+
+    def tearDown(self):
+        keys = self.scheduler.redis.keys("test-run-scheduler:*")
+        if keys:
+            self.scheduler.redis.delete(*keys)
+        super().tearDown()
+
+    def test_endpoint_from_dict(self):
+        endpoint = DockerEndpoint.from_dict(
+            {"name": "local", "base_url": "unix://var/run/docker.sock", "memory": "2g"}
+        )
+        assert endpoint.cpus is None
+        assert endpoint.memory == 2 * GB
+        assert endpoint.fits(Resources(cpus=100, memory=GB))
+        assert not endpoint.fits(Resources(cpus=1, memory=3 * GB))
+
+    def test_place_best_fit(self):
+        endpoint = self.scheduler.place("run-1", "workspace-a", Resources(cpus=2, memory=4 * GB))
+        assert endpoint.name == "small"
+        assert self.scheduler.get_endpoint("run-1") == endpoint
+
+        endpoint = self.scheduler.place("run-2", "workspace-a", Resources(cpus=4, memory=8 * GB))
+        assert endpoint.name == "large"
+
+        # Placing the same run again returns the endpoint it's placed on
+        assert self.scheduler.place("run-1", "workspace-a", Resources(cpus=2, memory=4 * GB)).name == "small"
+        assert self.scheduler.get_usage() == {"large": (4, 8 * GB), "small": (2, 4 * GB)}
+
+    def test_fits_pool(self):
+        assert self.scheduler.fits_pool(Resources(cpus=8, memory=16 * GB))
+        assert not self.scheduler.fits_pool(Resources(cpus=8, memory=32 * GB))
+
+    def test_queue_and_dispatch_fair_per_workspace(self):
+        full = Resources(cpus=4, memory=8 * GB)
+        assert self.scheduler.place("run-1", "workspace-a", full).name == "small"
+        assert self.scheduler.place("run-2", "workspace-a", full).name == "large"
+        assert self.scheduler.place("run-3", "workspace-a", full).name == "large"
+
+        # The pool is full, the runs are queued
+        assert self.scheduler.place("run-4", "workspace-a", full) is None
+        assert self.scheduler.place("run-5", "workspace-a", full) is None
+        assert self.scheduler.place("run-6", "workspace-b", full) is None
+
+        # Runs of other workspaces get their turn before the next run of the same workspace
+        assert self.scheduler.release("run-1") == ["run-4"]
+        assert self.scheduler.release("run-2") == ["run-6"]
+        assert self.scheduler.release("run-3") == ["run-5"]
+        assert self.scheduler.started_runs == ["run-4", "run-6", "run-5"]
+        assert self.scheduler.get_endpoint("run-4").name == "small"
+
+        # Releasing a run that has no resources allocated does nothing
+        assert self.scheduler.release("run-1") == []
+
+    def test_new_run_waits_for_queued_runs(self):
+        assert self.scheduler.place("run-1", "workspace-a", Resources(cpus=8, memory=16 * GB)).name == "large"
+        assert self.scheduler.place("run-2", "workspace-a", Resources(cpus=8, memory=16 * GB)) is None
+
+        # The small endpoint has capacity, but the queued run goes first
+        assert self.scheduler.place("run-3", "workspace-b", Resources(cpus=1, memory=GB)) is None
+        assert self.scheduler.release("run-1") == ["run-2", "run-3"]
+        assert self.scheduler.get_endpoint("run-3").name == "small"
+
+    def test_release_queued_run(self):
+        full = Resources(cpus=4, memory=8 * GB)
+        self.scheduler.place("run-1", "workspace-a", full)
+        self.scheduler.place("run-2", "workspace-a", full)
+        self.scheduler.place("run-3", "workspace-a", full)
+        assert self.scheduler.place("run-4", "workspace-a", full) is None
+
+        # A queued run that finished, for example because it failed, is removed from the queue
+        assert self.scheduler.release("run-4") == []
+        assert self.scheduler.release("run-1") == []
+        assert self.scheduler.get_endpoint("run-4") is None
+
+    @override_settings(RUN_CONCURRENCY_LIMIT_WORKSPACE=1, RUN_CONCURRENCY_LIMITS={"workspace-b": 2})
+    def test_workspace_concurrency_limit(self):
+        small = Resources(cpus=1, memory=GB)
+        assert self.scheduler.place("run-1", "workspace-a", small) is not None
+        # Workspace A reached its limit, the run waits while runs of other workspaces can start
+        assert self.scheduler.place("run-2", "workspace-a", small) is None
+        assert self.scheduler.place("run-3", "workspace-b", small) is not None
+        assert self.scheduler.place("run-4", "workspace-b", small) is not None
+        assert self.scheduler.place("run-5", "workspace-b", small) is None
+
+        assert self.scheduler.release("run-3") == ["run-5"]
+        assert self.scheduler.release("run-1") == ["run-2"]
+
+    @override_settings(RUN_CONCURRENCY_LIMIT_PROJECT=1)
+    def test_project_concurrency_limit(self):
+        small = Resources(cpus=1, memory=GB)
+        assert self.scheduler.place("run-1", "workspace-a", small, project="project-a") is not None
+        assert self.scheduler.place("run-2", "workspace-a", small, project="project-a") is None
+        assert self.scheduler.place("run-3", "workspace-b", small, project="project-b") is not None
+
+        assert self.scheduler.release("run-1") == ["run-2"]
+
+    def test_priority(self):
+        assert get_run_priority("SCHEDULE") == 0
+        assert get_run_priority("WEBUI") == 1
+
+        full = Resources(cpus=8, memory=16 * GB)
+        assert self.scheduler.place("run-1", "workspace-a", full) is not None
+        assert self.scheduler.place("run-2", "workspace-a", full, priority=1) is None
+        assert self.scheduler.place("run-3", "workspace-b", full, priority=0) is None
+
+        # The run with the higher priority goes first, even though it was queued later
+        assert self.scheduler.release("run-1") == ["run-3"]
+        assert self.scheduler.release("run-3") == ["run-2"]
+
+    def test_reconcile(self):
+        resources = Resources(cpus=1, memory=GB)
+        finished_run = str(self.runs["run1"].uuid)
+        running_run = str(self.runs["run5"].uuid)
+        pending_run = str(self.runs["run4"].uuid)
+        deleted_run = str(uuid.uuid4())
+        for run_uuid in [finished_run, running_run, pending_run, deleted_run]:
+            assert self.scheduler.place(run_uuid, "workspace-a", resources) is not None
+
+        self.runs["run4"].to_pending()
+        reconcile_scheduler(self.scheduler)
+        assert set(self.scheduler.get_allocations()) == {running_run, pending_run}
+
+        # A run that is not started in time is failed
+        allocation = self.scheduler.get_allocations()[pending_run]
+        allocation["allocated_at"] -= 7200
+        self.scheduler.redis.hset(self.scheduler.allocations_key, pending_run, json.dumps(allocation))
+        reconcile_scheduler(self.scheduler)
+        self.runs["run4"].refresh_from_db()
+        assert self.runs["run4"].status == "FAILED"
@@ -0,0 +1,241 @@
+import asyncio
+import time
+
+import docker
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from .base import BaseJobTestDef
+from job.supervisor import (
+    RunSupervisor,
+    follow_run_container,
+    follow_supervised_run,
+    get_supervised_runs,
+    remove_supervised_run,
+    supervise_run,
+)
+from run.models import Run
+
+
+class FakeContainer:
+    def __init__(self, container_id: str, lines: list[str]):
+        self.id = container_id
+        self.lines = lines
+
+    def logs(self, stream=True, timestamps=True):
+        for idx, line in enumerate(self.lines):
+            yield f"2023-01-01T12:00:{idx:02d}.000000000Z {line}\n".encode()
+
+
+class FakeContainers:
+    def __init__(self, containers: dict):
+        self.containers = containers
+
+    def get(self, container_id):
+        if container_id not in self.containers:
+            raise docker.errors.NotFound(f"No such container: {container_id}")
+        return self.containers[container_id]
+
+
+class QuietContainer(FakeContainer):
+    """
+    A container that logs the first line and then stays quiet until the first line is in the log queue
+    """
+
+    def __init__(self, container_id: str, lines: list[str], logqueue):
+        super().__init__(container_id, lines)
+        self.logqueue = logqueue
+        self.quiet_log = None
+
+    def logs(self, stream=True, timestamps=True):
+        for idx, line in enumerate(super().logs(stream=stream, timestamps=timestamps)):
+            if idx == 1:
+                for _ in range(50):
+                    if self.logqueue.length():
+                        break
+                    time.sleep(0.1)
+                self.quiet_log = self.logqueue.get()
+            yield line
+
+
+class DatabaseCheckContainer(FakeContainer):
+    """
+    A container that records if the database connection of the thread that follows the run is closed while it logs
+    """
+
+    def __init__(self, container_id: str, lines: list[str]):
+        super().__init__(container_id, lines)
+        self.closed_while_logging = []
+
+    def logs(self, stream=True, timestamps=True):
+        # The log stream is read in another thread, get the connection of the thread that follows the run
+        db_connection = connections["default"]
+        lines = super().logs(stream=stream, timestamps=timestamps)
+
+        def read():
+            for line in lines:
+                self.closed_while_logging.append(db_connection.connection is None)
+                yield line
+
+        return read()
+
+
+class BrokenContainers:
+    def get(self, container_id):
+        raise docker.errors.APIError("Docker is not available")
+
+
+class FakeDockerClient:
+    def __init__(self, containers: list[FakeContainer]):
+        self.containers = FakeContainers({container.id: container for container in containers})
+
+
+class TestRunSupervisor(BaseJobTestDef, APITestCase):
+    """
+    Test following run containers with the run supervisor
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.run = self.runs["run2"]
+        self.run.status = "IN_PROGRESS"
+        self.run.save(update_fields=["status"])
+
+    def tearDown(self):
+        for run_uuid in get_supervised_runs():
+            remove_supervised_run(run_uuid)
+        super().tearDown()
+
+    def test_follow_run_container_succeeded(self):
+        container = FakeContainer("container-1", ["Start run", "Run succeeded"])
+        follow_run_container(self.run, container)
+
+        self.run.refresh_from_db()
+        assert self.run.status == "COMPLETED"
+        assert [line[2] for line in self.run.output.get_log()] == ["Start run", "Run succeeded"]
+
+    def test_follow_run_container_exit_code(self):
+        container = FakeContainer("container-1", ["Start run", "AskAnna exit_code=3"])
+        follow_run_container(self.run, container)
+
+        self.run.refresh_from_db()
+        assert self.run.status == "FAILED"
+        assert self.run.output.exit_code == 3
+        assert self.run.output.get_log()[-1][2] == "Run failed"
+
+    def test_follow_run_container_since(self):
+        self.run.output.log("Preparing run environment", timestamp="2023-01-01T11:59:59")
+        self.run.output.log("Start run", timestamp="2023-01-01T12:00:00.000000000Z")
+        self.run.output.flush()
+
+        container = FakeContainer("container-1", ["Start run", "Run succeeded"])
+        follow_run_container(self.run, container, since="2023-01-01T12:00:00.000000000Z")
+
+        self.run.refresh_from_db()
+        assert self.run.status == "COMPLETED"
+        log = self.run.output.get_log()
+        assert [line[0] for line in log] == [1, 2, 3]
+        assert [line[2] for line in log] == ["Preparing run environment", "Start run", "Run succeeded"]
+
+    @override_settings(RUN_LOG_BUFFER_FLUSH_INTERVAL=0.1)
+    def test_follow_run_container_flush_when_idle(self):
+        container = QuietContainer("container-1", ["Training", "Run succeeded"], logqueue=self.run.output.logqueue)
+        follow_run_container(self.run, container)
+
+        # The first line was written to the log queue while the container did not log new lines
+        assert [line[2] for line in container.quiet_log] == ["Training"]
+
+    def test_supervise_run(self):
+        container = FakeContainer("container-1", ["Run succeeded"])
+        supervise_run(self.run, container)
+        assert get_supervised_runs() == {str(self.run.uuid): "container-1"}
+
+        follow_supervised_run(str(self.run.uuid), container.id, docker_client=FakeDockerClient([container]))
+
+        self.run.refresh_from_db()
+        assert self.run.status == "COMPLETED"
+        assert get_supervised_runs() == {}
+
+    def test_follow_supervised_run_error(self):
+        supervise_run(self.run, FakeContainer("container-1", []))
+        docker_client = FakeDockerClient([])
+        docker_client.containers = BrokenContainers()
+        with self.assertRaises(docker.errors.APIError):
+            follow_supervised_run(str(self.run.uuid), "container-1", docker_client=docker_client)
+
+        # The run is not finished, so the run is followed again
+        assert get_supervised_runs() == {str(self.run.uuid): "container-1"}
+
+    def test_claim(self):
+        run_uuid = str(self.run.uuid)
+        supervisor = RunSupervisor(max_runs=1)
+        other_supervisor = RunSupervisor(max_runs=1)
+
+        assert supervisor.claim(run_uuid) is True
+        assert other_supervisor.claim(run_uuid) is False
+        supervisor.renew_leases()
+        assert other_supervisor.claim(run_uuid) is False
+
+        supervisor.release_lease(run_uuid)
+        assert other_supervisor.claim(run_uuid) is True
+        other_supervisor.release_lease(run_uuid)
+
+    def test_follow_supervised_run_container_not_found(self):
+        supervise_run(self.run, FakeContainer("container-1", []))
+        follow_supervised_run(str(self.run.uuid), "container-1", docker_client=FakeDockerClient([]))
+
+        self.run.refresh_from_db()
+        assert self.run.status == "FAILED"
+        assert get_supervised_runs() == {}
+
+
+class TestRunSupervisorPickUp(BaseJobTestDef, APITransactionTestCase):
+    """
+    Test picking up registered runs with the run supervisor. The runs are followed in threads that use their own
+    database connection, so the test data has to be committed.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.run = self.runs["run2"]
+        Run.objects.filter(pk=self.run.pk).update(status="IN_PROGRESS")
+
+    def tearDown(self):
+        for run_uuid in get_supervised_runs():
+            remove_supervised_run(run_uuid)
+        super().tearDown()
+
+    def test_follow_run_container_closes_database_connection(self):
+        container = DatabaseCheckContainer("container-1", ["Start run", "Run succeeded"])
+        follow_run_container(self.run, container)
+
+        assert container.closed_while_logging == [True, True]
+        self.run.refresh_from_db()
+        assert self.run.status == "COMPLETED"
+
+    def test_pick_up_runs(self):
+        run3 = self.runs["run3"]
+        Run.objects.filter(pk=run3.pk).update(status="IN_PROGRESS")
+        containers = [
+            FakeContainer("container-1", ["Run succeeded"]),
+            FakeContainer("container-3", ["AskAnna exit_code=1"]),
+        ]
+        supervise_run(self.run, containers[0])
+        supervise_run(run3, containers[1])
+
+        async def pick_up_and_follow(supervisor):
+            picked_up = await supervisor.pick_up_runs()
+            await asyncio.gather(*supervisor.tasks.values())
+            return picked_up
+
+        supervisor = RunSupervisor(max_runs=1, poll_interval=0.1, docker_client=FakeDockerClient(containers))
+        assert asyncio.run(pick_up_and_follow(supervisor)) == 1
+        assert len(get_supervised_runs()) == 1
+        assert asyncio.run(pick_up_and_follow(supervisor)) == 1
+        assert get_supervised_runs() == {}
+
+        self.run.refresh_from_db()
+        run3.refresh_from_db()
+        assert self.run.status == "COMPLETED"
+        assert run3.status == "FAILED"
@@ -2,7 +2,7 @@ import io
 import json
 
 import django_filters
-from django.db.models import Prefetch, Q
+from django.db.models import Prefetch
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     OpenApiExample,
@@ -15,11 +15,11 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 
-from account.models.membership import MSP_WORKSPACE
 from core.const import ALLOWED_API_AGENTS
 from core.filters import filter_multiple
 from core.mixins import ObjectRoleMixin, PartialUpdateModelMixin
 from core.permissions.role import RoleBasedPermission
+from core.permissions.visibility import get_project_visibility_filter
 from job.models import JobDef, JobPayload, ScheduledJob
 from job.serializers import JobSerializer, RequestJobRunSerializer
 from package.models import Package
@@ -94,24 +94,7 @@ class JobView(
         """
         Return only values from projects where the user is member of or has access to because it's public.
         """
-        user = self.request.user
-        if user.is_anonymous:
-            return (
-                super()
-                .get_queryset()
-                .filter(Q(project__workspace__visibility="PUBLIC") & Q(project__visibility="PUBLIC"))
-            )
-
-        member_of_workspaces = user.memberships.filter(object_type=MSP_WORKSPACE).values_list("object_uuid", flat=True)
-
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                Q(project__workspace__pk__in=member_of_workspaces)
-                | (Q(project__workspace__visibility="PUBLIC") & Q(project__visibility="PUBLIC"))
-            )
-        )
+        return super().get_queryset().filter(get_project_visibility_filter(self.request.user))
 
     def get_object_project(self):
         return self.current_object.project
@@ -1,4 +1,3 @@
-from django.db.models import Q
 from django.http import Http404
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
@@ -6,10 +5,11 @@ from rest_framework import mixins, viewsets
 from rest_framework.response import Response
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
-from account.models.membership import MSP_WORKSPACE, Membership
+from account.models.membership import Membership
 from core.filters import OrderingFilter
 from core.mixins import ObjectRoleMixin
 from core.permissions.role import RoleBasedPermission
+from core.permissions.visibility import get_project_visibility_filter
 from job.models import JobPayload
 from job.serializers import JobPayloadSerializer
 from run.models import Run
@@ -45,23 +45,8 @@ class JobPayloadView(
         where the current user had access to
         meaning also beeing part of a certain workspace
         """
-        user = self.request.user
-        if user.is_anonymous:
-            return (
-                super()
-                .get_queryset()
-                .filter(Q(jobdef__project__workspace__visibility="PUBLIC") & Q(jobdef__project__visibility="PUBLIC"))
-            )
-
-        member_of_workspaces = user.memberships.filter(object_type=MSP_WORKSPACE).values_list("object_uuid", flat=True)
-
         return (
-            super()
-            .get_queryset()
-            .filter(
-                Q(jobdef__project__workspace__in=member_of_workspaces)
-                | (Q(jobdef__project__workspace__visibility="PUBLIC") & Q(jobdef__project__visibility="PUBLIC"))
-            )
+            super().get_queryset().filter(get_project_visibility_filter(self.request.user, project="jobdef__project"))
         )
 
     def get_object_project(self):
@@ -70,7 +55,7 @@ class JobPayloadView(
     def get_parrent_roles(self, request, *args, **kwargs):
         run_suuid = self.kwargs["parent_lookup_run__suuid"]
         try:
-            run = Run.objects.active().get(suuid=run_suuid)
+            run = Run.objects.active().select_related("jobdef__project__workspace").get(suuid=run_suuid)
         except Run.DoesNotExist as exc:
             raise Http404 from exc
 
@@ -2,8 +2,11 @@ from zipfile import ZipFile
 
 from django.conf import settings
 from django.db.models.signals import pre_delete, pre_save
+from django.db.transaction import on_commit
 from django.dispatch import receiver
 
+from config.celery_app import app as celery_app
+
 from account.models.membership import MSP_WORKSPACE
 from core.config import AskAnnaConfig
 from job.models import JobDef, ScheduledJob
@@ -57,15 +60,12 @@ def package_upload_extract_jobs_from_askannayml(sender, signal, postheaders, obj
         # update the jobdef.environment_image and timezone
         jd.environment_image = job.environment.image
         jd.timezone = job.timezone
-        jd.deleted_at = None  # restore the deleted job if this was set
-        jd.save(
-            update_fields=[
-                "environment_image",
-                "timezone",
-                "deleted_at",
-                "modified_at",
-            ]
-        )
+        update_fields = ["environment_image", "timezone", "modified_at"]
+        if jd.deleted_at:
+            # restore the deleted job, only then the active state of the runs and payloads of the job is updated
+            jd.deleted_at = None
+            update_fields.append("deleted_at")
+        jd.save(update_fields=update_fields)
 
         # check what existing schedules where and store the last_run_at and raw_definition
         old_rules = ScheduledJob.objects.filter(job=jd)
@@ -88,6 +88,7 @@ def package_upload_extract_jobs_from_askannayml(sender, signal, postheaders, obj
                 "raw_definition": schedule.raw_definition,
                 "cron_definition": schedule.cron_definition,
                 "cron_timezone": schedule.cron_timezone,
+                "catch_up": schedule.catch_up,
                 "member": obj.created_by_member,
             }
             last_run_at = [
@@ -99,6 +100,23 @@ def package_upload_extract_jobs_from_askannayml(sender, signal, postheaders, obj
             scheduled_job.update_next()
 
 
+@receiver(package_upload_finish)
+def package_upload_prewarm_images(sender, signal, postheaders, obj, **kwargs):
+    """
+    Prepare the run images for the jobs in the package in the background, so a run does not have to wait for it
+    """
+    if not settings.RUN_IMAGE_PREWARM_ENABLED or not obj.get_askanna_yml_path():
+        return
+
+    obj.set_image_status("PENDING")
+    on_commit(
+        lambda: celery_app.send_task(
+            "job.tasks.prewarm_package_images",
+            kwargs={"package_uuid": obj.uuid},
+        )
+    )
+
+
 @receiver(pre_delete, sender=Package)
 def delete_package(sender, instance: Package, **kwargs):
     instance.prune()
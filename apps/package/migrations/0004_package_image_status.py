@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("package", "0003_update_package_created_by"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="package",
+            name="image_status",
+            field=models.CharField(
+                blank=True,
+                choices=[("PENDING", "PENDING"), ("READY", "READY"), ("FAILED", "FAILED")],
+                default="",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+def set_is_active(apps, schema_editor):
+    Package = apps.get_model("package", "Package")  # noqa: N806
+    Package.objects.exclude(
+        deleted_at__isnull=True, project__deleted_at__isnull=True, project__workspace__deleted_at__isnull=True
+    ).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("package", "0004_package_image_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="package",
+            name="is_active",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="package",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["project", "-created_at"],
+                name="package_active_created_at_idx",
+            ),
+        ),
+        migrations.RunPython(set_is_active, reverse_code=migrations.RunPython.noop, elidable=True),
+    ]
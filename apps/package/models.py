@@ -6,27 +6,25 @@ from django.db import models
 from django.db.models import Q
 
 from core.config import AskAnnaConfig
-from core.models import AuthorModel, FileBaseModel, NameDescriptionBaseModel
+from core.models import (
+    ActiveModel,
+    AuthorModel,
+    FileBaseModel,
+    NameDescriptionBaseModel,
+)
+from job.models.runimage import IMAGE_STATUS
 from package.signals import package_upload_finish
 
 
 class PackageQuerySet(models.QuerySet):
     def active(self):
-        return self.filter(
-            deleted_at__isnull=True,
-            project__deleted_at__isnull=True,
-            project__workspace__deleted_at__isnull=True,
-        ).exclude(original_filename="")
+        return self.filter(is_active=True).exclude(original_filename="")
 
     def active_and_finished(self):
         return self.active().filter(finished_at__isnull=False)
 
     def inactive(self):
-        return self.filter(
-            Q(deleted_at__isnull=False)
-            | Q(project__deleted_at__isnull=False)
-            | Q(project__workspace__deleted_at__isnull=False)
-        )
+        return self.filter(is_active=False)
 
 
 class PackageManager(models.Manager):
@@ -43,7 +41,7 @@ class PackageManager(models.Manager):
         return self.get_queryset().inactive()
 
 
-class Package(FileBaseModel, AuthorModel, NameDescriptionBaseModel):
+class Package(ActiveModel, FileBaseModel, AuthorModel, NameDescriptionBaseModel):
     original_filename = models.CharField(max_length=1000, default="")
 
     project = models.ForeignKey(
@@ -67,8 +65,13 @@ class Package(FileBaseModel, AuthorModel, NameDescriptionBaseModel):
         db_index=True,
     )
 
+    # Status of preparing the run images for the jobs in the package
+    image_status = models.CharField(max_length=20, choices=IMAGE_STATUS, blank=True, default="")
+
     objects = PackageManager()
 
+    active_parents = {"project.Project": "project", "workspace.Workspace": "project__workspace"}
+
     file_type = "package"
     file_extension = "zip"
     file_readmode = "rb"
@@ -116,6 +119,15 @@ class Package(FileBaseModel, AuthorModel, NameDescriptionBaseModel):
 
         return None
 
+    def set_image_status(self, image_status: str):
+        self.image_status = image_status
+        self.save(
+            update_fields=[
+                "image_status",
+                "modified_at",
+            ]
+        )
+
     def get_askanna_config(self) -> AskAnnaConfig | None:
         """
         Reads the askanna.yml as is and return as AskAnnaConfig or None
@@ -128,6 +140,11 @@ class Package(FileBaseModel, AuthorModel, NameDescriptionBaseModel):
     class Meta:
         get_latest_by = "created_at"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["project", "-created_at"], condition=Q(is_active=True), name="package_active_created_at_idx"
+            ),
+        ]
 
 
 class ChunkedPackagePart(models.Model):
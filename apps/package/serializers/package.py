@@ -13,6 +13,7 @@ class PackageSerializer(serializers.ModelSerializer):
     workspace = WorkspaceRelationSerializer(read_only=True, source="project.workspace")
     project = ProjectRelationSerializer(read_only=True)
     created_by = MembershipRelationSerializer(read_only=True, source="created_by_member")
+    image_status = serializers.ReadOnlyField()
 
     class Meta:
         model = Package
@@ -25,6 +26,7 @@ class PackageSerializer(serializers.ModelSerializer):
             "workspace",
             "project",
             "created_by",
+            "image_status",
             "created_at",
             "modified_at",
         ]
@@ -42,6 +44,7 @@ class PackageSerializerWithFileList(PackageSerializer, BaseArchiveDetailSerializ
             "workspace",
             "project",
             "created_by",
+            "image_status",
             "created_at",
             "modified_at",
             "cdn_base_url",
@@ -1,9 +1,17 @@
 import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from job.models import JobDef
 from job.tests.base import BaseJobTestDef
+from package.listeners import package_upload_extract_jobs_from_askannayml
+from package.models import Package
+from run.models import Run
 
 pytestmark = pytest.mark.django_db
 
@@ -189,3 +197,39 @@ class TestPublicProjectPackageList(BaseJobTestDef, APITestCase):
         )
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data["results"]) == 1  # type: ignore
+
+
+class TestPackageExtractJobs(BaseJobTestDef, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.package_with_jobs = Package.objects.create(
+            original_filename="project-001.zip",
+            project=self.project,
+            size=1,
+            name="TestPackageWithJobs",
+            created_by_user=self.users.get("member"),
+            finished_at=timezone.now(),
+        )
+        # Writing the package extracts the jobs from the askanna.yml
+        self.package_with_jobs.write((settings.TEST_RESOURCES_DIR / "projects" / "project-001.zip").open("rb"))
+        self.job = JobDef.objects.get(project=self.project, name="my-test-job")
+        self.run = Run.objects.create(jobdef=self.job, package=self.package_with_jobs, status="COMPLETED")
+
+    def extract_jobs(self):
+        package_upload_extract_jobs_from_askannayml(
+            sender=Package, signal=None, postheaders={}, obj=self.package_with_jobs
+        )
+
+    def test_extract_jobs_does_not_update_runs(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.extract_jobs()
+        assert not [query for query in queries if query["sql"].startswith('UPDATE "run_run"')]
+
+    def test_extract_jobs_restores_deleted_job(self):
+        self.job.to_deleted()
+        assert not Run.objects.get(pk=self.run.pk).is_active
+
+        self.extract_jobs()
+        self.job.refresh_from_db()
+        assert self.job.deleted_at is None
+        assert Run.objects.get(pk=self.run.pk).is_active
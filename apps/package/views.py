@@ -3,7 +3,7 @@ from pathlib import Path
 import django_filters
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Case, Q, When
+from django.db.models import Case, When
 from django.http import Http404
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema, extend_schema_view
@@ -12,10 +12,11 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import NotAuthenticated
 from rest_framework.response import Response
 
-from account.models.membership import MSP_WORKSPACE, Membership
+from account.models.membership import Membership
 from core.filters import filter_multiple
 from core.mixins import ObjectRoleMixin, SerializerByActionMixin
 from core.permissions.role import RoleBasedPermission
+from core.permissions.visibility import get_project_visibility_filter
 from core.views import BaseChunkedPartViewSet, BaseUploadFinishViewSet
 from package.models import ChunkedPackagePart, Package
 from package.serializers.chunked_package import ChunkedPackagePartSerializer
@@ -122,26 +123,7 @@ class PackageViewSet(
         """
         Return only values from projects where the user is member of or has access to because it's public.
         """
-        user = self.request.user
-        if user.is_anonymous:
-            queryset = (
-                super()
-                .get_queryset()
-                .filter(Q(project__workspace__visibility="PUBLIC") & Q(project__visibility="PUBLIC"))
-            )
-        else:
-            member_of_workspaces = user.memberships.filter(
-                object_type=MSP_WORKSPACE, deleted_at__isnull=True
-            ).values_list("object_uuid", flat=True)
-
-            queryset = (
-                super()
-                .get_queryset()
-                .filter(
-                    Q(project__workspace__pk__in=member_of_workspaces)
-                    | (Q(project__workspace__visibility="PUBLIC") & Q(project__visibility="PUBLIC"))
-                )
-            )
+        queryset = super().get_queryset().filter(get_project_visibility_filter(self.request.user))
 
         if self.action == "finish_upload":
             return queryset.filter(finished_at__isnull=True)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+def set_is_active(apps, schema_editor):
+    Project = apps.get_model("project", "Project")  # noqa: N806
+    Project.objects.exclude(deleted_at__isnull=True, workspace__deleted_at__isnull=True).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("project", "0002_update_project_created_by"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="is_active",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                condition=models.Q(("is_active", True)), fields=["workspace"], name="project_active_idx"
+            ),
+        ),
+        migrations.RunPython(set_is_active, reverse_code=migrations.RunPython.noop, elidable=True),
+    ]
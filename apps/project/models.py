@@ -2,15 +2,15 @@ from django.db import models
 from django.db.models import Q
 
 from core.const import VISIBLITY
-from core.models import AuthorModel, NameDescriptionBaseModel
+from core.models import ActiveModel, AuthorModel, NameDescriptionBaseModel
 
 
 class ProjectQuerySet(models.QuerySet):
     def active(self):
-        return self.filter(deleted_at__isnull=True, workspace__deleted_at__isnull=True)
+        return self.filter(is_active=True)
 
     def inactive(self):
-        return self.filter(Q(deleted_at__isnull=False) | Q(workspace__deleted_at__isnull=False))
+        return self.filter(is_active=False)
 
 
 class ProjectManager(models.Manager):
@@ -24,7 +24,7 @@ class ProjectManager(models.Manager):
         return self.get_queryset().inactive()
 
 
-class Project(AuthorModel, NameDescriptionBaseModel):
+class Project(ActiveModel, AuthorModel, NameDescriptionBaseModel):
     """A project resembles an organisation with code, jobs, runs artifacts"""
 
     name = models.CharField(max_length=255, blank=False, null=False, db_index=True, default="New project")
@@ -34,6 +34,8 @@ class Project(AuthorModel, NameDescriptionBaseModel):
 
     objects = ProjectManager()
 
+    active_parents = {"workspace.Workspace": "workspace"}
+
     def __str__(self):
         if self.name:
             return f"{self.name} ({self.suuid})"
@@ -47,4 +49,5 @@ class Project(AuthorModel, NameDescriptionBaseModel):
         ordering = ["name"]
         indexes = [
             models.Index(fields=["name", "created_at"]),
+            models.Index(fields=["workspace"], condition=Q(is_active=True), name="project_active_idx"),
         ]
@@ -202,11 +202,11 @@ class RunLogAdmin(admin.ModelAdmin):
 
     def log_preview(self, obj):  # pragma: no cover
         if obj.lines > 50:
-            log_first = json.dumps(obj.stdout[:20], indent=4)
-            log_last = json.dumps(obj.stdout[-20:], indent=4)
+            log_first = json.dumps(obj.get_log(limit=20), indent=4)
+            log_last = json.dumps(obj.get_log(offset=obj.lines - 20), indent=4)
             return f"{log_first} \n\n...\n\n {log_last}"
 
-        return json.dumps(obj.stdout, indent=4)
+        return json.dumps(obj.get_log(), indent=4)
 
     def has_add_permission(self, request):
         return False
@@ -9,6 +9,7 @@ from config.celery_app import app as celery_app
 
 from account.models.membership import MSP_WORKSPACE
 from core.utils import detect_file_mimetype, get_files_and_directories_in_zip_file
+from project.models import Project
 from run.models import (
     Run,
     RunArtifact,
@@ -19,6 +20,8 @@ from run.models import (
     RunVariableMeta,
 )
 from run.signals import artifact_upload_finish, result_upload_finish
+from run.tasks.visibility import hide_runs
+from workspace.models import Workspace
 
 
 @receiver(result_upload_finish)
@@ -101,34 +104,6 @@ def create_job_for_celery(sender, instance, created, **kwargs):
         )
 
 
-@receiver(post_save, sender=Run)
-def post_run_deduplicate_metrics(sender, instance, created, **kwargs):
-    """
-    Fix metrics after job is finished
-    """
-    if instance.is_finished:
-        on_commit(
-            lambda: celery_app.send_task(
-                "run.tasks.post_run_deduplicate_metrics",
-                kwargs={"run_uuid": instance.uuid},
-            )
-        )
-
-
-@receiver(post_save, sender=Run)
-def post_run_deduplicate_variables(sender, instance, created, **kwargs):
-    """
-    Fix variables after job is finished
-    """
-    if instance.is_finished:
-        on_commit(
-            lambda: celery_app.send_task(
-                "run.tasks.post_run_deduplicate_variables",
-                kwargs={"run_uuid": instance.uuid},
-            )
-        )
-
-
 @receiver(post_save, sender=Run)
 def create_runvariable(sender, instance, created, **kwargs):
     """
@@ -159,27 +134,11 @@ def add_created_by_member_to_run(sender, instance: Run, **kwargs):
             instance.created_by_member = membership
 
 
-@receiver(post_save, sender=RunMetricMeta)
-def extract_meta_from_metric(sender, instance, created, **kwargs):
-    """
-    After saving metrics, we want to update the run metric meta information
-    """
-    update_fields = kwargs.get("update_fields")
-    if update_fields:
-        return
-
-    on_commit(
-        lambda: celery_app.send_task(
-            "run.tasks.extract_run_metric_meta",
-            kwargs={"metric_meta_uuid": instance.uuid},
-        )
-    )
-
-
 @receiver(post_save, sender=RunMetricMeta)
 def move_metrics_to_rows(sender, instance, created, **kwargs):
     """
-    After saving metric, we save the individual rows to a new table which allows us to query the metrics
+    After saving metric, we save the individual rows to a new table which allows us to query the metrics. When the rows
+    are saved, the task schedules the update of the run metric meta information.
     """
     update_fields = kwargs.get("update_fields")
     if update_fields:
@@ -203,28 +162,12 @@ def delete_runmetric(sender, instance, **kwargs):
     instance.prune()
 
 
-@receiver(post_save, sender=RunVariableMeta)
-def extract_meta_from_variable(sender, instance, created, **kwargs):
-    """
-    After saving tracked variables, we want to update the run variable meta information
-    """
-    update_fields = kwargs.get("update_fields")
-    if update_fields or created:
-        return
-
-    on_commit(
-        lambda: celery_app.send_task(
-            "run.tasks.extract_run_variable_meta",
-            kwargs={"variable_meta_uuid": instance.uuid},
-        )
-    )
-
-
 @receiver(post_save, sender=RunVariableMeta)
 def move_variables_to_rows(sender, instance, created, **kwargs):
     """
     After saving variables, we save the individual rows to
-    a new table that allows us to query the variables
+    a new table that allows us to query the variables. When the rows
+    are saved, the task schedules the update of the run variable meta information.
     """
     update_fields = kwargs.get("update_fields")
     if update_fields or created:
@@ -253,25 +196,59 @@ def mask_secret_variables(sender, instance, **kwargs):
     An instance is not masked yet, if it was coming from the API (SDK call)
 
     """
-    if not instance.is_masked:
-        variable_name = instance.variable.get("name").upper()
-        is_masked = any(
-            [
-                "KEY" in variable_name,
-                "TOKEN" in variable_name,
-                "SECRET" in variable_name,
-                "PASSWORD" in variable_name,
-            ]
-        )
-        if is_masked:
-            instance.variable["value"] = "***masked***"
-            instance.is_masked = True
-            # add the tag is_masked, but first check whether this is already in the instance.label
-            has_is_masked = "is_masked" in [label.get("name") for label in instance.label]
-            if not has_is_masked:
-                instance.label.append({"name": "is_masked", "value": None, "type": "tag"})
+    instance.mask_secret()
 
 
 @receiver(pre_delete, sender=RunVariableMeta)
 def delete_runvariable(sender, instance, **kwargs):
     instance.prune()
+
+
+def has_visibility_changed(sender, instance, update_fields=None) -> bool:
+    """
+    Check if the visibility of the instance will change compared to the stored value
+    """
+    if instance._state.adding or (update_fields is not None and "visibility" not in update_fields):
+        return False
+    stored_visibility = sender.objects.filter(pk=instance.pk).values_list("visibility", flat=True).first()
+    return stored_visibility is not None and stored_visibility != instance.visibility
+
+
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=Workspace)
+def check_visibility_changed(sender, instance, update_fields=None, **kwargs):
+    instance._visibility_changed = has_visibility_changed(sender, instance, update_fields)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Workspace)
+def propagate_visibility(sender, instance, created, **kwargs):
+    """
+    When the visibility of a project or workspace changed, update the denormalized visibility of the runs and metrics.
+
+    Runs and metrics are hidden in the same transaction, so they are never visible after the project or workspace is
+    made private. Making them public can wait for the task.
+    """
+    if created or not getattr(instance, "_visibility_changed", False):
+        return
+    instance._visibility_changed = False
+
+    if instance.visibility != "PUBLIC":
+        if sender is Project:
+            hide_runs(instance.workspace, project=instance)
+        else:
+            hide_runs(instance)
+        return
+
+    task_kwargs = {"project_uuid" if sender is Project else "workspace_uuid": instance.uuid}
+    if settings.TEST:
+        from run.tasks import update_visibility
+
+        update_visibility(**task_kwargs)
+    else:
+        on_commit(
+            lambda: celery_app.send_task(
+                "run.tasks.update_visibility",
+                kwargs=task_kwargs,
+            )
+        )
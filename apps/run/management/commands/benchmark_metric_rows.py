@@ -0,0 +1,63 @@
+import datetime
+import time
+from collections.abc import Iterator
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from job.models import JobDef
+from project.models import Project
+from run.models import Run
+from run.tasks.metric import create_metric_rows
+from workspace.models import Workspace
+
+
+def generate_metrics(count: int) -> Iterator[dict]:
+    created_at = datetime.datetime.now(tz=datetime.UTC)
+    for idx in range(count):
+        yield {
+            "metric": {"name": f"metric-{idx % 10}", "value": idx / 3, "type": "float"},
+            "label": [
+                {"name": "epoch", "value": idx // 100, "type": "integer"},
+                {"name": "dataset", "value": "train", "type": "string"},
+            ],
+            "created_at": (created_at + datetime.timedelta(microseconds=idx)).isoformat(),
+        }
+
+
+class Command(BaseCommand):
+    help = "Benchmark moving run metrics to rows. All data created by the benchmark is rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1_000, 100_000, 1_000_000],
+            help="Number of metrics to insert per benchmark round",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of rows per INSERT, defaults to the setting RUN_ROWS_BATCH_SIZE",
+        )
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            with transaction.atomic():
+                workspace = Workspace.objects.create(name="Benchmark metric rows")
+                project = Project.objects.create(name="Benchmark metric rows", workspace=workspace)
+                jobdef = JobDef.objects.create(name="benchmark-metric-rows", project=project)
+                run = Run.objects.create(jobdef=jobdef, status="COMPLETED")
+
+                start = time.monotonic()
+                count = create_metric_rows(run, generate_metrics(size), batch_size=options["batch_size"])
+                duration = time.monotonic() - start
+
+                self.stdout.write(
+                    f"{count:>9} metrics moved to rows in {duration:.2f} seconds "
+                    f"({count / duration if duration else count:.0f} rows/sec)"
+                )
+
+                transaction.set_rollback(True)
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("run", "0002_update_run_created_by"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="runmetricrow",
+            name="content_hash",
+            field=models.CharField(
+                default=None,
+                editable=False,
+                help_text="Hash of the metric, label and created_at used to prevent duplicate metrics for a run",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="runvariablerow",
+            name="content_hash",
+            field=models.CharField(
+                default=None,
+                editable=False,
+                help_text="Hash of the variable, label and created_at used to prevent duplicate variables for a run",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="runmetricrow",
+            constraint=models.UniqueConstraint(
+                fields=("run", "content_hash"), name="runmetric_run_content_hash_unique"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="runvariablerow",
+            constraint=models.UniqueConstraint(
+                fields=("run", "content_hash"), name="runvariable_run_content_hash_unique"
+            ),
+        ),
+    ]
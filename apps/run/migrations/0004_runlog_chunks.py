@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("run", "0003_runmetric_runvariable_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="runlog",
+            name="lines",
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Number of lines in the log"),
+        ),
+        migrations.AddField(
+            model_name="runlog",
+            name="size",
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text="Size of the log as JSON list"),
+        ),
+        migrations.RunSQL(
+            sql=(
+                "UPDATE run_log SET lines = JSONB_ARRAY_LENGTH(stdout), size = OCTET_LENGTH(stdout::text) "
+                "WHERE JSONB_TYPEOF(stdout) = 'array'"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+            elidable=True,
+        ),
+        migrations.CreateModel(
+            name="RunLogChunk",
+            fields=[
+                ("uuid", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("chunk_no", models.PositiveIntegerField()),
+                (
+                    "first_line",
+                    models.PositiveIntegerField(help_text="Index of the first line of the log in this chunk"),
+                ),
+                ("lines", models.PositiveIntegerField(help_text="Number of lines in this chunk")),
+                ("data", models.BinaryField(help_text="Log lines as zlib compressed JSON list")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "run_log",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="chunks", to="run.runlog"
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "run_log_chunk",
+                "ordering": ["run_log", "chunk_no"],
+                "indexes": [models.Index(fields=["run_log", "first_line"], name="run_log_chu_run_log_8afa9d_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="runlogchunk",
+            constraint=models.UniqueConstraint(fields=("run_log", "chunk_no"), name="run_log_chunk_unique_chunk_no"),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("run", "0004_runlog_chunks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RunOutbox",
+            fields=[
+                ("uuid", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("task_name", models.CharField(max_length=255)),
+                ("kwargs", models.JSONField(default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="outbox", to="run.run"
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "run_outbox",
+                "ordering": ["created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_visibility(apps, schema_editor):
+    Project = apps.get_model("project", "Project")  # noqa: N806
+    Run = apps.get_model("run", "Run")  # noqa: N806
+    RunMetricRow = apps.get_model("run", "RunMetricRow")  # noqa: N806
+    for project in Project.objects.select_related("workspace"):
+        is_public = project.visibility == "PUBLIC" and project.workspace.visibility == "PUBLIC"
+        Run.objects.filter(jobdef__project=project).update(workspace_id=project.workspace_id, is_public=is_public)
+        RunMetricRow.objects.filter(run__jobdef__project=project).update(
+            workspace_id=project.workspace_id, is_public=is_public
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workspace", "0002_update_workspace_created_by"),
+        ("project", "0002_update_project_created_by"),
+        ("run", "0005_runoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="run",
+            name="is_public",
+            field=models.BooleanField(
+                default=False, editable=False, help_text="True if the project and the workspace of the run are public"
+            ),
+        ),
+        migrations.AddField(
+            model_name="run",
+            name="workspace",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="workspace.workspace",
+            ),
+        ),
+        migrations.AddField(
+            model_name="runmetricrow",
+            name="is_public",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="runmetricrow",
+            name="workspace",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="workspace.workspace",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="run",
+            index=models.Index(
+                condition=models.Q(("is_public", True)), fields=["is_public"], name="run_is_public_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="runmetricrow",
+            index=models.Index(
+                condition=models.Q(("is_public", True)), fields=["is_public"], name="runmetric_is_public_idx"
+            ),
+        ),
+        migrations.RunPython(set_visibility, reverse_code=migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+def set_is_active(apps, schema_editor):
+    Run = apps.get_model("run", "Run")  # noqa: N806
+    Run.objects.exclude(
+        deleted_at__isnull=True,
+        jobdef__deleted_at__isnull=True,
+        jobdef__project__deleted_at__isnull=True,
+        jobdef__project__workspace__deleted_at__isnull=True,
+    ).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("run", "0006_run_visibility"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="run",
+            name="is_active",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="run",
+            index=models.Index(
+                condition=models.Q(("is_active", True)), fields=["-created_at"], name="run_active_created_at_idx"
+            ),
+        ),
+        migrations.RunPython(set_is_active, reverse_code=migrations.RunPython.noop, elidable=True),
+    ]
@@ -1,7 +1,8 @@
 from .artifact import ChunkedRunArtifactPart, RunArtifact  # noqa: F401
-from .log import RedisLogQueue, RunLog  # noqa: F401
+from .log import RedisLogQueue, RunLog, RunLogChunk  # noqa: F401
 from .metric import RunMetricMeta  # noqa: F401
 from .metric import RunMetricRow as RunMetric  # noqa: F401
+from .outbox import RunOutbox  # noqa: F401
 from .result import ChunkedRunResultPart, RunResult  # noqa: F401
 from .run import Run  # noqa: F401
 from .variable import RunVariableMeta  # noqa: F401
@@ -1,9 +1,15 @@
 import datetime
+import functools
 import json
 import logging
+import time
+import uuid
+import zlib
 
 import redis
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
 
 from config.settings.main import env
 
@@ -19,78 +25,253 @@ class RunLog(BaseModel):
 
     run = models.OneToOneField("run.Run", on_delete=models.CASCADE, related_name="output")
     exit_code = models.IntegerField(default=0)
+    # The stdout is only used for logs that were saved before the log was stored in chunks
     stdout = models.JSONField(blank=True, null=True)
+    lines = models.PositiveIntegerField(editable=False, default=0, help_text="Number of lines in the log")
+    size = models.PositiveBigIntegerField(editable=False, default=0, help_text="Size of the log as JSON list")
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.logqueue = RedisLogQueue(suuid=self.run.suuid)
         self.log_idx = 0
+        self.log_buffer = []
+        self.log_buffer_flushed_at = time.monotonic()
+
+    @functools.cached_property
+    def logqueue(self) -> "RedisLogQueue":
+        # Created on first use, so loading logs for a list of runs does not query the run of every log
+        return RedisLogQueue(suuid=self.run.suuid)
 
     def log(self, message: str | None = None, timestamp: str | None = None, print_log: bool = False):
+        """
+        Add a line to the log. Lines are buffered and written to the log queue when the buffer is full, when the buffer
+        was last flushed more than `settings.RUN_LOG_BUFFER_FLUSH_INTERVAL` seconds ago, or when `flush` is called.
+        """
         self.log_idx += 1
         if not timestamp:
             timestamp = datetime.datetime.utcnow().isoformat()
-        self.logqueue.append([self.log_idx, timestamp, message])
+        self.log_buffer.append([self.log_idx, timestamp, message])
         if print_log:
             logger.info([self.log_idx, timestamp, message])
 
-    def save_stdout(self):
-        self.stdout = self.logqueue.get()
-        self.save(
-            update_fields=[
-                "stdout",
-                "modified_at",
-            ]
-        )
+        if (
+            len(self.log_buffer) >= settings.RUN_LOG_BUFFER_SIZE
+            or time.monotonic() - self.log_buffer_flushed_at >= settings.RUN_LOG_BUFFER_FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered log lines to the log queue
+        """
+        if self.log_buffer:
+            self.logqueue.extend(self.log_buffer)
+            self.log_buffer = []
+        self.log_buffer_flushed_at = time.monotonic()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self.stdout is not None and (update_fields is None or "stdout" in update_fields):
+            self.lines = len(self.stdout)
+            self.size = len(json.dumps(self.stdout).encode("utf-8"))
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "lines", "size"}
+
+        super().save(*args, **kwargs)
+
+    def save_stdout(self, exit_code: int | None = None):
+        """
+        Move the log from the log queue to compressed chunks of `settings.RUN_LOG_CHUNK_LINES` lines in the database.
+        If `exit_code` is set, the exit code is saved with the log.
+        """
+        self.flush()
+
+        chunk_lines = settings.RUN_LOG_CHUNK_LINES
+        lines = 0
+        size = 0
 
-        # remove the queue after saving
-        self.logqueue.remove()
+        with transaction.atomic():
+            self.chunks.all().delete()
 
-    def save_exitcode(self, exit_code=0):
-        self.exit_code = exit_code
-        self.save(
-            update_fields=[
-                "exit_code",
-                "modified_at",
-            ]
+            chunk_no = 0
+            while log := self.logqueue.get(start=lines, end=lines + chunk_lines - 1):
+                data = json.dumps(log).encode("utf-8")
+                RunLogChunk.objects.create(
+                    run_log=self,
+                    chunk_no=chunk_no,
+                    first_line=lines,
+                    lines=len(log),
+                    data=zlib.compress(data),
+                )
+                chunk_no += 1
+                lines += len(log)
+                # The brackets of the chunks add up to the brackets and separators of the full JSON list
+                size += len(data)
+
+            self.stdout = None
+            self.lines = lines
+            self.size = size
+            update_fields = ["stdout", "lines", "size", "modified_at"]
+            if exit_code is not None:
+                self.exit_code = exit_code
+                update_fields.append("exit_code")
+            self.save(update_fields=update_fields)
+
+        # Remove the queue when the log is committed. Until then the log is read from the queue, and if the transaction
+        # is rolled back, the queue still has the full log.
+        transaction.on_commit(self.logqueue.remove)
+
+    def get_log(self, offset: int = 0, limit: int | None = None) -> list:
+        """
+        Return the lines of the log from `offset`. If `limit` is set, at most `limit` lines are returned. Only the
+        chunks that contain the requested lines are read.
+        """
+        end = self.lines if limit is None else min(offset + limit, self.lines)
+
+        if self.stdout is not None:
+            return self.stdout[offset:end]
+
+        if offset >= end:
+            return []
+
+        chunks = (
+            self.chunks.annotate(end_line=F("first_line") + F("lines"))
+            .filter(first_line__lt=end, end_line__gt=offset)
+            .order_by("first_line")
         )
 
-    @property
-    def lines(self):
-        return len(self.stdout) if self.stdout else 0
+        log = []
+        first_line = None
+        for chunk in chunks:
+            if first_line is None:
+                first_line = chunk.first_line
+            log += chunk.log
 
-    @property
-    def size(self):
-        return len(json.dumps(self.stdout).encode("utf-8")) if self.stdout else 0
+        if first_line is None:
+            return []
+        return log[offset - first_line : end - first_line]
 
     class Meta:
         db_table = "run_log"
         ordering = ["-created_at"]
 
 
+class RunLogChunk(models.Model):
+    """
+    A compressed part of the lines of a run log
+    """
+
+    uuid = models.UUIDField(primary_key=True, editable=False, default=uuid.uuid4)
+    run_log = models.ForeignKey(RunLog, on_delete=models.CASCADE, related_name="chunks")
+    chunk_no = models.PositiveIntegerField()
+    first_line = models.PositiveIntegerField(help_text="Index of the first line of the log in this chunk")
+    lines = models.PositiveIntegerField(help_text="Number of lines in this chunk")
+    data = models.BinaryField(help_text="Log lines as zlib compressed JSON list")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "run_log_chunk"
+        ordering = ["run_log", "chunk_no"]
+        constraints = [
+            models.UniqueConstraint(fields=["run_log", "chunk_no"], name="run_log_chunk_unique_chunk_no"),
+        ]
+        indexes = [
+            models.Index(fields=["run_log", "first_line"]),
+        ]
+
+    def __str__(self):
+        return f"{self.run_log} - chunk {self.chunk_no} ({self.uuid})"
+
+    @property
+    def log(self) -> list:
+        return json.loads(zlib.decompress(self.data))
+
+
 class RedisLogQueue:
+    """
+    The log of a run in progress. The log is stored in a Redis list to read lines by index, and in a Redis stream
+    so clients can wait for new lines with a blocking read.
+    """
+
     def __init__(self, suuid: str):
         self.suuid = suuid
+        self.stream_key = f"{suuid}:stream"
         self.redis_url = env("REDIS_URL")
         self.redis = redis.Redis.from_url(self.redis_url)
 
+    def _add(self, pipeline, log_objects: list):
+        lines = [json.dumps(log_object) for log_object in log_objects]
+        pipeline.rpush(self.suuid, *lines)
+        for line in lines:
+            pipeline.xadd(
+                self.stream_key,
+                {"line": line},
+                maxlen=settings.RUN_LOG_STREAM_MAXLEN,
+                approximate=True,
+            )
+
     def append(self, log_object: list | None = None):
         """
         Add log object to queue
         """
         if log_object:
-            return self.redis.rpush(self.suuid, json.dumps(log_object))
+            return self.extend([log_object])
+        return None
+
+    def extend(self, log_objects: list):
+        """
+        Add multiple log objects to the queue with a single round trip to Redis
+        """
+        if log_objects:
+            with self.redis.pipeline() as pipeline:
+                self._add(pipeline, log_objects)
+                return pipeline.execute()[0]
         return None
 
-    def get(self):
+    def get(self, start: int = 0, end: int = -1):
         """
-        Return the full queue of logs
+        Return the logs in the queue from index `start` up to and including index `end`. By default the full queue of
+        logs is returned.
         """
-        queued_log = self.redis.lrange(self.suuid, 0, -1)
+        queued_log = self.redis.lrange(self.suuid, start, end)
         return list(map(lambda x: json.loads(x), queued_log))
 
+    def length(self) -> int:
+        """
+        Return the number of logs in the queue
+        """
+        return self.redis.llen(self.suuid)
+
+    def get_last_stream_id(self) -> str:
+        """
+        Return the id of the last entry in the stream, or "0" if the stream is empty
+        """
+        entries = self.redis.xrevrange(self.stream_key, count=1)
+        return entries[0][0].decode() if entries else "0"
+
+    def read_stream(
+        self, last_id: str = "0", block: int | None = None, count: int = 1000
+    ) -> list[tuple[str, list | None]]:
+        """
+        Return the logs that are added to the stream after the entry with `last_id`. If there are no new logs, wait at
+        most `block` milliseconds for new logs. The log is None for the entry that marks the end of the log.
+        """
+        response = self.redis.xread({self.stream_key: last_id}, count=count, block=block)
+        if not response:
+            return []
+
+        _, entries = response[0]
+        return [
+            (entry_id.decode(), json.loads(fields[b"line"]) if b"line" in fields else None)
+            for entry_id, fields in entries
+        ]
+
     def remove(self):
         """
-        Remove this log queue
+        Remove this log queue. Clients reading the stream receive an end marker, after that the stream expires.
         """
-        return self.redis.delete(self.suuid)
+        with self.redis.pipeline() as pipeline:
+            pipeline.delete(self.suuid)
+            pipeline.xadd(self.stream_key, {"end": 1})
+            pipeline.expire(self.stream_key, settings.RUN_LOG_STREAM_TTL)
+            return pipeline.execute()[0]
@@ -1,14 +1,23 @@
 import io
 import json
+from collections.abc import Iterator
 from pathlib import Path
 
 from django.conf import settings
 from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import Q, QuerySet
 from django.utils import timezone
 
 from core.models import BaseModel, FileBaseModel
-from run.utils import get_unique_names_with_data_type
+from core.utils import append_to_json_array_file, iterate_json_array
+from run.utils import (
+    get_content_hash,
+    get_count_and_size_from_rows,
+    get_label_names_with_data_type_from_rows,
+    get_names_with_data_type_from_rows,
+    get_unique_names_with_data_type,
+)
 
 
 class RunMetricMeta(FileBaseModel):
@@ -26,8 +35,8 @@ class RunMetricMeta(FileBaseModel):
     run = models.ForeignKey("run.Run", on_delete=models.CASCADE, related_name="metrics_meta")
 
     @property
-    def metrics(self) -> list:
-        return self.load_from_file()
+    def metrics(self) -> Iterator[dict]:
+        return self.iterate_from_file()
 
     @metrics.setter
     def metrics(self, value):
@@ -61,61 +70,58 @@ class RunMetricMeta(FileBaseModel):
         with self.stored_path.open() as f:
             return json.loads(f.read())
 
+    def iterate_from_file(self) -> Iterator[dict]:
+        """
+        Iterate over the metrics stored in the file one by one, without loading the full file in memory
+        """
+        with self.stored_path.open() as f:
+            yield from iterate_json_array(f)
+
+    def append_to_file(self, metrics: list):
+        """
+        Append metrics to the file without rewriting the metrics that are already stored
+        """
+        if not self.stored_path.exists():
+            self.metrics = metrics
+            return
+
+        append_to_json_array_file(self.stored_path, metrics)
+
     def prune(self):
         super().prune()
 
         # also remove the rows of metrics attached to this object
         RunMetricRow.objects.filter(run__suuid=self.suuid).delete()
 
-    def update_meta(self):
+    def update_meta(self, new_metrics: QuerySet | None = None):
         """
-        Update the meta information metric_names and label_names
+        Update the meta information count, size, metric_names and label_names
+
+        The meta information is aggregated in the database. By default all metrics of the run are aggregated. When
+        `new_metrics` is set, only these metrics are aggregated and merged into the existing meta information. Use
+        this when metrics are added to a run that already has meta information.
         """
-        run_metrics = RunMetricRow.objects.filter(run__suuid=self.suuid)
-        if not run_metrics:
+        run_metrics = new_metrics if new_metrics is not None else RunMetricRow.objects.filter(run_id=self.run_id)
+
+        count, size = get_count_and_size_from_rows(run_metrics, "metric")
+        if not count:
             return
 
-        def compose_response(instance, metric):
-            return {
-                "run_suuid": instance.suuid,
-                "metric": metric.metric,
-                "label": metric.label,
-                "created_at": metric.created_at.isoformat(),
-            }
-
-        self.count = len(run_metrics)
-        self.size = len(json.dumps([compose_response(self, v) for v in run_metrics]).encode("utf-8"))
-
-        all_metric_names = []
-        all_label_names = []
-        for metric in run_metrics:
-            all_metric_names.append(
-                {
-                    "name": metric.metric.get("name"),
-                    "type": metric.metric.get("type"),
-                    "count": 1,
-                }
-            )
-
-            labels = metric.label
-            if labels:
-                for label in labels:
-                    all_label_names.append(
-                        {
-                            "name": label.get("name"),
-                            "type": label.get("type"),
-                        }
-                    )
-
-        unique_metric_names = None
-        if all_metric_names:
-            unique_metric_names = get_unique_names_with_data_type(all_metric_names)
-        self.metric_names = unique_metric_names
-
-        unique_label_names = None
-        if all_label_names:
-            unique_label_names = get_unique_names_with_data_type(all_label_names)
-        self.label_names = unique_label_names
+        metric_names = get_names_with_data_type_from_rows(run_metrics, "metric")
+        label_names = get_label_names_with_data_type_from_rows(run_metrics)
+
+        if new_metrics is not None and self.count:
+            # The separator between the existing and new metrics replaces the brackets of one of the lists
+            count += self.count
+            size += self.size
+            # The new metrics are the most recent, so their names come first like when all metrics are aggregated
+            metric_names = get_unique_names_with_data_type(metric_names + (self.metric_names or []))
+            label_names = get_unique_names_with_data_type(label_names + (self.label_names or []))
+
+        self.count = count
+        self.size = size
+        self.metric_names = metric_names or None
+        self.label_names = label_names or None
 
         self.save(
             update_fields=[
@@ -161,9 +167,43 @@ class RunMetricRow(BaseModel):
     # Redefine the created_at field, we want this to be overwritabe and with other default
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Rows without a content hash should not conflict with each other, so NULL is used instead of an empty string
+    content_hash = models.CharField(  # noqa: DJ001
+        max_length=64,
+        null=True,
+        default=None,
+        editable=False,
+        help_text="Hash of the metric, label and created_at used to prevent duplicate metrics for a run",
+    )
+
+    # Denormalized from the run, so access to metrics can be filtered without joining the run, job, project and
+    # workspace. See `Run.set_visibility`.
+    workspace = models.ForeignKey(
+        "workspace.Workspace", on_delete=models.CASCADE, null=True, editable=False, related_name="+"
+    )
+    is_public = models.BooleanField(default=False, editable=False)
+
+    def save(self, *args, **kwargs):
+        if self.workspace_id is None:
+            self.set_visibility()
+        super().save(*args, **kwargs)
+
+    def set_visibility(self):
+        self.workspace_id = self.run.workspace_id
+        self.is_public = self.run.is_public
+
+    def set_content_hash(self):
+        self.content_hash = get_content_hash(self.metric, self.label, self.created_at.isoformat())
+
     class Meta:
         db_table = "run_metric_row"
         ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["run", "content_hash"],
+                name="runmetric_run_content_hash_unique",
+            ),
+        ]
         indexes = [
             GinIndex(
                 name="runmetric_metric_json_idx",
@@ -175,4 +215,5 @@ class RunMetricRow(BaseModel):
                 fields=["label"],
                 opclasses=["jsonb_path_ops"],
             ),
+            models.Index(fields=["is_public"], condition=Q(is_public=True), name="runmetric_is_public_idx"),
         ]
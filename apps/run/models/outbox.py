@@ -0,0 +1,47 @@
+import logging
+import uuid
+
+from django.db import models, transaction
+
+from config.celery_app import app as celery_app
+
+logger = logging.getLogger(__name__)
+
+
+class RunOutbox(models.Model):
+    """
+    A task to send for a run. The tasks are stored in the same transaction as the change of the run that triggers
+    them, so a task is only sent when the change is committed, and it's sent once for every change.
+    """
+
+    uuid = models.UUIDField(primary_key=True, editable=False, default=uuid.uuid4)
+    run = models.ForeignKey("run.Run", on_delete=models.CASCADE, related_name="outbox")
+    task_name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "run_outbox"
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return f"{self.task_name} ({self.uuid})"
+
+    @classmethod
+    def dispatch(cls, pks: list | None = None, limit: int = 1000) -> int:
+        """
+        Send the tasks in the outbox and remove them from the outbox. If `pks` is set, only these tasks are sent.
+        Tasks that are sent by another dispatcher at the same time are skipped. Returns the number of tasks sent.
+        """
+        with transaction.atomic():
+            outbox = cls.objects.order_by("created_at").select_for_update(skip_locked=True)
+            if pks is not None:
+                outbox = outbox.filter(pk__in=pks)
+            outbox = list(outbox[:limit])
+
+            for task in outbox:
+                celery_app.send_task(task.task_name, kwargs=task.kwargs)
+            cls.objects.filter(pk__in=[task.pk for task in outbox]).delete()
+
+        return len(outbox)
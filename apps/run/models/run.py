@@ -1,12 +1,11 @@
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
-from django.db.transaction import on_commit
 from django.utils import timezone
 
-from config.celery_app import app as celery_app
-
-from core.models import AuthorModel, NameDescriptionBaseModel
+from core.models import ActiveModel, AuthorModel, NameDescriptionBaseModel
+from run.models.outbox import RunOutbox
 
 RUN_STATUS = (
     ("SUBMITTED", "SUBMITTED"),
@@ -16,6 +15,45 @@ RUN_STATUS = (
     ("FAILED", "FAILED"),
 )
 
+# The statuses a run can change to, with the statuses the run can change from
+RUN_TRANSITIONS = {
+    "PENDING": ["SUBMITTED"],
+    "IN_PROGRESS": ["SUBMITTED", "PENDING"],
+    "COMPLETED": ["SUBMITTED", "PENDING", "IN_PROGRESS"],
+    "FAILED": ["SUBMITTED", "PENDING", "IN_PROGRESS"],
+}
+
+# The tasks that are sent when a run changes to a status
+RUN_TRANSITION_TASKS = {
+    "PENDING": ["job.tasks.send_run_notification"],
+    "COMPLETED": [
+        "job.tasks.send_run_notification",
+        "job.tasks.release_run_resources",
+        "run.tasks.post_run_deduplicate_metrics",
+        "run.tasks.post_run_deduplicate_variables",
+    ],
+    "FAILED": [
+        "job.tasks.send_run_notification",
+        "job.tasks.release_run_resources",
+        "run.tasks.post_run_deduplicate_metrics",
+        "run.tasks.post_run_deduplicate_variables",
+    ],
+}
+
+# The tasks that remove duplicate rows after a run, not needed when duplicates are skipped on insert
+RUN_DEDUPLICATE_TASKS = ["run.tasks.post_run_deduplicate_metrics", "run.tasks.post_run_deduplicate_variables"]
+
+
+def get_transition_tasks(status: str) -> list[str]:
+    """
+    Return the tasks that are sent when a run changes to the status
+    """
+    tasks = RUN_TRANSITION_TASKS.get(status, [])
+    if settings.RUN_ROWS_DEDUPLICATE_ON_INSERT:
+        tasks = [task_name for task_name in tasks if task_name not in RUN_DEDUPLICATE_TASKS]
+    return tasks
+
+
 # If STATUS_MAPPING is updated, also update the mapping in run/views/run.py (annotated field 'status_external')
 STATUS_MAPPING = {
     "SUBMITTED": "queued",
@@ -42,20 +80,10 @@ def get_status_external(status: str) -> str:
 
 class RunQuerySet(models.QuerySet):
     def active(self):
-        return self.filter(
-            deleted_at__isnull=True,
-            jobdef__deleted_at__isnull=True,
-            jobdef__project__deleted_at__isnull=True,
-            jobdef__project__workspace__deleted_at__isnull=True,
-        )
+        return self.filter(is_active=True)
 
     def inactive(self):
-        return self.filter(
-            Q(deleted_at__isnull=False)
-            | Q(jobdef__deleted_at__isnull=True)
-            | Q(jobdef__project__deleted_at__isnull=False)
-            | Q(jobdef__project__workspace__deleted_at__isnull=False)
-        )
+        return self.filter(is_active=False)
 
 
 class RunManager(models.Manager):
@@ -69,7 +97,7 @@ class RunManager(models.Manager):
         return self.get_queryset().inactive()
 
 
-class Run(AuthorModel, NameDescriptionBaseModel):
+class Run(ActiveModel, AuthorModel, NameDescriptionBaseModel):
     name = models.CharField(max_length=255, blank=True, null=False, default="", db_index=True)
 
     jobdef = models.ForeignKey("job.JobDef", on_delete=models.CASCADE)
@@ -93,8 +121,23 @@ class Run(AuthorModel, NameDescriptionBaseModel):
 
     celery_task_id = models.CharField(max_length=120, blank=True, help_text="The task ID of the Celery run")
 
+    # Denormalized from the project of the run, so access to runs can be filtered without joining the job, project and
+    # workspace. Kept up to date by the listeners when the visibility of the project or workspace changes.
+    workspace = models.ForeignKey(
+        "workspace.Workspace", on_delete=models.CASCADE, null=True, editable=False, related_name="+"
+    )
+    is_public = models.BooleanField(
+        default=False, editable=False, help_text="True if the project and the workspace of the run are public"
+    )
+
     objects = RunManager()
 
+    active_parents = {
+        "job.JobDef": "jobdef",
+        "project.Project": "jobdef__project",
+        "workspace.Workspace": "workspace",
+    }
+
     @property
     def output(self):
         return self.output
@@ -108,64 +151,83 @@ class Run(AuthorModel, NameDescriptionBaseModel):
         """
         return self.status in ["COMPLETED", "FAILED"]
 
-    def set_status(self, status_code):
-        self.status = status_code
-        self.save(
-            update_fields=[
-                "status",
-                "modified_at",
-            ]
-        )
+    def save(self, *args, **kwargs):
+        if self.workspace_id is None:
+            self.set_visibility()
+        super().save(*args, **kwargs)
 
-    def set_finished_at(self):
-        self.finished_at = timezone.now()
-        if self.started_at:
-            self.duration = (self.finished_at - self.started_at).seconds
-        self.save(
-            update_fields=[
-                "duration",
-                "finished_at",
-                "modified_at",
-            ]
-        )
+    def set_visibility(self):
+        """
+        Set the denormalized workspace and visibility of the run. This is done on save, but should be called explicitly
+        when runs are saved without calling `save`, for example via `bulk_create`.
+        """
+        project = self.jobdef.project
+        self.workspace_id = project.workspace_id
+        self.is_public = project.visibility == "PUBLIC" and project.workspace.visibility == "PUBLIC"
 
-        on_commit(
-            lambda: celery_app.send_task(
-                "job.tasks.send_run_notification",
-                kwargs={"run_uuid": self.uuid},
-            )
-        )
+    def flush_log(self):
+        """
+        Write the buffered lines of the run log to the log queue. Only a log that is loaded for this run instance can
+        have buffered lines.
+        """
+        if type(self).output.is_cached(self):
+            self.output.flush()
 
-    def to_pending(self):
-        self.set_status("PENDING")
+    def transition(self, status: str, **fields) -> bool:
+        """
+        Change the status of the run and set the fields with one UPDATE. The tasks for the new status are added to the
+        outbox in the same transaction and sent when the transaction is committed.
 
-        on_commit(
-            lambda: celery_app.send_task(
-                "job.tasks.send_run_notification",
-                kwargs={"run_uuid": self.uuid},
+        The status only changes if the run has a status it can change from, see `RUN_TRANSITIONS`. If the status of
+        the run changed in the meantime, for example because the run is finished already, nothing is changed and False
+        is returned.
+        """
+        self.flush_log()
+        fields = {**fields, "status": status, "modified_at": timezone.now()}
+
+        with transaction.atomic():
+            updated = Run.objects.filter(pk=self.pk, status__in=RUN_TRANSITIONS[status]).update(**fields)
+            if not updated:
+                return False
+
+            outbox = RunOutbox.objects.bulk_create(
+                [
+                    RunOutbox(run_id=self.pk, task_name=task_name, kwargs={"run_uuid": str(self.uuid)})
+                    for task_name in get_transition_tasks(status)
+                ]
             )
-        )
+            if outbox:
+                pks = [task.pk for task in outbox]
+                transaction.on_commit(lambda: RunOutbox.dispatch(pks=pks))
+
+        for field, value in fields.items():
+            setattr(self, field, value)
+        return True
+
+    def to_finished(self, status: str, exit_code: int | None = None) -> bool:
+        """
+        Change the status of the run to COMPLETED or FAILED, and save the log of the run
+        """
+        finished_at = timezone.now()
+        duration = (finished_at - self.started_at).seconds if self.started_at else None
+
+        with transaction.atomic():
+            if not self.transition(status, finished_at=finished_at, duration=duration):
+                return False
+            self.output.save_stdout(exit_code=exit_code)
+        return True
+
+    def to_pending(self):
+        return self.transition("PENDING")
 
     def to_failed(self, exit_code=1):
-        self.output.save_stdout()
-        self.output.save_exitcode(exit_code=exit_code)
-        self.set_finished_at()
-        self.set_status("FAILED")
+        return self.to_finished("FAILED", exit_code=exit_code)
 
     def to_completed(self):
-        self.output.save_stdout()
-        self.set_finished_at()
-        self.set_status("COMPLETED")
+        return self.to_finished("COMPLETED")
 
     def to_inprogress(self):
-        self.started_at = timezone.now()
-        self.save(
-            update_fields=[
-                "started_at",
-                "modified_at",
-            ]
-        )
-        self.set_status("IN_PROGRESS")
+        return self.transition("IN_PROGRESS", started_at=timezone.now())
 
     def set_run_image(self, run_image):
         self.run_image = run_image
@@ -213,4 +275,6 @@ class Run(AuthorModel, NameDescriptionBaseModel):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["name", "created_at"]),
+            models.Index(fields=["is_public"], condition=Q(is_public=True), name="run_is_public_idx"),
+            models.Index(fields=["-created_at"], condition=Q(is_active=True), name="run_active_created_at_idx"),
         ]
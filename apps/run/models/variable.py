@@ -1,14 +1,25 @@
 import io
 import json
+from collections.abc import Iterator
 from pathlib import Path
 
 from django.conf import settings
 from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import QuerySet
 from django.utils import timezone
 
 from core.models import BaseModel, FileBaseModel
-from run.utils import get_unique_names_with_data_type
+from core.utils import iterate_json_array
+from run.utils import (
+    get_content_hash,
+    get_count_and_size_from_rows,
+    get_label_names_with_data_type_from_rows,
+    get_names_with_data_type_from_rows,
+    get_unique_names_with_data_type,
+)
+
+SECRET_VARIABLE_NAME_PARTS = ("KEY", "TOKEN", "SECRET", "PASSWORD")
 
 
 class RunVariableMeta(FileBaseModel):
@@ -26,8 +37,8 @@ class RunVariableMeta(FileBaseModel):
     run = models.ForeignKey("run.Run", on_delete=models.CASCADE, related_name="variables_meta")
 
     @property
-    def variables(self):
-        return self.load_from_file()
+    def variables(self) -> Iterator[dict]:
+        return self.iterate_from_file()
 
     @variables.setter
     def variables(self, value):
@@ -61,61 +72,50 @@ class RunVariableMeta(FileBaseModel):
         with self.stored_path.open() as f:
             return json.loads(f.read())
 
+    def iterate_from_file(self) -> Iterator[dict]:
+        """
+        Iterate over the variables stored in the file one by one, without loading the full file in memory
+        """
+        with self.stored_path.open() as f:
+            yield from iterate_json_array(f)
+
     def prune(self):
         super().prune()
 
         # also remove the rows of variables attached to this object
         RunVariableRow.objects.filter(run__suuid=self.suuid).delete()
 
-    def update_meta(self):
+    def update_meta(self, new_variables: QuerySet | None = None):
         """
-        Update the meta information variable_names and label_names
+        Update the meta information count, size, variable_names and label_names
+
+        The meta information is aggregated in the database. By default all variables of the run are aggregated. When
+        `new_variables` is set, only these variables are aggregated and merged into the existing meta information. Use
+        this when variables are added to a run that already has meta information.
         """
-        run_variables = RunVariableRow.objects.filter(run__suuid=self.suuid)
-        if not run_variables:
+        run_variables = (
+            new_variables if new_variables is not None else RunVariableRow.objects.filter(run_id=self.run_id)
+        )
+
+        count, size = get_count_and_size_from_rows(run_variables, "variable")
+        if not count:
             return
 
-        def compose_response(instance, variable):
-            return {
-                "run_suuid": instance.suuid,
-                "variable": variable.variable,
-                "label": variable.label,
-                "created_at": variable.created_at.isoformat(),
-            }
-
-        self.count = len(run_variables)
-        self.size = len(json.dumps([compose_response(self, v) for v in run_variables]).encode("utf-8"))
-
-        all_variable_names = []
-        all_label_names = []
-        for variable in run_variables:
-            all_variable_names.append(
-                {
-                    "name": variable.variable.get("name"),
-                    "type": variable.variable.get("type"),
-                    "count": 1,
-                }
-            )
-
-            labels = variable.label
-            if labels:
-                for label in labels:
-                    all_label_names.append(
-                        {
-                            "name": label.get("name"),
-                            "type": label.get("type"),
-                        }
-                    )
-
-        unique_variable_names = None
-        if all_variable_names:
-            unique_variable_names = get_unique_names_with_data_type(all_variable_names)
-        self.variable_names = unique_variable_names
-
-        unique_label_names = None
-        if all_label_names:
-            unique_label_names = get_unique_names_with_data_type(all_label_names)
-        self.label_names = unique_label_names
+        variable_names = get_names_with_data_type_from_rows(run_variables, "variable")
+        label_names = get_label_names_with_data_type_from_rows(run_variables)
+
+        if new_variables is not None and self.count:
+            # The separator between the existing and new variables replaces the brackets of one of the lists
+            count += self.count
+            size += self.size
+            # The new variables are the most recent, so their names come first like when all variables are aggregated
+            variable_names = get_unique_names_with_data_type(variable_names + (self.variable_names or []))
+            label_names = get_unique_names_with_data_type(label_names + (self.label_names or []))
+
+        self.count = count
+        self.size = size
+        self.variable_names = variable_names or None
+        self.label_names = label_names or None
 
         self.save(
             update_fields=[
@@ -162,9 +162,43 @@ class RunVariableRow(BaseModel):
     # Redefine the created_at field, we want this to be overwritabe and with other default
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
+    # Rows without a content hash should not conflict with each other, so NULL is used instead of an empty string
+    content_hash = models.CharField(  # noqa: DJ001
+        max_length=64,
+        null=True,
+        default=None,
+        editable=False,
+        help_text="Hash of the variable, label and created_at used to prevent duplicate variables for a run",
+    )
+
+    def mask_secret(self):
+        """
+        Mask the value of the variable if the variable name indicates that the value is a secret
+        """
+        if self.is_masked:
+            return
+
+        variable_name = self.variable.get("name").upper()
+        if any(part in variable_name for part in SECRET_VARIABLE_NAME_PARTS):
+            self.variable["value"] = "***masked***"
+            self.is_masked = True
+            # add the tag is_masked, but first check whether this is already in the label
+            has_is_masked = "is_masked" in [label.get("name") for label in self.label]
+            if not has_is_masked:
+                self.label.append({"name": "is_masked", "value": None, "type": "tag"})
+
+    def set_content_hash(self):
+        self.content_hash = get_content_hash(self.variable, self.is_masked, self.label, self.created_at.isoformat())
+
     class Meta:
         db_table = "run_variable_row"
         ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["run", "content_hash"],
+                name="runvariable_run_content_hash_unique",
+            ),
+        ]
         indexes = [
             GinIndex(
                 name="runvariable_variable_json_idx",
@@ -4,13 +4,34 @@ from run.models import RunMetric, RunMetricMeta
 
 
 class RunMetricUpdateSerializer(serializers.ModelSerializer):
-    metrics = serializers.ListField(child=serializers.JSONField(), required=True)
+    metrics = serializers.ListField(child=serializers.JSONField(), required=True, write_only=True)
 
     class Meta:
         model = RunMetricMeta
         fields = ["metrics"]
 
 
+class RunMetricAppendItemSerializer(serializers.Serializer):
+    metric = serializers.DictField(help_text="Metric with the keys name, value and type")
+    label = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    created_at = serializers.DateTimeField()
+
+    def validate_metric(self, value):
+        missing_keys = [key for key in ("name", "value", "type") if key not in value]
+        if missing_keys:
+            raise serializers.ValidationError(f"Metric is missing the key(s): {', '.join(missing_keys)}")
+        return value
+
+    def validate(self, attrs):
+        # Metrics are stored with the created_at as ISO formatted string
+        attrs["created_at"] = attrs["created_at"].isoformat()
+        return attrs
+
+
+class RunMetricAppendSerializer(serializers.Serializer):
+    metrics = RunMetricAppendItemSerializer(many=True, allow_empty=False, write_only=True)
+
+
 class RunMetricSerializer(serializers.ModelSerializer):
     """Serializer for RunMetric model."""
 
@@ -74,9 +74,9 @@ class RunSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(MetricsMetaSerializer)
     def get_metrics_meta(self, instance):
-        try:
-            metrics_meta = instance.metrics_meta.get()
-        except ObjectDoesNotExist:
+        # Use all() instead of get() or first(), so the metrics meta prefetched for a list of runs is used
+        metrics_meta = next(iter(instance.metrics_meta.all()), None)
+        if metrics_meta is None:
             metrics_meta_data = {
                 "count": 0,
                 "size": 0,
@@ -95,9 +95,8 @@ class RunSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(VariablesMetaSerializer)
     def get_variables_meta(self, instance):
-        try:
-            variables_meta = instance.variables_meta.get()
-        except ObjectDoesNotExist:
+        variables_meta = next(iter(instance.variables_meta.all()), None)
+        if variables_meta is None:
             run_variables_meta = {
                 "count": 0,
                 "size": 0,
@@ -136,13 +135,10 @@ class RunSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(ArtifactRelationSerializer)
     def get_artifact(self, instance):
-        try:
-            artifact = instance.artifact.first()
-        except (AttributeError, ObjectDoesNotExist):
-            pass
-        else:
-            if artifact:
-                return ArtifactRelationSerializer(artifact).data
+        # The artifacts are ordered by the model ordering, also when they are prefetched
+        artifact = next(iter(instance.artifact.all()), None)
+        if artifact:
+            return ArtifactRelationSerializer(artifact).data
 
         return None
 
@@ -4,7 +4,7 @@ from run.models import RunVariable, RunVariableMeta
 
 
 class RunVariableUpdateSerializer(serializers.ModelSerializer):
-    variables = serializers.ListField(child=serializers.JSONField(), required=True)
+    variables = serializers.ListField(child=serializers.JSONField(), required=True, write_only=True)
 
     class Meta:
         model = RunVariableMeta
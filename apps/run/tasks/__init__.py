@@ -1,11 +1,15 @@
 from .maintenance import delete_runs
 from .metric import extract_run_metric_meta, move_metrics_to_rows
+from .outbox import dispatch_run_outbox
 from .variable import extract_run_variable_meta, move_variables_to_rows
+from .visibility import update_visibility
 
 __all__ = [
     "delete_runs",
+    "dispatch_run_outbox",
     "extract_run_metric_meta",
     "move_metrics_to_rows",
     "extract_run_variable_meta",
     "move_variables_to_rows",
+    "update_visibility",
 ]
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from config.celery_app import app as celery_app
+
+# Extra time the debounce key is kept after the countdown, so a task waiting in a busy queue is not scheduled twice.
+# When a task got lost, the key expires and a next write schedules a new update.
+DEBOUNCE_KEY_GRACE_SECONDS = 300
+
+
+def get_update_meta_key(task_name: str, **kwargs) -> str:
+    task_kwargs = ",".join(f"{key}={value}" for key, value in sorted(kwargs.items()))
+    return f"run:update_meta:{task_name}:{task_kwargs}"
+
+
+def acquire_update_meta(task_name: str, **kwargs) -> bool:
+    """
+    Claim the pending meta update for the task and kwargs. Returns False if an update is already scheduled.
+    """
+    return cache.add(
+        get_update_meta_key(task_name, **kwargs),
+        True,
+        timeout=settings.RUN_META_UPDATE_DELAY + DEBOUNCE_KEY_GRACE_SECONDS,
+    )
+
+
+def release_update_meta(task_name: str, **kwargs):
+    """
+    Release the pending meta update so the next write schedules a new update. The task calls this before it reads
+    the data, so writes that happen while the update runs are not missed.
+    """
+    cache.delete(get_update_meta_key(task_name, **kwargs))
+
+
+def schedule_update_meta(task_name: str, **kwargs) -> bool:
+    """
+    Schedule a meta update task on the trailing edge of a burst of writes. The first write schedules the task with a
+    countdown of `settings.RUN_META_UPDATE_DELAY` seconds, writes that follow before the task runs are covered by the
+    scheduled task. This way a run that saves metrics every few seconds results in one meta update per delay window
+    instead of an update for every save.
+
+    Returns True if a new task was scheduled.
+    """
+    if not acquire_update_meta(task_name, **kwargs):
+        return False
+
+    celery_app.send_task(task_name, kwargs=kwargs, countdown=settings.RUN_META_UPDATE_DELAY)
+    return True
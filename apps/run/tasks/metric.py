@@ -1,8 +1,124 @@
 import datetime
+import logging
+import time
+from collections.abc import Iterable, Iterator
 
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 
-from run.models import RunMetric, RunMetricMeta
+from core.utils import batched
+from run.models import Run, RunMetric, RunMetricMeta
+from run.tasks.meta import release_update_meta, schedule_update_meta
+
+logger = logging.getLogger(__name__)
+
+
+def get_metric_rows(run: Run, metrics: Iterable[dict]) -> Iterator[RunMetric]:
+    """
+    Yield unsaved RunMetric rows for the metric dictionaries as stored in the RunMetricMeta file
+    """
+    deduplicate = settings.RUN_ROWS_DEDUPLICATE_ON_INSERT
+
+    # Resolve the hard references once instead of for every metric
+    project_suuid = run.jobdef.project.suuid
+    job_suuid = run.jobdef.suuid
+    run_suuid = run.suuid
+
+    for metric in metrics:
+        row = RunMetric(
+            **{
+                **metric,
+                "created_at": datetime.datetime.fromisoformat(metric["created_at"]),
+                "project_suuid": project_suuid,
+                "job_suuid": job_suuid,
+                "run_suuid": run_suuid,
+                "run": run,
+                "workspace_id": run.workspace_id,
+                "is_public": run.is_public,
+            }
+        )
+        row.set_suuid()
+        if deduplicate:
+            row.set_content_hash()
+        yield row
+
+
+def create_metric_rows(run: Run, metrics: Iterable[dict], batch_size: int | None = None) -> int:
+    """
+    Bulk insert the metrics as RunMetric rows for a run. The metrics are consumed in batches, so only one batch of
+    rows is kept in memory at a time.
+
+    Args:
+        run (Run): the run the metrics belong to
+        metrics (Iterable[dict]): metric dictionaries as stored in the RunMetricMeta file
+        batch_size (int, optional): number of rows per INSERT. Defaults to `settings.RUN_ROWS_BATCH_SIZE`.
+
+    If `settings.RUN_ROWS_DEDUPLICATE_ON_INSERT` is enabled, a content hash is set for every row and metrics that are
+    already stored for the run are skipped by the database.
+
+    Returns:
+        int: the number of rows offered to the database. When deduplicating on insert, skipped duplicates are included.
+    """
+    batch_size = batch_size or settings.RUN_ROWS_BATCH_SIZE
+
+    count = 0
+    for rows in batched(get_metric_rows(run, metrics), batch_size):
+        RunMetric.objects.bulk_create(rows, ignore_conflicts=settings.RUN_ROWS_DEDUPLICATE_ON_INSERT)
+        count += len(rows)
+
+    return count
+
+
+def add_run_suuid(run: Run, metrics: list[dict]) -> list[dict]:
+    """
+    Add the SUUID of the run to the metrics, the same way as the metrics of a run are stored in the RunMetricMeta file
+    """
+    return [{**metric, "run_suuid": run.suuid} for metric in metrics]
+
+
+def append_metrics(run_metric_meta: RunMetricMeta, metrics: list[dict]) -> int:
+    """
+    Append metrics to a run without replacing the metrics that are already stored. Only the new metrics are inserted as
+    rows, and the meta information is updated with the new rows only. The metrics that are inserted are added to the
+    file when the transaction is committed, so the file does not contain metrics that were rolled back or skipped as
+    duplicates.
+
+    Args:
+        run_metric_meta (RunMetricMeta): the metric meta of the run to append the metrics to
+        metrics (list[dict]): metric dictionaries with the keys `metric`, `label` and `created_at`
+
+    Returns:
+        int: the number of metrics appended
+    """
+    with transaction.atomic():
+        # Lock the meta, so concurrent appends for the same run update the meta information one by one
+        run_metric_meta = (
+            RunMetricMeta.objects.select_for_update(of=("self",))
+            .select_related("run__jobdef__project")
+            .get(pk=run_metric_meta.pk)
+        )
+        run = run_metric_meta.run
+        metrics = add_run_suuid(run, metrics)
+
+        rows = list(get_metric_rows(run, metrics))
+        RunMetric.objects.bulk_create(
+            rows,
+            batch_size=settings.RUN_ROWS_BATCH_SIZE,
+            ignore_conflicts=settings.RUN_ROWS_DEDUPLICATE_ON_INSERT,
+        )
+        new_metrics = RunMetric.objects.filter(pk__in=[row.pk for row in rows])
+        if settings.RUN_ROWS_DEDUPLICATE_ON_INSERT:
+            # Rows that are skipped because they are already stored, are not in the database
+            inserted = set(new_metrics.values_list("pk", flat=True))
+            metrics = [metric for metric, row in zip(metrics, rows, strict=True) if row.pk in inserted]
+
+        run_metric_meta.update_meta(new_metrics=new_metrics)
+        transaction.on_commit(lambda: run_metric_meta.append_to_file(metrics))
+
+    return len(metrics)
 
 
 @shared_task(bind=True, name="run.tasks.extract_run_metric_meta")
@@ -10,27 +126,33 @@ def extract_run_metric_meta(self, metric_meta_uuid):
     """
     Extract meta information from metrics and store the meta information in runmetric object
     """
-    run_metric_meta = RunMetricMeta.objects.get(pk=metric_meta_uuid)
+    release_update_meta("run.tasks.extract_run_metric_meta", metric_meta_uuid=metric_meta_uuid)
+
+    try:
+        run_metric_meta = RunMetricMeta.objects.get(pk=metric_meta_uuid)
+    except RunMetricMeta.DoesNotExist:
+        return
     run_metric_meta.update_meta()
 
 
 @shared_task(bind=True, name="run.tasks.move_metrics_to_rows")
 def move_metrics_to_rows(self, metric_meta_uuid):
-    run_metric_meta = RunMetricMeta.objects.get(pk=metric_meta_uuid)
-
-    # Remove old rows if any
-    RunMetric.objects.filter(run=run_metric_meta.run).delete()
+    run_metric_meta = RunMetricMeta.objects.select_related("run__jobdef__project").get(pk=metric_meta_uuid)
+    run = run_metric_meta.run
 
-    for metric in run_metric_meta.metrics:
-        metric["created_at"] = datetime.datetime.fromisoformat(metric["created_at"])
-        metric["project_suuid"] = run_metric_meta.run.jobdef.project.suuid
-        metric["job_suuid"] = run_metric_meta.run.jobdef.suuid
-        metric["run_suuid"] = run_metric_meta.run.suuid
-        metric["run"] = run_metric_meta.run
+    start = time.monotonic()
+    with transaction.atomic():
+        # Remove old rows if any
+        RunMetric.objects.filter(run=run).delete()
+        count = create_metric_rows(run, run_metric_meta.metrics)
+    duration = time.monotonic() - start
 
-        RunMetric.objects.create(**metric)
+    logger.info(
+        f"Moved {count} metrics to rows for run {run.suuid} in {duration:.2f} seconds "
+        f"({count / duration if duration else count:.0f} rows/sec)"
+    )
 
-    run_metric_meta.update_meta()
+    schedule_update_meta("run.tasks.extract_run_metric_meta", metric_meta_uuid=run_metric_meta.uuid)
 
 
 @shared_task(bind=True, name="run.tasks.post_run_deduplicate_metrics")
@@ -38,20 +160,24 @@ def post_run_deduplicate_metrics(self, run_uuid):
     """
     Remove double run metrics if any
     """
-    metrics = RunMetric.objects.filter(run__pk=run_uuid).order_by("created_at", "metric")
-    last_metric = None
-    for metric in metrics:
-        if last_metric and (
-            metric.metric == last_metric.metric
-            and metric.label == last_metric.label
-            and metric.created_at == last_metric.created_at
-        ):
-            metric.delete()
-        last_metric = metric
+    duplicates = (
+        RunMetric.objects.filter(run__pk=run_uuid)
+        .annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F("metric"), F("label"), F("created_at")],
+                order_by=[F("modified_at").asc(), F("uuid").asc()],
+            )
+        )
+        .filter(row_number__gt=1)
+    )
+    deleted, _ = RunMetric.objects.filter(pk__in=duplicates.values("pk")).delete()
+    if not deleted:
+        return
 
     try:
         run_metric = RunMetricMeta.objects.get(run__pk=run_uuid)
     except RunMetricMeta.DoesNotExist:
         pass
     else:
-        run_metric.update_meta()
+        schedule_update_meta("run.tasks.extract_run_metric_meta", metric_meta_uuid=run_metric.uuid)
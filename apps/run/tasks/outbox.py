@@ -0,0 +1,13 @@
+from config.celery_app import app as celery_app
+
+from run.models import RunOutbox
+
+
+@celery_app.task(name="run.tasks.dispatch_run_outbox")
+def dispatch_run_outbox():
+    """
+    Send the tasks left in the run outbox. Tasks are sent right after the transaction that added them is committed,
+    this task sends the tasks that were not sent then, for example because the process stopped.
+    """
+    while RunOutbox.dispatch():
+        pass
@@ -1,8 +1,70 @@
 import datetime
+import logging
+import time
+from collections.abc import Iterable
 
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 
-from run.models import RunVariable, RunVariableMeta
+from core.utils import batched
+from run.models import Run, RunVariable, RunVariableMeta
+from run.tasks.meta import release_update_meta, schedule_update_meta
+
+logger = logging.getLogger(__name__)
+
+
+def create_variable_rows(run: Run, variables: Iterable[dict], batch_size: int | None = None) -> int:
+    """
+    Bulk insert the variables as RunVariable rows for a run. The variables are consumed in batches, so only one batch
+    of rows is kept in memory at a time. Because bulk_create does not send the pre_save signal, secret variables are
+    masked here.
+
+    Args:
+        run (Run): the run the variables belong to
+        variables (Iterable[dict]): variable dictionaries as stored in the RunVariableMeta file
+        batch_size (int, optional): number of rows per INSERT. Defaults to `settings.RUN_ROWS_BATCH_SIZE`.
+
+    If `settings.RUN_ROWS_DEDUPLICATE_ON_INSERT` is enabled, a content hash is set for every row and variables that
+    are already stored for the run are skipped by the database.
+
+    Returns:
+        int: the number of rows offered to the database. When deduplicating on insert, skipped duplicates are included.
+    """
+    batch_size = batch_size or settings.RUN_ROWS_BATCH_SIZE
+    deduplicate = settings.RUN_ROWS_DEDUPLICATE_ON_INSERT
+
+    # Resolve the hard references once instead of for every variable
+    project_suuid = run.jobdef.project.suuid
+    job_suuid = run.jobdef.suuid
+    run_suuid = run.suuid
+
+    count = 0
+    for batch in batched(variables, batch_size):
+        rows = []
+        for variable in batch:
+            row = RunVariable(
+                **{
+                    **variable,
+                    "created_at": datetime.datetime.fromisoformat(variable["created_at"]),
+                    "project_suuid": project_suuid,
+                    "job_suuid": job_suuid,
+                    "run_suuid": run_suuid,
+                    "run": run,
+                }
+            )
+            row.set_suuid()
+            row.mask_secret()
+            if deduplicate:
+                row.set_content_hash()
+            rows.append(row)
+
+        RunVariable.objects.bulk_create(rows, ignore_conflicts=deduplicate)
+        count += len(rows)
+
+    return count
 
 
 @shared_task(bind=True, name="run.tasks.extract_run_variable_meta")
@@ -10,35 +72,41 @@ def extract_run_variable_meta(self, variable_meta_uuid):
     """
     Extract meta data from run variables and store the meta data in run variable object
     """
-    run_variable_meta = RunVariableMeta.objects.get(pk=variable_meta_uuid)
+    release_update_meta("run.tasks.extract_run_variable_meta", variable_meta_uuid=variable_meta_uuid)
+
+    try:
+        run_variable_meta = RunVariableMeta.objects.get(pk=variable_meta_uuid)
+    except RunVariableMeta.DoesNotExist:
+        return
     run_variable_meta.update_meta()
 
 
 @shared_task(bind=True, name="run.tasks.move_variables_to_rows")
 def move_variables_to_rows(self, variable_meta_uuid):
-    run_variable_meta = RunVariableMeta.objects.get(pk=variable_meta_uuid)
-
-    # Remove old rows with source=run
-    RunVariable.objects.filter(run=run_variable_meta.run).filter(
-        label__contains=[
-            {
-                "name": "source",
-                "value": "run",
-                "type": "string",
-            }
-        ]
-    ).delete()
-
-    for variable in run_variable_meta.variables:
-        variable["created_at"] = datetime.datetime.fromisoformat(variable["created_at"])
-        variable["project_suuid"] = run_variable_meta.run.jobdef.project.suuid
-        variable["job_suuid"] = run_variable_meta.run.jobdef.suuid
-        variable["run_suuid"] = run_variable_meta.run.suuid
-        variable["run"] = run_variable_meta.run
-
-        RunVariable.objects.create(**variable)
+    run_variable_meta = RunVariableMeta.objects.select_related("run__jobdef__project").get(pk=variable_meta_uuid)
+    run = run_variable_meta.run
 
-    run_variable_meta.update_meta()
+    start = time.monotonic()
+    with transaction.atomic():
+        # Remove old rows with source=run
+        RunVariable.objects.filter(run=run).filter(
+            label__contains=[
+                {
+                    "name": "source",
+                    "value": "run",
+                    "type": "string",
+                }
+            ]
+        ).delete()
+        count = create_variable_rows(run, run_variable_meta.variables)
+    duration = time.monotonic() - start
+
+    logger.info(
+        f"Moved {count} variables to rows for run {run.suuid} in {duration:.2f} seconds "
+        f"({count / duration if duration else count:.0f} rows/sec)"
+    )
+
+    schedule_update_meta("run.tasks.extract_run_variable_meta", variable_meta_uuid=run_variable_meta.uuid)
 
 
 @shared_task(bind=True, name="run.tasks.post_run_deduplicate_variables")
@@ -46,21 +114,24 @@ def post_run_deduplicate_variables(self, run_uuid):
     """
     Remove double run variables if any
     """
-    variables = RunVariable.objects.filter(run__pk=run_uuid).order_by("created_at", "label")
-    last_variable = None
-    for variable in variables:
-        if last_variable and (
-            variable.variable == last_variable.variable
-            and variable.is_masked == last_variable.is_masked
-            and variable.label == last_variable.label
-            and variable.created_at == last_variable.created_at
-        ):
-            variable.delete()
-        last_variable = variable
+    duplicates = (
+        RunVariable.objects.filter(run__pk=run_uuid)
+        .annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F("variable"), F("is_masked"), F("label"), F("created_at")],
+                order_by=[F("modified_at").asc(), F("uuid").asc()],
+            )
+        )
+        .filter(row_number__gt=1)
+    )
+    deleted, _ = RunVariable.objects.filter(pk__in=duplicates.values("pk")).delete()
+    if not deleted:
+        return
 
     try:
         run_variable = RunVariableMeta.objects.get(run__pk=run_uuid)
     except RunVariableMeta.DoesNotExist:
         pass
     else:
-        run_variable.update_meta()
+        schedule_update_meta("run.tasks.extract_run_variable_meta", variable_meta_uuid=run_variable.uuid)
@@ -0,0 +1,49 @@
+from celery import shared_task
+
+from project.models import Project
+from run.models import Run, RunMetric
+from workspace.models import Workspace
+
+
+def update_project_visibility(project: Project):
+    """
+    Update the denormalized visibility of the runs and metrics of the project, see `Run.set_visibility`
+    """
+    is_public = project.visibility == "PUBLIC" and project.workspace.visibility == "PUBLIC"
+    Run.objects.filter(workspace_id=project.workspace_id, jobdef__project=project).exclude(is_public=is_public).update(
+        is_public=is_public
+    )
+    RunMetric.objects.filter(workspace_id=project.workspace_id, run__jobdef__project=project).exclude(
+        is_public=is_public
+    ).update(is_public=is_public)
+
+
+def hide_runs(workspace: Workspace, project: Project | None = None):
+    """
+    Mark the public runs and metrics of the workspace, or only of the project, as not public
+    """
+    runs = Run.objects.filter(workspace=workspace, is_public=True)
+    metrics = RunMetric.objects.filter(workspace=workspace, is_public=True)
+    if project:
+        runs = runs.filter(jobdef__project=project)
+        metrics = metrics.filter(run__jobdef__project=project)
+
+    runs.update(is_public=False)
+    metrics.update(is_public=False)
+
+
+@shared_task(bind=True, name="run.tasks.update_visibility")
+def update_visibility(self, project_uuid=None, workspace_uuid=None):
+    """
+    Propagate a changed visibility of a project, or of all projects in a workspace, to its runs and metrics
+    """
+    projects = Project.objects.select_related("workspace")
+    if project_uuid:
+        projects = projects.filter(uuid=project_uuid)
+    elif workspace_uuid:
+        projects = projects.filter(workspace__uuid=workspace_uuid)
+    else:
+        return
+
+    for project in projects:
+        update_project_visibility(project)
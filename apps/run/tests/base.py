@@ -365,6 +365,7 @@ class BaseRunTest(BaseUserPopulation):
         self.runlog["run3"].log("some test stdout 7")
         self.runlog["run3"].log("some test stdout 8")
         self.runlog["run3"].log("some test stdout 9")
+        self.runlog["run3"].flush()
 
         self.runlog["run5"].log("some test stdout 1", timestamp=datetime.datetime.utcnow().isoformat())
         self.runlog["run5"].log("some test stdout 2")
@@ -375,6 +376,7 @@ class BaseRunTest(BaseUserPopulation):
         self.runlog["run5"].log("some test stdout 7")
         self.runlog["run5"].log("some test stdout 8")
         self.runlog["run5"].log("some test stdout 9")
+        self.runlog["run5"].flush()
 
         self.runresults = {
             "run2": RunResult.objects.create(
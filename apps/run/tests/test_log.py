@@ -1,8 +1,12 @@
+import json
+
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from .base import BaseRunTest
+from run.views.run import get_log_events
 
 
 class TestRunLogAPI(BaseRunTest, APITestCase):
@@ -180,3 +184,216 @@ class TestRunLogLimitAPI(BaseRunTest, APITestCase):
         )
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data["results"]) == 4  # type: ignore
+
+    def test_log_as_member_while_running_since_index(self):
+        """
+        We can get only the new log lines for a run while running
+        """
+        self.activate_user("member")
+        response = self.client.get(self.url3, {"since_index": 7}, HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 9  # type: ignore
+        assert [line[0] for line in response.data["results"]] == [8, 9]  # type: ignore
+
+        response = self.client.get(self.url3, {"since_index": 9}, HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == []  # type: ignore
+
+    def test_log_as_member_limit_full_since_index(self):
+        """
+        With limit set to -1, the full log after the since_index or offset is returned
+        """
+        self.activate_user("member")
+        response = self.client.get(self.url3, {"since_index": 7, "limit": -1}, HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_200_OK
+        assert [line[0] for line in response.data["results"]] == [8, 9]  # type: ignore
+
+        response = self.client.get(self.url2, {"offset": 2, "limit": -1}, HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == self.runlog["run2"].stdout[2:]  # type: ignore
+
+    def test_log_as_member_invalid_since_index(self):
+        self.activate_user("member")
+        response = self.client.get(self.url3, {"since_index": "last"}, HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "since_index" in response.data  # type: ignore
+
+    def test_log_as_member_while_running_reads_range(self):
+        """
+        Only the requested lines are read from the log queue
+        """
+        logqueue = self.runlog["run5"].logqueue
+        assert logqueue.length() == 9
+        assert [line[0] for line in logqueue.get(start=2, end=4)] == [3, 4, 5]
+
+
+@override_settings(RUN_LOG_BUFFER_SIZE=3, RUN_LOG_BUFFER_FLUSH_INTERVAL=60)
+class TestRunLogBuffer(BaseRunTest, APITestCase):
+    """
+    Test that log lines are buffered before they are written to the log queue
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.run = self.runs["run5"]
+        self.runlog = self.run.output
+        self.runlog.logqueue.remove()
+
+    def tearDown(self):
+        self.runlog.logqueue.remove()
+        super().tearDown()
+
+    def test_log_flush_on_buffer_size(self):
+        for i in range(4):
+            self.runlog.log(f"line {i}")
+
+        assert [line[2] for line in self.runlog.logqueue.get()] == ["line 0", "line 1", "line 2"]
+
+        self.runlog.flush()
+        log = self.runlog.logqueue.get()
+        assert [line[0] for line in log] == [1, 2, 3, 4]
+        assert [line[2] for line in log] == ["line 0", "line 1", "line 2", "line 3"]
+
+    @override_settings(RUN_LOG_BUFFER_FLUSH_INTERVAL=0)
+    def test_log_flush_on_interval(self):
+        self.runlog.log("line 0")
+        assert len(self.runlog.logqueue.get()) == 1
+
+    def test_log_flush_on_status_change(self):
+        self.runlog.log("line 0")
+        assert self.runlog.logqueue.get() == []
+
+        self.run.to_inprogress()
+        assert len(self.runlog.logqueue.get()) == 1
+
+    def test_log_flush_on_save_stdout(self):
+        self.runlog.log("line 0")
+        self.run.to_completed()
+
+        self.runlog.refresh_from_db()
+        assert [line[2] for line in self.runlog.get_log()] == ["line 0"]
+
+    def test_log_queue_kept_until_commit(self):
+        self.runlog.log("line 0")
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.run.to_completed()
+
+        # Until the log is committed, the log is still read from the log queue
+        assert len(self.runlog.logqueue.get()) == 1
+
+        for callback in callbacks:
+            callback()
+        assert self.runlog.logqueue.get() == []
+
+
+@override_settings(RUN_LOG_CHUNK_LINES=4)
+class TestRunLogChunks(BaseRunTest, APITestCase):
+    """
+    Test storing the log of a finished run in compressed chunks
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.run = self.runs["run5"]
+        self.runlog = self.run.output
+        self.runlog.logqueue.remove()
+        for i in range(10):
+            self.runlog.log(f"line {i}", timestamp="2023-01-01T12:00:00")
+        self.expected_log = self.runlog.log_buffer.copy()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run.to_completed()
+        self.runlog.refresh_from_db()
+
+    def test_save_stdout_in_chunks(self):
+        assert self.runlog.stdout is None
+        assert self.runlog.lines == 10
+        assert self.runlog.size == len(json.dumps(self.expected_log).encode("utf-8"))
+        assert [chunk.lines for chunk in self.runlog.chunks.all()] == [4, 4, 2]
+        assert self.runlog.logqueue.get() == []
+
+    def test_get_log(self):
+        assert self.runlog.get_log() == self.expected_log
+        assert self.runlog.get_log(offset=3, limit=2) == self.expected_log[3:5]
+        assert self.runlog.get_log(offset=8, limit=10) == self.expected_log[8:]
+        assert self.runlog.get_log(offset=10) == []
+
+    def test_get_log_reads_only_needed_chunks(self):
+        chunks = self.runlog.chunks.all()
+        assert chunks.filter(first_line__lt=6).count() == 2
+        with self.assertNumQueries(1):
+            assert self.runlog.get_log(offset=5, limit=2) == self.expected_log[5:7]
+
+    def test_log_api(self):
+        self.activate_user("member")
+        url = reverse("run-log", kwargs={"version": "v1", "suuid": self.run.suuid})
+        response = self.client.get(url, {"offset": 2, "limit": 4}, HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 10  # type: ignore
+        assert response.data["results"] == self.expected_log[2:6]  # type: ignore
+
+
+@override_settings(RUN_LOG_STREAM_BLOCK_MS=100)
+class TestRunLogStream(BaseRunTest, APITestCase):
+    """
+    Test streaming the log of a run as server-sent events
+    """
+
+    def get_url(self, run):
+        return reverse("run-log-stream", kwargs={"version": "v1", "suuid": run.suuid})
+
+    def test_log_stream_finished_run(self):
+        self.activate_user("member")
+        response = self.client.get(self.get_url(self.runs["run1"]), HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/event-stream"
+
+        content = b"".join(response.streaming_content).decode()
+        assert content.count("event: log\n") == 6
+        assert content.endswith("event: end\ndata: \n\n")
+
+    def test_log_stream_since_index(self):
+        self.activate_user("member")
+        response = self.client.get(self.get_url(self.runs["run1"]), {"since_index": 5}, HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_200_OK
+
+        content = b"".join(response.streaming_content).decode()
+        assert content.count("event: log\n") == 1
+        assert content.startswith("id: 6\n")
+
+    def test_log_stream_invalid_since_index(self):
+        self.activate_user("member")
+        response = self.client.get(self.get_url(self.runs["run1"]), {"since_index": "last"}, HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_log_stream_as_non_member(self):
+        self.activate_user("non_member")
+        response = self.client.get(self.get_url(self.runs["run1"]), HTTP_HOST="testserver")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @override_settings(RUN_LOG_STREAM_TIMEOUT=0.3)
+    def test_log_events_run_in_progress_timeout(self):
+        # The stream is closed after the timeout without an end event, so the client reconnects
+        events = list(get_log_events(self.runs["run5"], since_index=7))
+        assert events[0].startswith("id: 8\n")
+        assert events[1].startswith("id: 9\n")
+        assert "event: end" not in "".join(events)
+
+    def test_log_events_run_in_progress(self):
+        runlog = self.runlog["run5"]
+        events = get_log_events(self.runs["run5"], since_index=7)
+
+        # The lines that are already logged are read from the log queue
+        assert next(events).startswith("id: 8\n")
+        assert next(events).startswith("id: 9\n")
+
+        # New lines are read from the stream
+        runlog.log("some test stdout 10")
+        runlog.flush()
+        event = next(events)
+        assert event.startswith("id: 10\nevent: log\n")
+        assert "some test stdout 10" in event
+
+        # When the log is saved, the stream ends
+        with self.captureOnCommitCallbacks(execute=True):
+            runlog.save_stdout()
+        assert list(events) == ["event: end\ndata: \n\n"]
@@ -1,10 +1,26 @@
+import json
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from .base import BaseRunTest, metric_response_good, metric_response_good_small
 from run.models import Run, RunMetric, RunMetricMeta
-from run.tasks.metric import post_run_deduplicate_metrics
+from run.tasks import meta
+from run.tasks.meta import (
+    acquire_update_meta,
+    release_update_meta,
+    schedule_update_meta,
+)
+from run.tasks.metric import (
+    create_metric_rows,
+    extract_run_metric_meta,
+    move_metrics_to_rows,
+    post_run_deduplicate_metrics,
+)
 
 
 class TestRunMetricModel(BaseRunTest, APITestCase):
@@ -15,6 +31,11 @@ class TestRunMetricModel(BaseRunTest, APITestCase):
     def test_runmetrics_function_load_from_file(self):
         assert self.runmetrics["run1"].load_from_file() == metric_response_good
 
+    def test_runmetrics_metrics_iterate_from_file(self):
+        metrics = self.runmetrics["run1"].metrics
+        assert next(metrics) == metric_response_good[0]
+        assert list(metrics) == metric_response_good[1:]
+
     def test_runmetrics_function_update_meta_no_metrics_and_no_labels(self):
         modified_at_before = self.runmetrics["run7"].modified_at
         self.runmetrics["run7"].update_meta()
@@ -60,6 +81,80 @@ class TestRunMetricModel(BaseRunTest, APITestCase):
         assert self.runmetrics["run7"].label_names[1] in expected_label_names  # type: ignore
         assert self.runmetrics["run7"].label_names[2] in expected_label_names  # type: ignore
 
+    def test_runmetrics_function_update_meta_new_metrics(self):
+        self.runmetrics["run7"].metrics = metric_response_good
+        self.runmetrics["run7"].save()
+        self.runmetrics["run7"].update_meta()
+        expected_count = self.runmetrics["run7"].count
+        expected_size = self.runmetrics["run7"].size
+        expected_metric_names = self.runmetrics["run7"].metric_names
+        expected_label_names = self.runmetrics["run7"].label_names
+
+        # Reset the meta information to the state after the first two metrics were added
+        first_metrics = RunMetric.objects.filter(run=self.runs["run7"]).order_by("metric__value")[:2]
+        new_metrics = RunMetric.objects.filter(run=self.runs["run7"]).exclude(pk__in=first_metrics.values("pk"))
+        self.runmetrics["run7"].count = 0
+        self.runmetrics["run7"].update_meta(new_metrics=RunMetric.objects.filter(pk__in=first_metrics.values("pk")))
+        assert self.runmetrics["run7"].count == 2
+
+        # Merge the other metrics into the meta information
+        self.runmetrics["run7"].update_meta(new_metrics=new_metrics)
+        assert self.runmetrics["run7"].count == expected_count
+        assert self.runmetrics["run7"].size == expected_size
+        assert sorted(self.runmetrics["run7"].metric_names, key=lambda x: x["name"]) == sorted(
+            expected_metric_names, key=lambda x: x["name"]
+        )
+        assert sorted(self.runmetrics["run7"].label_names, key=lambda x: x["name"]) == sorted(
+            expected_label_names, key=lambda x: x["name"]
+        )
+
+    def test_runmetrics_function_update_meta_non_ascii(self):
+        metrics = [
+            {
+                "run_suuid": "aaaa-cccc-eeee-zzzz",
+                "metric": {"name": "Quality", "value": "Très bien 😀", "type": "string"},
+                "label": [{"name": "city", "value": "東京", "type": "string"}],
+                "created_at": "2021-02-14T12:00:01.123456+00:00",
+            },
+            {
+                "run_suuid": "aaaa-cccc-eeee-zzzz",
+                "metric": {"name": "Accuracy", "value": 0.5, "type": "float"},
+                "label": [{"name": "city", "value": "Zürich", "type": "string"}],
+                "created_at": "2021-02-14T12:00:02+00:00",
+            },
+        ]
+        self.runmetrics["run7"].metrics = metrics
+        self.runmetrics["run7"].save()
+        self.runmetrics["run7"].update_meta()
+        assert self.runmetrics["run7"].count == 2
+        assert self.runmetrics["run7"].size == len(json.dumps(metrics))
+
+    def test_runmetrics_function_update_meta_names_order(self):
+        metrics = [
+            {
+                "metric": {"name": "loss", "value": 0.5, "type": "float"},
+                "label": [{"name": "epoch", "value": 1, "type": "integer"}],
+                "created_at": "2021-02-14T12:00:01+00:00",
+            },
+            {
+                "metric": {"name": "accuracy", "value": 0.5, "type": "float"},
+                "label": [{"name": "Batch", "value": 1, "type": "integer"}],
+                "created_at": "2021-02-14T12:00:02+00:00",
+            },
+            {
+                "metric": {"name": "loss", "value": 0.4, "type": "float"},
+                "label": [{"name": "epoch", "value": 2, "type": "integer"}],
+                "created_at": "2021-02-14T12:00:03+00:00",
+            },
+        ]
+        self.runmetrics["run7"].metrics = metrics
+        self.runmetrics["run7"].save()
+        self.runmetrics["run7"].update_meta()
+
+        # The names are in the order they first occur in the metrics ordered by `-created_at`, not alphabetical
+        assert [name["name"] for name in self.runmetrics["run7"].metric_names] == ["loss", "accuracy"]
+        assert [name["name"] for name in self.runmetrics["run7"].label_names] == ["epoch", "Batch"]
+
     def test_runmetrics_function_update_meta_no_labels(self):
         self.runmetrics["run6"].update_meta()
         assert self.runmetrics["run6"].count == 2
@@ -68,6 +163,105 @@ class TestRunMetricModel(BaseRunTest, APITestCase):
         assert self.runmetrics["run6"].label_names is None
 
 
+class TestRunMetricRows(BaseRunTest, APITestCase):
+    """
+    Test moving metrics from the RunMetricMeta file to RunMetric rows
+    """
+
+    def test_move_metrics_to_rows(self):
+        RunMetric.objects.filter(run=self.runs["run1"]).delete()
+        assert RunMetric.objects.filter(run=self.runs["run1"]).count() == 0
+
+        move_metrics_to_rows(metric_meta_uuid=self.runmetrics["run1"].uuid)
+
+        metrics = RunMetric.objects.filter(run=self.runs["run1"])
+        assert metrics.count() == 4
+        assert len({metric.suuid for metric in metrics}) == 4
+        for metric in metrics:
+            assert metric.project_suuid == self.runs["run1"].jobdef.project.suuid
+            assert metric.job_suuid == self.runs["run1"].jobdef.suuid
+            assert metric.run_suuid == self.runs["run1"].suuid
+
+        self.runmetrics["run1"].refresh_from_db()
+        assert self.runmetrics["run1"].count == 4
+
+    def test_move_metrics_to_rows_replaces_existing_rows(self):
+        move_metrics_to_rows(metric_meta_uuid=self.runmetrics["run1"].uuid)
+        move_metrics_to_rows(metric_meta_uuid=self.runmetrics["run1"].uuid)
+        assert RunMetric.objects.filter(run=self.runs["run1"]).count() == 4
+
+    def test_create_metric_rows_in_batches(self):
+        RunMetric.objects.filter(run=self.runs["run1"]).delete()
+
+        # One query per batch of rows
+        with self.assertNumQueries(2):
+            count = create_metric_rows(self.runs["run1"], metric_response_good, batch_size=3)
+
+        assert count == 4
+        assert RunMetric.objects.filter(run=self.runs["run1"]).count() == 4
+
+    @override_settings(RUN_ROWS_DEDUPLICATE_ON_INSERT=True)
+    def test_create_metric_rows_deduplicate_on_insert(self):
+        RunMetric.objects.filter(run=self.runs["run1"]).delete()
+
+        create_metric_rows(self.runs["run1"], metric_response_good)
+        create_metric_rows(self.runs["run1"], metric_response_good)
+
+        metrics = RunMetric.objects.filter(run=self.runs["run1"])
+        assert metrics.count() == 4
+        assert metrics.filter(content_hash__isnull=True).count() == 0
+
+
+class TestRunMetricUpdateMetaDebounce(BaseRunTest, APITestCase):
+    """
+    Test that the meta update for a run metric is scheduled once for a burst of saves
+    """
+
+    def test_acquire_update_meta_once(self):
+        task_name = "run.tasks.extract_run_metric_meta"
+        metric_meta_uuid = self.runmetrics["run1"].uuid
+
+        assert acquire_update_meta(task_name, metric_meta_uuid=metric_meta_uuid) is True
+        assert acquire_update_meta(task_name, metric_meta_uuid=metric_meta_uuid) is False
+        # Another run metric meta is scheduled independently
+        assert acquire_update_meta(task_name, metric_meta_uuid=self.runmetrics["run2"].uuid) is True
+
+        release_update_meta(task_name, metric_meta_uuid=metric_meta_uuid)
+        assert acquire_update_meta(task_name, metric_meta_uuid=metric_meta_uuid) is True
+
+        release_update_meta(task_name, metric_meta_uuid=metric_meta_uuid)
+        release_update_meta(task_name, metric_meta_uuid=self.runmetrics["run2"].uuid)
+
+    def test_schedule_update_meta(self):
+        task_name = "run.tasks.extract_run_metric_meta"
+        metric_meta_uuid = str(self.runmetrics["run1"].uuid)
+
+        with patch.object(meta, "celery_app") as celery_app:
+            assert schedule_update_meta(task_name, metric_meta_uuid=metric_meta_uuid) is True
+            # A second write within the delay window is covered by the scheduled task
+            assert schedule_update_meta(task_name, metric_meta_uuid=metric_meta_uuid) is False
+            celery_app.send_task.assert_called_once_with(
+                task_name, kwargs={"metric_meta_uuid": metric_meta_uuid}, countdown=settings.RUN_META_UPDATE_DELAY
+            )
+
+            # The task releases the debounce key, so the next write schedules a new update
+            extract_run_metric_meta(metric_meta_uuid=metric_meta_uuid)
+            assert schedule_update_meta(task_name, metric_meta_uuid=metric_meta_uuid) is True
+            assert celery_app.send_task.call_count == 2
+
+        release_update_meta(task_name, metric_meta_uuid=metric_meta_uuid)
+
+    def test_extract_run_metric_meta_releases_update_meta(self):
+        task_name = "run.tasks.extract_run_metric_meta"
+        metric_meta_uuid = str(self.runmetrics["run1"].uuid)
+
+        assert acquire_update_meta(task_name, metric_meta_uuid=metric_meta_uuid) is True
+        extract_run_metric_meta(metric_meta_uuid=metric_meta_uuid)
+        assert acquire_update_meta(task_name, metric_meta_uuid=metric_meta_uuid) is True
+
+        release_update_meta(task_name, metric_meta_uuid=metric_meta_uuid)
+
+
 class TestMetricListAPI(BaseRunTest, APITestCase):
     """
     Test to list the RunMetric
@@ -295,6 +489,145 @@ class TestMetricUpdateAPI(BaseRunTest, APITestCase):
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+class TestMetricAppendAPI(BaseRunTest, APITestCase):
+    """
+    We append metrics to a run
+    """
+
+    def get_url(self, run):
+        return reverse(
+            "run-metric-append",
+            kwargs={
+                "version": "v1",
+                "parent_lookup_run__suuid": run.suuid,
+            },
+        )
+
+    def test_append_as_member(self):
+        """
+        We append metrics as member of a workspace, only the new metrics are added
+        """
+        self.activate_user("member")
+        # Appended metrics are logged after the metrics that are already stored
+        metrics = [{**metric, "created_at": "2021-02-14T12:00:02+00:00"} for metric in metric_response_good_small]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.get_url(self.runs["run1"]),
+                {"metrics": metrics},
+                format="json",
+            )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        assert RunMetric.objects.filter(run=self.runs["run1"]).count() == 6
+        assert len(list(self.runmetrics["run1"].metrics)) == 6
+
+        # The incremental meta is the same as the meta calculated for all metrics
+        run_metric_meta = RunMetricMeta.objects.get(pk=self.runmetrics["run1"].pk)
+        assert run_metric_meta.count == 6
+        meta = (run_metric_meta.count, run_metric_meta.size, run_metric_meta.metric_names, run_metric_meta.label_names)
+        run_metric_meta.update_meta()
+        assert meta == (
+            run_metric_meta.count,
+            run_metric_meta.size,
+            run_metric_meta.metric_names,
+            run_metric_meta.label_names,
+        )
+
+    @override_settings(RUN_ROWS_DEDUPLICATE_ON_INSERT=True)
+    def test_append_duplicates(self):
+        """
+        Metrics that are skipped as duplicates are not added to the file
+        """
+        self.activate_user("member")
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    self.get_url(self.runs["run1"]),
+                    {"metrics": metric_response_good_small},
+                    format="json",
+                )
+            assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        assert RunMetric.objects.filter(run=self.runs["run1"]).count() == 6
+        assert len(list(self.runmetrics["run1"].metrics)) == 6
+
+    def test_append_to_run_without_metrics(self):
+        """
+        We append metrics to runs that don't have metrics yet
+        """
+        self.activate_user("member")
+        for run in (self.runs["run7"], self.runs["run5"]):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    self.get_url(run),
+                    {"metrics": metric_response_good_small},
+                    format="json",
+                )
+            assert response.status_code == status.HTTP_204_NO_CONTENT
+
+            run_metric_meta = RunMetricMeta.objects.get(run=run)
+            assert run_metric_meta.count == 2
+            assert len(list(run_metric_meta.metrics)) == 2
+            assert RunMetric.objects.filter(run=run).count() == 2
+
+    def test_append_stores_run_suuid(self):
+        """
+        The metrics of the first append are stored with the run SUUID, the same as the metrics of later appends
+        """
+        self.activate_user("member")
+        run = self.runs["run7"]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.get_url(run), {"metrics": metric_response_good_small[:1]}, format="json")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        metrics = list(RunMetricMeta.objects.get(run=run).metrics)
+        assert len(metrics) == 1
+        assert metrics[0]["run_suuid"] == run.suuid
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.get_url(run), {"metrics": metric_response_good_small[1:]}, format="json")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        metrics = list(RunMetricMeta.objects.get(run=run).metrics)
+        assert len(metrics) == 2
+        assert metrics[1].keys() == metrics[0].keys()
+        assert all(metric["run_suuid"] == run.suuid for metric in metrics)
+
+    def test_append_invalid_metrics(self):
+        """
+        Metrics without the required information are not appended
+        """
+        self.activate_user("member")
+        for metrics in ([], [{"metric": {"name": "Accuracy"}, "created_at": "2021-02-14T12:00:01+00:00"}]):
+            response = self.client.post(self.get_url(self.runs["run1"]), {"metrics": metrics}, format="json")
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        assert RunMetric.objects.filter(run=self.runs["run1"]).count() == 4
+
+    def test_append_as_non_member(self):
+        """
+        We cannot append metrics as non-member of a workspace
+        """
+        self.activate_user("non_member")
+        response = self.client.post(
+            self.get_url(self.runs["run1"]),
+            {"metrics": metric_response_good_small},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_append_as_anonymous(self):
+        """
+        We cannot append metrics as anonymous
+        """
+        response = self.client.post(
+            self.get_url(self.runs["run1"]),
+            {"metrics": metric_response_good_small},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 class TestRunMetricDeduplicate(BaseRunTest, APITestCase):
     def setUp(self):
         super().setUp()
@@ -1,9 +1,17 @@
+from unittest.mock import patch
+
 from dateutil.parser import parse as date_parse
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from config.celery_app import app as celery_app
+
 from .base import BaseRunTest
+from run.models import RunOutbox
 
 
 class TestRunModel(BaseRunTest, APITestCase):
@@ -17,28 +25,109 @@ class TestRunModel(BaseRunTest, APITestCase):
     def test_run_function__str__run_with_no_name(self):
         assert str(self.runs["run7"]) == str(self.runs["run7"].suuid)
 
-    def test_run_function_set_status(self):
-        assert self.runs["run7"].status == "FAILED"
-        modified_at_before = self.runs["run7"].modified_at
-
-        self.runs["run7"].set_status("COMPLETED")
-        assert self.runs["run7"].status == "COMPLETED"
-        assert self.runs["run7"].modified_at > modified_at_before
-
-        # Set status of run7 back to failed
-        self.runs["run7"].set_status("FAILED")
-
-    def test_run_function_set_finished_at(self):
-        assert self.runs["run6"].finished_at is None
-        assert self.runs["run6"].duration is None
-        modified_at_before = self.runs["run6"].modified_at
-
-        self.runs["run6"].set_finished_at()
-        assert self.runs["run6"].modified_at > modified_at_before
-        assert self.runs["run6"].finished_at is not None
-        assert self.runs["run6"].finished_at > self.runs["run6"].started_at
-        duration = (self.runs["run6"].finished_at - self.runs["run6"].started_at).seconds
-        assert self.runs["run6"].duration == duration
+    def test_run_function_transition(self):
+        run = self.runs["run6"]
+        assert run.status == "IN_PROGRESS"
+        modified_at_before = run.modified_at
+
+        assert run.to_failed(exit_code=2) is True
+        assert run.status == "FAILED"
+        assert run.modified_at > modified_at_before
+
+        run.refresh_from_db()
+        assert run.status == "FAILED"
+        assert run.output.exit_code == 2
+        assert sorted(run.outbox.values_list("task_name", flat=True)) == [
+            "job.tasks.release_run_resources",
+            "job.tasks.send_run_notification",
+            "run.tasks.post_run_deduplicate_metrics",
+            "run.tasks.post_run_deduplicate_variables",
+        ]
+
+        # A finished run does not change status again, and the tasks are not added to the outbox again
+        assert run.to_completed() is False
+        run.refresh_from_db()
+        assert run.status == "FAILED"
+        assert run.outbox.count() == 4
+
+    @override_settings(RUN_ROWS_DEDUPLICATE_ON_INSERT=True)
+    def test_run_function_transition_deduplicate_on_insert(self):
+        run = self.runs["run6"]
+        assert run.to_completed() is True
+
+        # Duplicate metrics and variables are skipped on insert, so they are not removed after the run
+        assert sorted(run.outbox.values_list("task_name", flat=True)) == [
+            "job.tasks.release_run_resources",
+            "job.tasks.send_run_notification",
+        ]
+
+    def test_run_function_transition_single_update(self):
+        run = self.runs["run6"]
+        assert run.output  # Load the log, so only the queries of the transition are counted
+
+        # One UPDATE for the run and one INSERT for the outbox, wrapped in a savepoint
+        with self.assertNumQueries(4):
+            run.transition("COMPLETED")
+
+    def test_run_function_to_finished_duration(self):
+        run = self.runs["run6"]
+        assert run.finished_at is None
+        assert run.duration is None
+
+        run.to_completed()
+        assert run.finished_at is not None
+        assert run.finished_at > run.started_at
+        duration = (run.finished_at - run.started_at).seconds
+        assert run.duration == duration
+
+    def test_run_outbox_dispatch(self):
+        run = self.runs["run6"]
+        run.to_completed()
+        assert RunOutbox.objects.filter(run=run).count() == 4
+
+        assert RunOutbox.dispatch(pks=list(run.outbox.values_list("pk", flat=True))) == 4
+        assert RunOutbox.objects.filter(run=run).count() == 0
+
+    def test_run_visibility(self):
+        public_run = self.runs["run6"]
+        assert public_run.workspace == self.workspace_c
+        assert public_run.is_public is True
+        assert self.runs["run1"].workspace == self.workspace_a
+        assert self.runs["run1"].is_public is False
+
+        assert public_run.metrics.exists()
+        assert public_run.metrics.exclude(workspace=self.workspace_c, is_public=True).count() == 0
+
+    def test_run_visibility_changed(self):
+        public_run = self.runs["run6"]
+
+        self.workspace_c.visibility = "PRIVATE"
+        self.workspace_c.save()
+        public_run.refresh_from_db()
+        assert public_run.is_public is False
+        assert public_run.metrics.filter(is_public=True).count() == 0
+
+        self.workspace_c.visibility = "PUBLIC"
+        self.workspace_c.save()
+        public_run.refresh_from_db()
+        assert public_run.is_public is True
+
+        self.project3.visibility = "PRIVATE"
+        self.project3.save()
+        public_run.refresh_from_db()
+        assert public_run.is_public is False
+        assert public_run.metrics.filter(is_public=True).count() == 0
+
+    def test_run_visibility_not_changed(self):
+        self.workspace_c.name = "workspace c renamed"
+        self.project3.name = "project 3 renamed"
+        with CaptureQueriesContext(connection) as context:
+            self.workspace_c.save()
+            self.project3.save()
+            self.project3.save(update_fields=["name"])
+
+        assert not [query for query in context.captured_queries if "run_run" in query["sql"]]
+        assert self.runs["run6"].is_public is True
 
 
 class TestRunListAPI(BaseRunTest, APITestCase):
@@ -72,6 +161,24 @@ class TestRunListAPI(BaseRunTest, APITestCase):
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data["results"]) == 7  # type: ignore
 
+    def test_list_query_count(self):
+        """
+        The number of queries to list runs does not grow with the number of runs on a page
+        """
+        self.activate_user("admin")
+        self.client.get(self.url)
+
+        query_counts = []
+        for page_size in [1, 7]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, {"page_size": page_size})
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data["results"]) == page_size  # type: ignore
+            query_counts.append(len(queries))
+
+        assert query_counts[0] == query_counts[1]
+        assert query_counts[1] <= 12
+
     def test_list_as_member(self):
         """
         We can list runs as member of a workspace
@@ -100,6 +207,34 @@ class TestRunListAPI(BaseRunTest, APITestCase):
         assert len(response.data["results"]) == 1  # type: ignore
         assert response.data["results"][0]["name"] == "run6"  # type: ignore
 
+    def test_list_as_anonymous_project_made_private(self):
+        """
+        Runs and metrics of a project that is made private are not listed anymore, without running the visibility task
+        """
+        metric_url = reverse(
+            "run-metric-list",
+            kwargs={"version": "v1", "parent_lookup_run__suuid": self.runs["run6"].suuid},
+        )
+        assert len(self.client.get(metric_url).data["results"]) > 0  # type: ignore
+
+        with patch("run.tasks.update_visibility") as update_visibility, patch.object(
+            celery_app, "send_task"
+        ) as send_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.project3.visibility = "PRIVATE"
+                self.project3.save()
+
+            response = self.client.get(self.url)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data["results"]) == 0  # type: ignore
+
+            response = self.client.get(metric_url)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data["results"]) == 0  # type: ignore
+
+        assert update_visibility.call_count == 0
+        assert send_task.call_count == 0
+
     def test_list_as_member_filter_by_run(self):
         """
         We can list runs as member and filter by run
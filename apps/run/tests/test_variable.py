@@ -1,3 +1,4 @@
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -8,7 +9,7 @@ from .base import (
     variable_response_good_small,
 )
 from run.models import Run, RunVariable, RunVariableMeta
-from run.tasks.variable import post_run_deduplicate_variables
+from run.tasks.variable import create_variable_rows, post_run_deduplicate_variables
 
 
 class TestRunVariableModel(BaseRunTest, APITestCase):
@@ -367,6 +368,37 @@ class TestRunVariableDeduplicate(BaseRunTest, APITestCase):
         variable_record_after_deduplicate = RunVariableMeta.objects.get(uuid=self.run_variables_deduplicate.uuid)
         assert variable_record_after_deduplicate.count == 2
 
+    @override_settings(RUN_ROWS_DEDUPLICATE_ON_INSERT=True)
+    def test_create_variable_rows_deduplicate_on_insert(self):
+        RunVariable.objects.filter(run=self.run_deduplicate).delete()
+
+        create_variable_rows(self.run_deduplicate, self.variables_to_test_deduplicate)
+        create_variable_rows(self.run_deduplicate, self.variables_to_test_deduplicate)
+
+        variables = RunVariable.objects.filter(run=self.run_deduplicate)
+        assert variables.count() == 2
+        assert variables.filter(content_hash__isnull=True).count() == 0
+
+    def test_create_variable_rows_masks_secrets(self):
+        RunVariable.objects.filter(run=self.run_deduplicate).delete()
+
+        create_variable_rows(
+            self.run_deduplicate,
+            [
+                {
+                    "run_suuid": self.run_deduplicate.suuid,
+                    "variable": {"name": "api_token", "value": "secret", "type": "string"},
+                    "label": [],
+                    "created_at": "2021-02-14T12:00:01.123456+00:00",
+                }
+            ],
+        )
+
+        variable = RunVariable.objects.get(run=self.run_deduplicate)
+        assert variable.is_masked is True
+        assert variable.variable["value"] == "***masked***"
+        assert variable.label == [{"name": "is_masked", "value": None, "type": "tag"}]
+
     def tearDown(self):
         super().tearDown()
         self.run_deduplicate.delete()
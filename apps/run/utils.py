@@ -1,32 +1,31 @@
-def add_key_to_unique_keys(key: dict, unique_keys: list) -> list:
-    """Check if key is already in unique_keys list and add it if not. If the key is already in the list, update the
-    count and data type if needed.
+import hashlib
+import json
 
-    Args:
-        key (dict): key to add to unique_keys
-        unique_keys (list): list of unique keys
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connection
+from django.db.models import Count, Max, QuerySet
+from django.db.models.fields.json import KeyTextTransform
+
+NUMERIC_DATA_TYPES = ("integer", "float")
 
-    Returns:
-        list: list of updated unique keys
-    """
 
-    add_key = True
-    for unique_key in unique_keys:
-        if key["name"] == unique_key["name"]:
-            add_key = False
-            if unique_key.get("count"):
-                unique_key.update({"count": unique_key["count"] + 1})
-            if key["type"] != unique_key["type"]:
-                if key["type"] in ("integer", "float") and unique_key["type"] in ("integer", "float"):
-                    unique_key.update({"type": "float"})
-                else:
-                    unique_key.update({"type": "mixed"})
-            break
+def merge_data_types(data_type: str | None, other_data_type: str | None) -> str | None:
+    """Return the data type that describes the values of both data types. Integers and floats are combined to float,
+    any other combination of different data types is set to 'mixed'.
+    """
+    if data_type == other_data_type:
+        return data_type
+    if data_type in NUMERIC_DATA_TYPES and other_data_type in NUMERIC_DATA_TYPES:
+        return "float"
+    return "mixed"
 
-    if add_key:
-        unique_keys.append(key)
 
-    return unique_keys
+def get_data_type(data_types: list) -> str | None:
+    """Return the data type that describes all values of the list of data types"""
+    data_type = data_types[0]
+    for other_data_type in data_types[1:]:
+        data_type = merge_data_types(data_type, other_data_type)
+    return data_type
 
 
 def get_unique_names_with_data_type(all_keys: list) -> list:
@@ -37,12 +36,101 @@ def get_unique_names_with_data_type(all_keys: list) -> list:
     - name
     - type
 
+    Optionally a dictionary has a key `count`. The count of keys with the same name is summed.
+
     The functon returns a list of dictionaries with unique names and the date type for each name. If data type values
     or not unique, it's set to 'mixed'.
     """
-    unique_keys = []
+    unique_keys = {}
 
     for key in all_keys:
-        unique_keys = add_key_to_unique_keys(key, unique_keys)
+        unique_key = unique_keys.get(key["name"])
+        if unique_key is None:
+            unique_keys[key["name"]] = key
+            continue
+
+        if unique_key.get("count"):
+            unique_key.update({"count": unique_key["count"] + key.get("count", 1)})
+        unique_key.update({"type": merge_data_types(unique_key["type"], key["type"])})
+
+    return list(unique_keys.values())
+
+
+def get_content_hash(*values) -> str:
+    """Return a SHA-256 hash of the JSON representation of the values. Used to detect rows with the same content."""
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_names_with_data_type_from_rows(queryset: QuerySet, field: str) -> list:
+    """
+    Aggregate the names, data types and count of the JSON objects stored in `field` for the rows in the queryset. The
+    names are in the order they first occur in the rows ordered by `-created_at`, the default ordering of the rows.
+    """
+    names = (
+        queryset.order_by()
+        .values(name=KeyTextTransform("name", field))
+        .annotate(
+            types=ArrayAgg(KeyTextTransform("type", field), distinct=True),
+            count=Count("pk"),
+            last_created_at=Max("created_at"),
+        )
+        .order_by("-last_created_at", "name")
+    )
+
+    return [{"name": name["name"], "type": get_data_type(name["types"]), "count": name["count"]} for name in names]
+
+
+def get_label_names_with_data_type_from_rows(queryset: QuerySet) -> list:
+    """
+    Aggregate the names and data types of the labels for the rows in the queryset. The labels are stored as a JSON list
+    in the field `label`. The names are in the order they first occur in the rows ordered by `-created_at`.
+    """
+    rows_sql, params = queryset.order_by().values("label", "created_at").query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT element ->> 'name' AS name, ARRAY_AGG(DISTINCT element ->> 'type') AS types "  # nosec: B608
+            f"FROM ({rows_sql}) AS rows, JSONB_ARRAY_ELEMENTS(rows.label) AS element "
+            "WHERE JSONB_TYPEOF(rows.label) = 'array' "
+            "GROUP BY 1 ORDER BY MAX(rows.created_at) DESC, 1",
+            params,
+        )
+        return [{"name": name, "type": get_data_type(types)} for name, types in cursor.fetchall()]
+
+
+def get_count_and_size_from_rows(queryset: QuerySet, field: str) -> tuple[int, int]:
+    """
+    Count the rows in the queryset and calculate the size of the rows as JSON list. Each row is represented as:
+
+        {"run_suuid": ..., "<field>": ..., "label": ..., "created_at": ...}
+
+    The `created_at` is formatted in the same way as Python's `datetime.isoformat` for UTC timestamps.
+
+    The text output of JSONB stores non-ASCII characters as UTF-8, while `json.dumps` escapes them as `\\uXXXX` (a
+    surrogate pair for characters outside the Basic Multilingual Plane). For rows with non-ASCII characters, the UTF-8
+    bytes are replaced by the size of the escape sequences so the size matches the stored file. The field is always
+    one of the model's field names, the values of the rows are only passed as query parameters.
+    """
+    rows_sql, params = queryset.order_by().values("run_suuid", field, "label", "created_at").query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*), SUM(OCTET_LENGTH(row_text) - OCTET_LENGTH(non_ascii) "  # nosec: B608
+            "+ 6 * (CHAR_LENGTH(non_ascii) + CHAR_LENGTH(REGEXP_REPLACE(non_ascii, '[\\u0080-\\uFFFF]+', '', 'g')))) "
+            "FROM (SELECT row_text, CASE WHEN OCTET_LENGTH(row_text) = CHAR_LENGTH(row_text) THEN '' "
+            "ELSE REGEXP_REPLACE(row_text, '[\\x01-\\x7F]+', '', 'g') END AS non_ascii "
+            "FROM (SELECT JSONB_BUILD_OBJECT("
+            f"'run_suuid', rows.run_suuid, '{field}', rows.{field}, 'label', rows.label, "
+            "'created_at', TO_CHAR(rows.created_at AT TIME ZONE 'UTC', "
+            "CASE WHEN MOD(DATE_PART('microseconds', rows.created_at)::integer, 1000000) = 0 "
+            """THEN 'YYYY-MM-DD"T"HH24:MI:SS"+00:00"' ELSE 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"' END)"""
+            f")::text AS row_text FROM ({rows_sql}) AS rows) AS row_texts) AS row_sizes",
+            params,
+        )
+        count, size = cursor.fetchone()
+
+    if not count:
+        return 0, 0
 
-    return unique_keys
+    # Add the brackets of the list and the separators between the rows
+    return count, size + 2 + 2 * (count - 1)
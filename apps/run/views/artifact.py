@@ -2,7 +2,6 @@ from pathlib import Path
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Q
 from django.http import Http404
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import mixins, status, viewsets
@@ -10,9 +9,10 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
-from account.models.membership import MSP_WORKSPACE, Membership
+from account.models.membership import Membership
 from core.mixins import ObjectRoleMixin
 from core.permissions.role import RoleBasedPermission
+from core.permissions.visibility import get_visibility_filter
 from core.views import BaseChunkedPartViewSet, BaseUploadFinishViewSet
 from run.models import ChunkedRunArtifactPart as ChunkedArtifactPart
 from run.models import Run, RunArtifact
@@ -69,30 +69,7 @@ class RunArtifactView(
         where the current user had access to
         meaning also beeing part of a certain workspace
         """
-        user = self.request.user
-        if user.is_anonymous:
-            return (
-                super()
-                .get_queryset()
-                .filter(
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-
-        member_of_workspaces = user.memberships.filter(object_type=MSP_WORKSPACE).values_list("object_uuid", flat=True)
-
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                Q(run__jobdef__project__workspace__in=member_of_workspaces)
-                | (
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-        )
+        return super().get_queryset().filter(get_visibility_filter(self.request.user, prefix="run__"))
 
     def get_object_project(self):
         return self.current_object.run.jobdef.project
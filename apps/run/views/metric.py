@@ -1,18 +1,25 @@
-from django.db.models import Q
+from django.db import transaction
 from django.http import Http404
 from django_filters import CharFilter, FilterSet
 from drf_spectacular.utils import extend_schema
-from rest_framework import mixins, viewsets
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
-from account.models.membership import MSP_WORKSPACE, Membership
+from account.models.membership import Membership
 from core.filters import filter_array, filter_multiple
 from core.mixins import ObjectRoleMixin, UpdateModelWithoutPartialUpateMixin
 from core.permissions.role import RoleBasedPermission
+from core.permissions.visibility import get_visibility_filter
 from run.models import Run, RunMetric, RunMetricMeta
-from run.serializers.metric import RunMetricSerializer, RunMetricUpdateSerializer
+from run.serializers.metric import (
+    RunMetricAppendSerializer,
+    RunMetricSerializer,
+    RunMetricUpdateSerializer,
+)
+from run.tasks.metric import add_run_suuid, append_metrics
 
 
 class RunMetricObjectMixin(ObjectRoleMixin):
@@ -20,12 +27,13 @@ class RunMetricObjectMixin(ObjectRoleMixin):
     rbac_permissions_by_action = {
         "list": ["project.run.list"],
         "update": ["project.run.edit"],
+        "append": ["project.run.edit"],
     }
 
     def get_parrent_roles(self, request, *args, **kwargs):
         run_suuid = self.kwargs["parent_lookup_run__suuid"]
         try:
-            run = Run.objects.active().get(suuid=run_suuid)
+            run = Run.objects.active().select_related("jobdef__project__workspace").get(suuid=run_suuid)
         except Run.DoesNotExist as exc:
             raise Http404 from exc
 
@@ -92,31 +100,7 @@ class RunMetricView(
         """
         For listings return only values from runs in projects where the current user has access to
         """
-        user = self.request.user
-
-        if user.is_anonymous:
-            return (
-                super()
-                .get_queryset()
-                .filter(
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-
-        member_of_workspaces = user.memberships.filter(object_type=MSP_WORKSPACE).values_list("object_uuid", flat=True)
-
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                Q(run__jobdef__project__workspace__in=member_of_workspaces)
-                | (
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-        )
+        return super().get_queryset().filter(get_visibility_filter(self.request.user))
 
 
 class RunMetricUpdateView(
@@ -138,30 +122,7 @@ class RunMetricUpdateView(
         """
         For listings return only values from runs in projects where the current user has access to
         """
-        user = self.request.user
-        if user.is_anonymous:
-            return (
-                super()
-                .get_queryset()
-                .filter(
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-
-        member_of_workspaces = user.memberships.filter(object_type=MSP_WORKSPACE).values_list("object_uuid", flat=True)
-
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                Q(run__jobdef__project__workspace__in=member_of_workspaces)
-                | (
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-        )
+        return super().get_queryset().filter(get_visibility_filter(self.request.user, prefix="run__"))
 
     @extend_schema(responses={200: None})
     def update(self, request, *args, **kwargs):
@@ -169,6 +130,30 @@ class RunMetricUpdateView(
         # TODO: change status code to 204 BUT also change CLI to handle 204
         return Response(None, status=200)
 
+    @extend_schema(request=RunMetricAppendSerializer, responses={204: None})
+    @action(detail=False, methods=["post"], serializer_class=RunMetricAppendSerializer)
+    def append(self, request, *args, **kwargs):
+        """
+        Append metrics to the run. Only the metrics in the request are added, the metrics already stored for the run
+        are kept.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        metrics = [dict(metric) for metric in serializer.validated_data["metrics"]]
+
+        run = get_object_or_404(Run.objects.active(), suuid=self.kwargs["parent_lookup_run__suuid"])
+        with transaction.atomic():
+            # Lock the run, so concurrent first appends for a run do not each create the metric meta
+            Run.objects.select_for_update(of=("self",)).filter(pk=run.pk).first()
+            # The first metrics of a run are stored the same way as when the metrics are updated
+            run_metrics, created = RunMetricMeta.objects.get_or_create(
+                run=run, defaults={"metrics": add_run_suuid(run, metrics)}
+            )
+            if not created:
+                append_metrics(run_metrics, metrics)
+
+        return Response(None, status=status.HTTP_204_NO_CONTENT)
+
     def get_object_fallback(self):
         """Return a new RunMetric instance or raise 404 if Run does not exists."""
         run = get_object_or_404(Run.objects.active(), suuid=self.kwargs[self.lookup_field])
@@ -33,7 +33,9 @@ class BaseRunResultCreateView(
     def get_parrent_roles(self, request, *args, **kwargs):
         parents = self.get_parents_query_dict()
         try:
-            run = Run.objects.active().get(suuid=parents.get("run__suuid"))
+            run = (
+                Run.objects.active().select_related("jobdef__project__workspace").get(suuid=parents.get("run__suuid"))
+            )
         except ObjectDoesNotExist as exc:
             raise Http404 from exc
 
@@ -1,22 +1,29 @@
+import json
+import time
+from collections.abc import Iterator
 from pathlib import Path
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Case, Q, Value, When
-from django.http import HttpResponse
+from django.db.models import Case, Value, When
+from django.http import HttpResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django_filters import FilterSet
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from account.models.membership import MSP_WORKSPACE
 from core.filters import MultiUpperValueCharFilter, MultiValueCharFilter
 from core.mixins import ObjectRoleMixin, PartialUpdateModelMixin
 from core.permissions.role import RoleBasedPermission
+from core.permissions.visibility import get_visibility_filter
+from core.renderers import EventStreamRenderer
 from core.utils import stream
-from run.models import RedisLogQueue
+from run.models import RedisLogQueue, RunLog
 from run.models.run import STATUS_MAPPING, Run, get_status_external
 from run.serializers.run import RunSerializer, RunStatusSerializer
 
@@ -135,6 +142,78 @@ class RunFilterSet(FilterSet):
     )
 
 
+def get_int_query_param(request, name: str, default: int = 0) -> int:
+    """
+    Return the query parameter as an integer, or the default if the parameter is not set. A value that is not an
+    integer results in a response with status 400.
+    """
+    value = request.query_params.get(name, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError) as exc:
+        raise ValidationError({name: "A valid integer is required."}) from exc
+
+
+def get_log_events(run: Run, since_index: int = 0) -> Iterator[str]:
+    """
+    Yield the log lines of the run after the line with index `since_index` as server-sent events. While the run is in
+    progress, new lines are read from the log stream as they are added. The last event is an `end` event when the log
+    of the run is complete.
+    """
+
+    def log_event(line: list) -> str:
+        return f"id: {line[0]}\nevent: log\ndata: {json.dumps(line)}\n\n"
+
+    chunk_lines = settings.RUN_LOG_CHUNK_LINES
+    last_index = since_index
+
+    if not run.is_finished:
+        logqueue = RedisLogQueue(run.suuid)
+
+        # Lines added after the last entry in the stream are read from the stream, lines before that from the queue
+        last_id = logqueue.get_last_stream_id()
+        while lines := logqueue.get(start=last_index, end=last_index + chunk_lines - 1):
+            for line in lines:
+                yield log_event(line)
+            last_index = lines[-1][0]
+
+        deadline = time.monotonic() + settings.RUN_LOG_STREAM_TIMEOUT
+        while (remaining := deadline - time.monotonic()) > 0:
+            block = max(min(settings.RUN_LOG_STREAM_BLOCK_MS, int(remaining * 1000)), 1)
+            entries = logqueue.read_stream(last_id, block=block)
+            if not entries:
+                run.refresh_from_db(fields=["status"])
+                if run.is_finished:
+                    break
+                yield ": keep-alive\n\n"
+                continue
+
+            end_of_log = False
+            for entry_id, line in entries:
+                last_id = entry_id
+                if line is None:
+                    end_of_log = True
+                    break
+                if line[0] > last_index:
+                    yield log_event(line)
+                    last_index = line[0]
+            if end_of_log:
+                break
+        else:
+            # The stream is closed so the worker is available for other requests. The client reconnects with the
+            # Last-Event-ID header to continue.
+            return
+
+    # The log is complete, send the lines that are stored for the run
+    runlog = RunLog.objects.get(run_id=run.pk)
+    while lines := runlog.get_log(offset=last_index, limit=chunk_lines):
+        for line in lines:
+            yield log_event(line)
+        last_index = lines[-1][0]
+
+    yield "event: end\ndata: \n\n"
+
+
 @extend_schema_view(
     list=extend_schema(description="List the runs you have access to"),
     retrieve=extend_schema(description="Get info from a specific run"),
@@ -164,6 +243,8 @@ class RunView(
             "result",
             "artifact",
             "output",
+            "metrics_meta",
+            "variables_meta",
         )
         .annotate(
             member_name=Case(
@@ -215,6 +296,7 @@ class RunView(
         "list": ["project.run.list"],
         "retrieve": ["project.run.list"],
         "log": ["project.run.list"],
+        "log_stream": ["project.run.list"],
         "manifest": ["project.run.list"],
         "result_download": ["project.run.list"],
         "create": ["project.run.create"],
@@ -226,24 +308,7 @@ class RunView(
         """
         Return only values from projects where the user is member of or has access to because it's public.
         """
-        user = self.request.user
-        if user.is_anonymous:
-            return (
-                super()
-                .get_queryset()
-                .filter(Q(jobdef__project__workspace__visibility="PUBLIC") & Q(jobdef__project__visibility="PUBLIC"))
-            )
-
-        member_of_workspaces = user.memberships.filter(object_type=MSP_WORKSPACE).values_list("object_uuid", flat=True)
-
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                Q(jobdef__project__workspace__in=member_of_workspaces)
-                | (Q(jobdef__project__workspace__visibility="PUBLIC") & Q(jobdef__project__visibility="PUBLIC"))
-            )
-        )
+        return super().get_queryset().filter(get_visibility_filter(self.request.user))
 
     def get_object_project(self):
         return self.current_object.jobdef.project
@@ -329,6 +394,13 @@ class RunView(
                 OpenApiParameter.QUERY,
                 description="The initial index from which to return the log.",
             ),
+            OpenApiParameter(
+                "since_index",
+                OpenApiTypes.INT,
+                OpenApiParameter.QUERY,
+                description="Only return the log lines after the line with this index. Use the index of the last "
+                "received line to get only the new lines while a run is in progress. Overrides the offset.",
+            ),
         ],
         request=None,
         responses={
@@ -366,16 +438,30 @@ class RunView(
     def log(self, request, suuid, **kwargs):
         "Get the log from a run"
         instance = self.get_object()
+
+        limit = get_int_query_param(request, "limit", default=10)
+        offset = max(get_int_query_param(request, "offset"), 0)
+        if "since_index" in request.query_params:
+            # The log index starts at 1, so the line with index `since_index` is at position `since_index - 1`
+            offset = max(get_int_query_param(request, "since_index"), 0)
+
         if instance.is_finished:
-            stdout = instance.output.stdout
+            # Only read the chunks of the stored log that contain the requested lines
+            count = instance.output.lines
+            if limit == -1:
+                stdout = instance.output.get_log(offset=offset) if count else instance.output.stdout
+            else:
+                stdout = instance.output.get_log(offset=offset, limit=limit)
         else:
+            # Only read the requested lines from the log queue
             logqueue = RedisLogQueue(instance.suuid)
-            stdout = logqueue.get()
-
-        limit = int(request.query_params.get("limit", 10))
-        offset = int(request.query_params.get("offset", 0))
-
-        count = len(stdout) if stdout else 0
+            count = logqueue.length()
+            if limit == -1:
+                stdout = logqueue.get(start=offset)
+            elif limit > 0 and offset < count:
+                stdout = logqueue.get(start=offset, end=offset + limit - 1)
+            else:
+                stdout = []
 
         response_json = {
             "count": count,
@@ -386,7 +472,7 @@ class RunView(
         if limit == -1:
             response_json["results"] = stdout
         elif count:
-            response_json["results"] = stdout[offset : offset + limit]
+            response_json["results"] = stdout
 
             scheme = request.scheme
             path = request.path
@@ -398,6 +484,46 @@ class RunView(
 
         return Response(response_json, status=status.HTTP_200_OK)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "since_index",
+                OpenApiTypes.INT,
+                OpenApiParameter.QUERY,
+                description="Only stream the log lines after the line with this index. Instead of this parameter, the "
+                "Last-Event-ID header can be used to continue a stream.",
+            ),
+        ],
+        request=None,
+        responses={200: OpenApiTypes.STR},
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        serializer_class=None,
+        url_path="log/stream",
+        url_name="log-stream",
+        renderer_classes=[EventStreamRenderer, JSONRenderer],
+    )
+    def log_stream(self, request, suuid, **kwargs):
+        """
+        Stream the log of a run as server-sent events. New log lines of a run in progress are sent when they are added
+        to the log. A `log` event contains a log line, the `end` event is sent when the log is complete. The stream of
+        a run in progress is closed after a short time without an `end` event, clients reconnect with the
+        Last-Event-ID header to continue.
+        """
+        instance = self.get_object()
+        since_index = get_int_query_param(request, "since_index", default=request.headers.get("Last-Event-ID", 0))
+
+        response = StreamingHttpResponse(
+            get_log_events(instance, since_index=max(since_index, 0)),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Disable buffering of the response by Nginx
+        response["X-Accel-Buffering"] = "no"
+        return response
+
     @extend_schema(responses={200: OpenApiTypes.BYTE})
     @action(detail=True, methods=["get", "head"], serializer_class=None)
     def result(self, request, suuid, **kwargs):
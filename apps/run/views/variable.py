@@ -1,4 +1,3 @@
-from django.db.models import Q
 from django.http import Http404
 from django_filters import CharFilter, FilterSet
 from drf_spectacular.utils import extend_schema
@@ -6,10 +5,11 @@ from rest_framework import mixins, viewsets
 from rest_framework.response import Response
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
-from account.models.membership import MSP_WORKSPACE, Membership
+from account.models.membership import Membership
 from core.filters import filter_array, filter_multiple
 from core.mixins import ObjectRoleMixin, PartialUpdateModelMixin
 from core.permissions.role import RoleBasedPermission
+from core.permissions.visibility import get_visibility_filter
 from run.models import Run, RunVariable, RunVariableMeta
 from run.serializers.variable import RunVariableSerializer, RunVariableUpdateSerializer
 
@@ -24,7 +24,7 @@ class RunVariableObjectMixin(ObjectRoleMixin):
     def get_parrent_roles(self, request, *args, **kwargs):
         run_suuid = self.kwargs["parent_lookup_run__suuid"]
         try:
-            run = Run.objects.active().get(suuid=run_suuid)
+            run = Run.objects.active().select_related("jobdef__project__workspace").get(suuid=run_suuid)
         except Run.DoesNotExist as exc:
             raise Http404 from exc
 
@@ -89,31 +89,7 @@ class RunVariableView(
         """
         For listings return only values from runs in projects where the current user has access to
         """
-        user = self.request.user
-
-        if user.is_anonymous:
-            return (
-                super()
-                .get_queryset()
-                .filter(
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-
-        member_of_workspaces = user.memberships.filter(object_type=MSP_WORKSPACE).values_list("object_uuid", flat=True)
-
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                Q(run__jobdef__project__workspace__in=member_of_workspaces)
-                | (
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-        )
+        return super().get_queryset().filter(get_visibility_filter(self.request.user, prefix="run__"))
 
 
 class RunVariableUpdateView(
@@ -135,30 +111,7 @@ class RunVariableUpdateView(
         """
         For listings return only values from runs in projects where the current user has access to
         """
-        user = self.request.user
-        if user.is_anonymous:
-            return (
-                super()
-                .get_queryset()
-                .filter(
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-
-        member_of_workspaces = user.memberships.filter(object_type=MSP_WORKSPACE).values_list("object_uuid", flat=True)
-
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                Q(run__jobdef__project__workspace__in=member_of_workspaces)
-                | (
-                    Q(run__jobdef__project__workspace__visibility="PUBLIC")
-                    & Q(run__jobdef__project__visibility="PUBLIC")
-                )
-            )
-        )
+        return super().get_queryset().filter(get_visibility_filter(self.request.user, prefix="run__"))
 
     @extend_schema(
         responses={200: None},
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+def set_is_active(apps, schema_editor):
+    Variable = apps.get_model("variable", "Variable")  # noqa: N806
+    Variable.objects.exclude(
+        deleted_at__isnull=True, project__deleted_at__isnull=True, project__workspace__deleted_at__isnull=True
+    ).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("variable", "0001_initial_20230414"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="variable",
+            name="is_active",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="variable",
+            index=models.Index(
+                condition=models.Q(("is_active", True)), fields=["project"], name="variable_active_idx"
+            ),
+        ),
+        migrations.RunPython(set_is_active, reverse_code=migrations.RunPython.noop, elidable=True),
+    ]
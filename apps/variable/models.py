@@ -2,21 +2,15 @@ from django.db import models
 from django.db.models import Q
 from django_cryptography.fields import encrypt
 
-from core.models import BaseModel
+from core.models import ActiveModel, BaseModel
 
 
 class VariableQuerySet(models.QuerySet):
     def active(self):
-        return self.filter(
-            deleted_at__isnull=True, project__deleted_at__isnull=True, project__workspace__deleted_at__isnull=True
-        )
+        return self.filter(is_active=True)
 
     def inactive(self):
-        return self.filter(
-            Q(deleted_at__isnull=False)
-            | Q(project__deleted_at__isnull=True)
-            | Q(project__workspace__deleted_at__isnull=False)
-        )
+        return self.filter(is_active=False)
 
 
 class VariableManager(models.Manager):
@@ -30,7 +24,7 @@ class VariableManager(models.Manager):
         return self.get_queryset().inactive()
 
 
-class Variable(BaseModel):
+class Variable(ActiveModel, BaseModel):
     """Model to store Variables that can be used for runnings jobs"""
 
     name = models.CharField(max_length=128)
@@ -46,6 +40,8 @@ class Variable(BaseModel):
 
     objects = VariableManager()
 
+    active_parents = {"project.Project": "project", "workspace.Workspace": "project__workspace"}
+
     def get_value(self):
         if self.is_masked:
             return "***masked***"
@@ -53,3 +49,6 @@ class Variable(BaseModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["project"], condition=Q(is_active=True), name="variable_active_idx"),
+        ]
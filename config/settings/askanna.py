@@ -9,6 +9,10 @@ def settings(config, env):
     config.ASKANNA_INVITATION_VALID_HOURS = env.int("ASKANNA_INVITATION_VALID_HOURS", 168)
     config.OBJECT_REMOVAL_TTL_HOURS = env.int("OBJECT_REMOVAL_TTL_HOURS", 720)  # default: 30 days
 
+    # Number of seconds the role of a user in a workspace or project is cached. Set to 0 to only memoize the roles
+    # during a request.
+    config.ROLE_CACHE_TTL = env.int("ROLE_CACHE_TTL", default=300)
+
     api_environments = {
         "api": "production",
         "beta-api": "beta",
@@ -45,3 +49,74 @@ def settings(config, env):
     config.RUNNER_DEFAULT_DOCKER_IMAGE = env.str("RUNNER_DEFAULT_DOCKER_IMAGE", default="askanna/python:3.11")
     config.RUNNER_DEFAULT_DOCKER_IMAGE_USERNAME = env.str("RUNNER_DEFAULT_DOCKER_IMAGE_USERNAME", default=None)
     config.RUNNER_DEFAULT_DOCKER_IMAGE_PASSWORD = env.str("RUNNER_DEFAULT_DOCKER_IMAGE_PASSWORD", default=None)
+
+    # Number of seconds the digest of an image tag resolved from the registry is cached. Set to 0 to disable the cache.
+    # Images referenced by digest, e.g. `python@sha256:...`, are never resolved from the registry.
+    config.REGISTRY_DIGEST_CACHE_TTL = env.int("REGISTRY_DIGEST_CACHE_TTL", default=300)
+    # Prepare the run images for the jobs in a package when the package is uploaded
+    config.RUN_IMAGE_PREWARM_ENABLED = env.bool("RUN_IMAGE_PREWARM_ENABLED", default=True)
+    # Seconds before the lock on building a run image expires when it's not extended by the build
+    config.RUN_IMAGE_BUILD_LOCK_TTL = env.int("RUN_IMAGE_BUILD_LOCK_TTL", default=60)
+
+    # The Docker endpoints runs are placed on. Every endpoint is a dictionary with a `name`, a `base_url` and
+    # optionally the `cpus` and `memory` (e.g. "64g") available for runs. Without cpus and memory, the capacity is not
+    # tracked.
+    config.RUN_DOCKER_ENDPOINTS = env.json(
+        "RUN_DOCKER_ENDPOINTS",
+        default=[{"name": "local", "base_url": "unix://var/run/docker.sock"}],
+    )
+    # Resources of a run when they are not set in the askanna.yml
+    config.RUN_DEFAULT_CPUS = env.float("RUN_DEFAULT_CPUS", default=4.0)
+    config.RUN_DEFAULT_MEMORY = env.str("RUN_DEFAULT_MEMORY", default="20g")
+    # Maximum number of runs per workspace and per project that run at the same time, 0 means no limit. The limit of a
+    # specific workspace or project can be set in RUN_CONCURRENCY_LIMITS, e.g. {"<workspace or project suuid>": 10}
+    config.RUN_CONCURRENCY_LIMIT_WORKSPACE = env.int("RUN_CONCURRENCY_LIMIT_WORKSPACE", default=0)
+    config.RUN_CONCURRENCY_LIMIT_PROJECT = env.int("RUN_CONCURRENCY_LIMIT_PROJECT", default=0)
+    config.RUN_CONCURRENCY_LIMITS = env.json("RUN_CONCURRENCY_LIMITS", default={})
+    # Priority of queued runs per trigger, a lower value goes first. Runs of other triggers get the default priority.
+    config.RUN_TRIGGER_PRIORITIES = env.json("RUN_TRIGGER_PRIORITIES", default={"SCHEDULE": 0})
+    config.RUN_DEFAULT_PRIORITY = env.int("RUN_DEFAULT_PRIORITY", default=1)
+    # A run that has resources allocated but is not started within RUN_SCHEDULER_START_TIMEOUT seconds is failed, so
+    # the resources are released
+    config.RUN_SCHEDULER_START_TIMEOUT = env.int("RUN_SCHEDULER_START_TIMEOUT", default=3600)
+
+    # Number of metric or variable rows that are inserted per database query when moving them to rows
+    config.RUN_ROWS_BATCH_SIZE = env.int("RUN_ROWS_BATCH_SIZE", default=5000)
+    # Skip metric and variable rows that are already stored for a run, based on a hash of the row content
+    config.RUN_ROWS_DEDUPLICATE_ON_INSERT = env.bool("RUN_ROWS_DEDUPLICATE_ON_INSERT", default=False)
+    # Seconds to wait before updating the run metric or variable meta, so a burst of saves results in one update
+    config.RUN_META_UPDATE_DELAY = env.int("RUN_META_UPDATE_DELAY", default=5)
+
+    # Run log lines are buffered and written to the log queue per batch of lines or after the interval in seconds
+    config.RUN_LOG_BUFFER_SIZE = env.int("RUN_LOG_BUFFER_SIZE", default=500)
+    config.RUN_LOG_BUFFER_FLUSH_INTERVAL = env.float("RUN_LOG_BUFFER_FLUSH_INTERVAL", default=1.0)
+    # Number of lines per compressed chunk when the log of a finished run is stored
+    config.RUN_LOG_CHUNK_LINES = env.int("RUN_LOG_CHUNK_LINES", default=1000)
+    # Settings for the stream of the log of a run in progress. The stream keeps at least RUN_LOG_STREAM_MAXLEN lines
+    # and expires RUN_LOG_STREAM_TTL seconds after the run finished. A client waits at most RUN_LOG_STREAM_BLOCK_MS for
+    # new lines before a keep-alive is sent, and is disconnected after RUN_LOG_STREAM_TIMEOUT seconds. A stream holds a
+    # web worker, so the timeout is short and clients reconnect with the Last-Event-ID header to continue the stream.
+    config.RUN_LOG_STREAM_MAXLEN = env.int("RUN_LOG_STREAM_MAXLEN", default=100_000)
+    config.RUN_LOG_STREAM_TTL = env.int("RUN_LOG_STREAM_TTL", default=300)
+    config.RUN_LOG_STREAM_BLOCK_MS = env.int("RUN_LOG_STREAM_BLOCK_MS", default=10_000)
+    config.RUN_LOG_STREAM_TIMEOUT = env.int("RUN_LOG_STREAM_TIMEOUT", default=30)
+
+    # When the run supervisor is enabled, the containers of runs are followed by the run_supervisor command instead of
+    # the Celery worker that started the run. One supervisor follows at most RUN_SUPERVISOR_MAX_RUNS runs and checks
+    # for new runs every RUN_SUPERVISOR_POLL_INTERVAL seconds. Every followed run uses a thread for the run and one for
+    # the log stream of the container, run more supervisors to follow more runs.
+    config.RUN_SUPERVISOR_ENABLED = env.bool("RUN_SUPERVISOR_ENABLED", default=False)
+    config.RUN_SUPERVISOR_MAX_RUNS = env.int("RUN_SUPERVISOR_MAX_RUNS", default=50)
+    config.RUN_SUPERVISOR_POLL_INTERVAL = env.float("RUN_SUPERVISOR_POLL_INTERVAL", default=1.0)
+    # A run is followed by one supervisor at a time. The lease of a supervisor on a run expires after
+    # RUN_SUPERVISOR_LEASE_TTL seconds if the supervisor stops, and then another supervisor picks up the run.
+    config.RUN_SUPERVISOR_LEASE_TTL = env.int("RUN_SUPERVISOR_LEASE_TTL", default=60)
+
+    # When the schedule wheel is enabled, scheduled jobs are launched by the run_schedule_wheel command instead of the
+    # Celery beat tasks. A run that starts more than SCHEDULE_MISFIRE_GRACE_TIME seconds late is handled as missed, and
+    # the catch up policy of the schedule decides what happens. With the policy ALL, at most
+    # SCHEDULE_CATCH_UP_MAX_RUNS missed runs are started per schedule.
+    config.SCHEDULE_WHEEL_ENABLED = env.bool("SCHEDULE_WHEEL_ENABLED", default=False)
+    config.SCHEDULE_WHEEL_POLL_INTERVAL = env.float("SCHEDULE_WHEEL_POLL_INTERVAL", default=1.0)
+    config.SCHEDULE_MISFIRE_GRACE_TIME = env.int("SCHEDULE_MISFIRE_GRACE_TIME", default=60)
+    config.SCHEDULE_CATCH_UP_MAX_RUNS = env.int("SCHEDULE_CATCH_UP_MAX_RUNS", default=10)
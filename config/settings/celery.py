@@ -37,6 +37,17 @@ def settings(config, env):
 
     config.CELERY_WORKER_MAX_TASKS_PER_CHILD = 1
 
+    # Runs, preparing run images, run meta processing and notifications have their own queue, so light tasks don't
+    # wait behind runs and runs don't wait behind image builds. Tasks without a route go to the default queue 'celery'.
+    # http://docs.celeryproject.org/en/latest/userguide/configuration.html#task-routes
+    config.CELERY_TASK_ROUTES = {
+        "job.tasks.start_run": {"queue": "runs"},
+        "job.tasks.prewarm_package_images": {"queue": "images"},
+        "run.tasks.*": {"queue": "meta"},
+        "job.tasks.send_run_notification": {"queue": "notifications"},
+        "job.tasks.send_missed_schedule_notification": {"queue": "notifications"},
+    }
+
     if config.DEBUG:
         # http://docs.celeryproject.org/en/latest/userguide/configuration.html#task-eager-propagates
         config.CELERY_TASK_EAGER_PROPAGATES = True
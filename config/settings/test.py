@@ -1,4 +1,14 @@
-from .main import *  # noqa: F403
+import atexit
+import os
+import shutil
+import tempfile
+
+# Store the files created by the tests in a temporary directory instead of the storage root in the code root
+if not os.environ.get("ASKANNA_STORAGE_ROOT"):
+    os.environ["ASKANNA_STORAGE_ROOT"] = tempfile.mkdtemp(prefix="askanna-test-storage-")
+    atexit.register(shutil.rmtree, os.environ["ASKANNA_STORAGE_ROOT"], ignore_errors=True)
+
+from .main import *  # noqa: E402, F403
 
 TEST = True
 